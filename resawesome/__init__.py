@@ -1,5 +1,13 @@
 from decorators import create, read, update, delete, lookup, execute
 from resource import API
+from access import AccessCache
+from cache import CursorStore, InstanceCache, ViewCache
+from metrics import Metrics
+from asyncapi import AsyncAPI
+from bus import ServiceBus
+from shard import ShardedExecutor
+from changes import ChangeHub
+from gateway import Gateway
 
 class ResourceNotImplementedError(NotImplementedError):
     pass
@@ -0,0 +1,82 @@
+from cache import IndexedLRUCache
+
+# returned by AccessCache.get when no decision has been cached
+MISSING = object()
+
+# the environment arguments which access decisions depend on, by default
+DEFAULT_KEY_ARGS = ('_user_id',)
+
+class AccessCache(object):
+    """Caches access decisions, keyed by resource identity, permission and environment.
+
+    Decisions are cached for the duration of a request (see API.request), and, if max_entries is
+    given, in a bounded store shared across requests. Only classes and resources which define an
+    identity method have their decisions shared across requests.
+
+    Args:
+        key_args (List[str]): The environment arguments which an access decision depends on
+        max_entries (int): The size of the store shared across requests, or None to not share decisions
+        ttl (float): The number of seconds a shared decision is kept for, or None to keep it until evicted
+
+    """
+
+    def __init__(self, key_args=DEFAULT_KEY_ARGS, max_entries=None, ttl=None):
+        self.key_args = tuple(key_args)
+
+        self.shared = None
+        if max_entries is not None:
+            self.shared = IndexedLRUCache(max_entries, ttl)
+
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, scope, identity, permission, environment, shared=True):
+        """Look up a cached decision, returning its cache key and the decision (or MISSING)"""
+
+        key = (identity, permission, tuple(environment.get(arg) for arg in self.key_args))
+
+        decision = MISSING
+        if scope is not None:
+            decision = scope.access.get(key, MISSING)
+
+        if decision is MISSING and shared and self.shared is not None:
+            decision = self.shared.get(key, MISSING)
+            if decision is not MISSING and scope is not None:
+                scope.access[key] = decision
+
+        if decision is MISSING:
+            self.misses += 1
+        else:
+            self.hits += 1
+
+        return key, decision
+
+    def set(self, scope, key, decision, shared=True):
+        if scope is not None:
+            scope.access[key] = decision
+
+        if shared and self.shared is not None:
+            self.shared.set(key, decision)
+
+    def invalidate(self, identity, scope=None):
+        """Discard every cached decision for a resource identity"""
+
+        if scope is not None:
+            for key in [key for key in scope.access if key[0] == identity]:
+                del scope.access[key]
+
+        if self.shared is not None:
+            self.shared.invalidate(identity)
+
+    def clear(self):
+        if self.shared is not None:
+            self.shared.clear()
+
+    def stats(self):
+        stats = {
+            'hits': self.hits,
+            'misses': self.misses
+        }
+        if self.shared is not None:
+            stats['shared'] = self.shared.stats()
+        return stats
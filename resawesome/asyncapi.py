@@ -0,0 +1,73 @@
+from multiprocessing.pool import ThreadPool
+
+from resource import API
+
+DEFAULT_WORKERS = 16
+DEFAULT_METHOD_WORKERS = 16
+
+class AsyncAPI(API):
+    """An API whose operations run concurrently on a pool of threads.
+
+    Each of create, read, update, delete, lookup and execute takes the same arguments as in API,
+    but returns immediately with a multiprocessing.pool.AsyncResult, whose get() returns the
+    operation's result (or raises its error). Within a single operation's methods, adjacent
+    methods marked as independent (e.g. {'method': 'name', 'args': {}, 'independent': True})
+    are called concurrently, once access has been granted to all of them.
+
+    Resource methods and hooks are ordinary (blocking) callables, so I/O-bound resources
+    gain throughput by overlapping their waits on separate threads.
+    """
+
+    def __init__(self, workers=DEFAULT_WORKERS, method_workers=DEFAULT_METHOD_WORKERS, **kwargs):
+        """Create and configure a new AsyncAPI.
+
+        Args:
+            workers (int): The number of threads used to run operations
+            method_workers (int): The number of threads used to call independent methods
+            **kwargs: The configuration of the API (see API.__init__)
+
+        """
+
+        super(AsyncAPI, self).__init__(**kwargs)
+
+        self._pool = ThreadPool(workers)
+        # a separate pool, so that operations waiting on their methods cannot starve them of threads
+        self._method_pool = ThreadPool(method_workers)
+
+    def close(self):
+        """Stop accepting operations, and wait for those in progress to finish"""
+
+        self._pool.close()
+        self._pool.join()
+        self._method_pool.close()
+        self._method_pool.join()
+
+    def _submit(self, operation, args, kwargs):
+        return self._pool.apply_async(operation, (self,) + args, kwargs)
+
+    def _map_methods(self, func, prepared):
+        scope = self._current_scope()
+        return self._method_pool.map(lambda prepared_method: self._in_scope(scope, func, prepared_method), prepared)
+
+    # Public Interface
+
+    def create(self, *args, **kwargs):
+        return self._submit(API.create, args, kwargs)
+
+    def read(self, *args, **kwargs):
+        return self._submit(API.read, args, kwargs)
+
+    def update(self, *args, **kwargs):
+        return self._submit(API.update, args, kwargs)
+
+    def delete(self, *args, **kwargs):
+        return self._submit(API.delete, args, kwargs)
+
+    def lookup(self, *args, **kwargs):
+        return self._submit(API.lookup, args, kwargs)
+
+    def execute(self, *args, **kwargs):
+        return self._submit(API.execute, args, kwargs)
+
+    def batch(self, *args, **kwargs):
+        return self._submit(API.batch, args, kwargs)
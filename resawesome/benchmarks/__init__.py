@@ -0,0 +1,7 @@
+"""Benchmarks of the hot paths of resawesome (dispatch, access checks, encoding and coercion).
+
+Run with: python -m resawesome.benchmarks --help
+"""
+
+from suite import BENCHMARKS, run_benchmarks
+from runner import compare, main
@@ -0,0 +1,124 @@
+import random
+
+from cStringIO import StringIO
+
+from datetime import datetime
+
+from resawesome.decorators import create, read, update, lookup
+from resawesome.resource import API
+
+def create_api():
+    """Create an API with synthetic resources attached, for benchmarking"""
+
+    api = API()
+
+    @api.resource(name='bench.item')
+    class Item(object):
+        def __init__(self, id):
+            self.id = int(id)
+            self.title = 'Item ' + str(self.id)
+            self.tags = ['tag' + str(i) for i in xrange(5)]
+            self.created = datetime(2020, 1, 1)
+
+        @staticmethod
+        def _has_class_access(_user_id, permission):
+            return _user_id is not None
+
+        def _has_access(self, _user_id, permission):
+            return permission == 'read' or self.id % 2 == 0
+
+        def _serialize(self, permission):
+            serialized = {
+                'id': self.id,
+                'title': self.title,
+                'tags': self.tags
+            }
+            if permission == 'write':
+                serialized['created'] = self.created
+            return serialized
+
+        def _commit(self):
+            return True
+
+        @read
+        def get_title(self):
+            return self.title
+
+        @read(factor=int)
+        def score(self, factor, _user_id):
+            return self.id * factor
+
+        @update(title='str')
+        def set_title(self, title):
+            self.title = title
+            return title
+
+        @staticmethod
+        @lookup(count=int)
+        def search(count):
+            return [Item(i) for i in xrange(count)]
+
+        @staticmethod
+        @create(id=int)
+        def new(id):
+            return Item(id)
+
+    return api
+
+def wide_result(api, width=1000):
+    """A flat list of dicts, each embedding a resource"""
+    cls = api.resource_classes['bench.item']
+    return [{'index': i, 'item': cls(i), 'values': [i, i + 1, i + 2]} for i in xrange(width)]
+
+def deep_result(api, depth=200):
+    """A chain of nested dicts and lists, embedding a resource at each level"""
+    cls = api.resource_classes['bench.item']
+    result = {'leaf': cls(0)}
+    for i in xrange(depth):
+        result = {'level': i, 'children': [result, cls(i)]}
+    return result
+
+def plain_result(width=1000):
+    """A list of dicts of strings, numbers and lists, without any resources"""
+    return [{'name': 'name ' + str(i), 'tags': ['a', 'b', 'c'], 'score': i * 0.5, 'meta': {'id': i, 'note': 'x' * 20}} for i in xrange(width)]
+
+def chain_result(depth=5000):
+    """A chain of nested lists, deeper than the default recursion limit"""
+    result = []
+    for i in xrange(depth):
+        result = [i, result]
+    return result
+
+def rows(size=500):
+    """A list of dicts with the same keys, as returned by typical lookups"""
+    return [{'id': i, 'name': 'user' + str(i), 'email': u'user%d@example.com' % i, 'score': i * 1.5, 'active': i % 2 == 0, 'tags': ['a', 'b'], 'parent': None, 'count': i * 37} for i in xrange(size)]
+
+def wire_payload(size=200, seed=0):
+    """A list of (type, string) pairs, as sent over the wire"""
+    generator = random.Random(seed)
+    payload = []
+    for i in xrange(size):
+        payload.append(('int', str(generator.randint(0, 10 ** 6))))
+        payload.append(('float', str(generator.random())))
+        payload.append(('bool', generator.choice(['true', 'false', 'yes', '0'])))
+        payload.append(('datetime', '2020-01-%02dT10:20:30' % (i % 28 + 1)))
+        payload.append(('list', '[1, 2, 3]'))
+    return payload
+
+def tagged_json(size=200):
+    """A JSON document holding tagged (datetime and set) values"""
+    item = '{"when": {"__type__": "datetime", "__value__": "2020-01-02T03:04:05"}, "ids": {"__type__": "set", "__value__": [1, 2, 3]}, "name": "x"}'
+    return '[' + ', '.join([item] * size) + ']'
+
+def wsgi_environ(path, body):
+    """A WSGI environ of a JSON POST request"""
+    return {
+        'REQUEST_METHOD': 'POST',
+        'PATH_INFO': path,
+        'CONTENT_TYPE': 'application/json',
+        'CONTENT_LENGTH': str(len(body)),
+        'wsgi.input': StringIO(body)
+    }
+
+def start_response(status, headers, exc_info=None):
+    pass
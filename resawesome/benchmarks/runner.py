@@ -0,0 +1,67 @@
+import argparse
+import json
+
+from suite import BENCHMARKS, DEFAULT_DURATION, run_benchmarks
+
+DEFAULT_THRESHOLD = 0.1
+
+def compare(results, baseline, threshold=DEFAULT_THRESHOLD):
+    """Compare benchmark results against a baseline, returning the regressions.
+
+    Args:
+        results (dict): Benchmark results (see run_benchmarks)
+        baseline (dict): Benchmark results to compare against
+        threshold (float): The fraction by which ops/sec may drop before it is a regression
+
+    Returns:
+        dict: name -> {'baseline': ops/sec, 'current': ops/sec, 'change': fractional change}
+            for each benchmark which regressed
+
+    """
+
+    regressions = {}
+    for name, baseline_result in baseline['benchmarks'].iteritems():
+        result = results['benchmarks'].get(name, None)
+        if result is None:
+            continue
+
+        change = result['ops_per_sec'] / baseline_result['ops_per_sec'] - 1.0
+        if change < -threshold:
+            regressions[name] = {
+                'baseline': baseline_result['ops_per_sec'],
+                'current': result['ops_per_sec'],
+                'change': change
+            }
+
+    return regressions
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Benchmark resawesome, optionally failing on regressions against a baseline')
+    parser.add_argument('benchmarks', nargs='*', help='The benchmarks to run (all by default): ' + ', '.join(sorted(BENCHMARKS)))
+    parser.add_argument('--duration', type=float, default=DEFAULT_DURATION, help='Seconds to run each benchmark for')
+    parser.add_argument('--output', help='File to write the results to, as JSON')
+    parser.add_argument('--baseline', help='File of JSON results to compare against')
+    parser.add_argument('--threshold', type=float, default=DEFAULT_THRESHOLD, help='Fractional slowdown which fails the run')
+    args = parser.parse_args(argv)
+
+    results = run_benchmarks(args.benchmarks or None, args.duration)
+
+    for name, result in sorted(results['benchmarks'].iteritems()):
+        print '%-24s %14.1f ops/sec %10d KB' % (name, result['ops_per_sec'], result['peak_memory_kb'])
+
+    if args.output:
+        with open(args.output, 'w') as output_file:
+            json.dump(results, output_file, indent=2, sort_keys=True)
+
+    if args.baseline:
+        with open(args.baseline) as baseline_file:
+            baseline = json.load(baseline_file)
+
+        regressions = compare(results, baseline, args.threshold)
+        for name, regression in sorted(regressions.iteritems()):
+            print 'REGRESSION %-24s %14.1f -> %.1f ops/sec (%+.1f%%)' % (name, regression['baseline'], regression['current'], regression['change'] * 100)
+
+        if regressions:
+            return 1
+
+    return 0
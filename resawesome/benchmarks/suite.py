@@ -0,0 +1,210 @@
+import json
+import multiprocessing
+import resource
+import sys
+
+from timeit import default_timer
+
+from resawesome.gateway import Gateway
+from resawesome.serialization import binary_decode, binary_encode, convert_arg, get_decoder, get_encoder
+from resawesome.util import populate_args
+
+import resources
+
+DEFAULT_DURATION = 1.0
+
+ENVIRONMENT = {'_user_id': 1}
+
+# name -> function taking a benchmark API, and returning the function to benchmark
+BENCHMARKS = {}
+
+def benchmark(func):
+    BENCHMARKS[func.__name__] = func
+    return func
+
+@benchmark
+def dispatch_read(api):
+    methods = ['get_title', {'method': 'score', 'args': {'factor': '3'}}]
+    return lambda: api.read('bench.item', methods, {'id': 2}, ENVIRONMENT)
+
+@benchmark
+def dispatch_lookup(api):
+    methods = [{'method': 'search', 'args': {'count': '20'}}]
+    return lambda: api.lookup('bench.item', methods, ENVIRONMENT)
+
+@benchmark
+def dispatch_update(api):
+    methods = [{'method': 'set_title', 'args': {'title': 'Updated'}}]
+    return lambda: api.update('bench.item', methods, {'id': 2}, ENVIRONMENT)
+
+@benchmark
+def dispatch_create(api):
+    return lambda: api.create('bench.item', 'new', {'id': '4'}, ['get_title'], ENVIRONMENT)
+
+@benchmark
+def populate_args_score(api):
+    method = api.resource_classes['bench.item'](1).score
+    sent_args = {'factor': '3', '_user_id': 'ignored'}
+    return lambda: populate_args(method, sent_args, ENVIRONMENT)
+
+@benchmark
+def access_level(api):
+    instances = [api.resource_classes['bench.item'](i) for i in xrange(10)]
+    def _access_levels():
+        for instance in instances:
+            api._access_level(instance, ENVIRONMENT)
+    return _access_levels
+
+@benchmark
+def encode_wide(api):
+    result = resources.wide_result(api)
+    return lambda: api.encode(result, ENVIRONMENT)
+
+@benchmark
+def encode_deep(api):
+    result = resources.deep_result(api)
+    return lambda: api.encode(result, ENVIRONMENT)
+
+@benchmark
+def encode_plain(api):
+    result = resources.plain_result()
+    return lambda: api.encode(result, ENVIRONMENT)
+
+@benchmark
+def encode_chain(api):
+    result = resources.chain_result()
+    return lambda: api.encode(result, ENVIRONMENT)
+
+@benchmark
+def convert_arg_payload(api):
+    payload = resources.wire_payload()
+    def _convert():
+        for type_name, value in payload:
+            convert_arg(type_name, value)
+    return _convert
+
+@benchmark
+def decode_tagged_json(api):
+    document = resources.tagged_json()
+    decoder = get_decoder()
+    return lambda: json.loads(document, object_hook=decoder)
+
+# the binary codec, with the same values in JSON as a baseline
+
+@benchmark
+def encode_binary_rows(api):
+    result = resources.rows()
+    return lambda: binary_encode(result)
+
+@benchmark
+def encode_json_rows(api):
+    result = resources.rows()
+    return lambda: json.dumps(result)
+
+@benchmark
+def decode_binary_rows(api):
+    data = binary_encode(resources.rows())
+    return lambda: binary_decode(data)
+
+@benchmark
+def decode_json_rows(api):
+    document = json.dumps(resources.rows())
+    return lambda: json.loads(document)
+
+@benchmark
+def decode_binary_ints(api):
+    data = binary_encode(range(1000))
+    return lambda: binary_decode(data)
+
+@benchmark
+def decode_json_ints(api):
+    document = json.dumps(range(1000))
+    return lambda: json.loads(document)
+
+@benchmark
+def gateway_lookup(api):
+    gateway = Gateway(api, lambda environ: ENVIRONMENT)
+    body = json.dumps({'methods': [{'method': 'search', 'args': {'count': '200'}}]})
+    def _request():
+        environ = resources.wsgi_environ('/bench.item/lookup', body)
+        for chunk in gateway(environ, resources.start_response):
+            pass
+    return _request
+
+@benchmark
+def naive_lookup(api):
+    # HTTP glue as hand written around API: decode the body, encode the whole result, and dump it as one string
+    body = json.dumps({'methods': [{'method': 'search', 'args': {'count': '200'}}]})
+    default = get_encoder(wrap_types=True)
+    def _request():
+        environ = resources.wsgi_environ('/bench.item/lookup', body)
+        arguments = json.loads(environ['wsgi.input'].read(int(environ['CONTENT_LENGTH'])))
+        result = api.lookup('bench.item', arguments['methods'], ENVIRONMENT)
+        response = json.dumps(result, default=default)
+        resources.start_response('200 OK', [('Content-Type', 'application/json'), ('Content-Length', str(len(response)))])
+    return _request
+
+def measure(func, duration=DEFAULT_DURATION):
+    """Call func repeatedly for (at least) duration seconds, returning its calls per second"""
+
+    # warm up, and estimate how many calls fit in a batch of ~1/20th of the duration
+    start = default_timer()
+    func()
+    batch_size = max(1, int((duration / 20.0) / max(default_timer() - start, 1e-9)))
+
+    calls = 0
+    start = default_timer()
+    elapsed = 0.0
+    while elapsed < duration:
+        for i in xrange(batch_size):
+            func()
+        calls += batch_size
+        elapsed = default_timer() - start
+
+    return calls / elapsed
+
+def _run_benchmark(name, duration, connection):
+    # runs in its own process, so that its peak memory can be measured separately
+    start_memory = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    func = BENCHMARKS[name](resources.create_api())
+    ops_per_sec = measure(func, duration)
+    peak_memory = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss - start_memory
+
+    connection.send({
+        'ops_per_sec': ops_per_sec,
+        'peak_memory_kb': peak_memory
+    })
+    connection.close()
+
+def run_benchmarks(names=None, duration=DEFAULT_DURATION):
+    """Run benchmarks, each in its own process, returning a JSON serializable dict of their results.
+
+    Args:
+        names (List[str]): The benchmarks to run, or None to run every benchmark
+        duration (float): The number of seconds to run each benchmark for
+
+    Returns:
+        dict: {'python': version, 'benchmarks': {name: {'ops_per_sec': ..., 'peak_memory_kb': ...}}}
+            where peak_memory_kb is the growth in the process' peak resident memory
+
+    """
+
+    if names is None:
+        names = sorted(BENCHMARKS.keys())
+
+    results = {}
+    for name in names:
+        if name not in BENCHMARKS:
+            raise KeyError("'" + name + "' is not a benchmark")
+
+        receiver, sender = multiprocessing.Pipe(duplex=False)
+        process = multiprocessing.Process(target=_run_benchmark, args=(name, duration, sender))
+        process.start()
+        sender.close()
+        results[name] = receiver.recv()
+        process.join()
+
+    return {
+        'python': sys.version.split()[0],
+        'benchmarks': results
+    }
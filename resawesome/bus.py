@@ -0,0 +1,418 @@
+import collections
+import multiprocessing
+import sys
+import threading
+
+from Queue import Full
+from timeit import default_timer
+
+from resource import DEFAULT_ALLOWED_METHOD_TYPES
+
+DEFAULT_POOL = 'default'
+DEFAULT_WORKERS = 8
+DEFAULT_MAX_QUEUE = 1024
+# lanes in order of priority, highest first
+DEFAULT_LANES = ('high', 'normal', 'low')
+DEFAULT_LANE = 'normal'
+
+class BusFullError(Full):
+    """Raised when a message is sent to a full lane, and is not allowed to wait (or waited too long) for space"""
+    pass
+
+class BusClosedError(Exception):
+    pass
+
+class Future(object):
+    """The eventual result of a message sent to a ServiceBus.
+
+    Like multiprocessing.pool.AsyncResult, get() returns the operation's result, or raises its error.
+    """
+
+    def __init__(self):
+        self._event = threading.Event()
+        self._value = None
+        self._error = None
+        self._callbacks = []
+        self._lock = threading.Lock()
+
+    def get(self, timeout=None):
+        if not self._event.wait(timeout):
+            raise multiprocessing.TimeoutError
+
+        if self._error is not None:
+            err, trace = self._error
+            raise err, None, trace
+
+        return self._value
+
+    def wait(self, timeout=None):
+        self._event.wait(timeout)
+
+    def ready(self):
+        return self._event.is_set()
+
+    def successful(self):
+        if not self.ready():
+            raise ValueError('the operation has not finished')
+        return self._error is None
+
+    def add_done_callback(self, callback):
+        """Call callback(future) once the operation has finished (immediately, if it already has)"""
+
+        with self._lock:
+            if not self._event.is_set():
+                self._callbacks.append(callback)
+                return
+
+        callback(self)
+
+    def _set_result(self, value):
+        self._value = value
+        self._done()
+
+    def _set_error(self, err, trace=None):
+        self._error = (err, trace)
+        self._done()
+
+    def _done(self):
+        with self._lock:
+            self._event.set()
+            callbacks = self._callbacks
+            self._callbacks = []
+
+        for callback in callbacks:
+            callback(self)
+
+class _LaneQueue(object):
+    """A set of bounded FIFO queues, one per lane, taken from in order of lane priority"""
+
+    def __init__(self, lanes, max_queue):
+        self.lanes = tuple(lanes)
+        self.max_queue = max_queue
+
+        # lane -> deque of messages
+        self._queues = dict((lane, collections.deque()) for lane in self.lanes)
+        self._lock = threading.Lock()
+        self._not_empty = threading.Condition(self._lock)
+        self._not_full = threading.Condition(self._lock)
+        self.is_closed = False
+
+    def put(self, lane, item, block=True, timeout=None):
+        queue = self._queues[lane]
+        with self._not_full:
+            if self.is_closed:
+                raise BusClosedError('the bus is closed')
+
+            if len(queue) >= self.max_queue:
+                if not block:
+                    raise BusFullError("lane '" + lane + "' is full")
+
+                # apply backpressure: wait for a worker to make space
+                _wait(self._not_full, lambda: len(queue) < self.max_queue or self.is_closed, timeout)
+                if self.is_closed:
+                    raise BusClosedError('the bus is closed')
+                if len(queue) >= self.max_queue:
+                    raise BusFullError("lane '" + lane + "' is full")
+
+            queue.append(item)
+            self._not_empty.notify()
+
+    def get(self):
+        """Take the next item from the highest priority lane, or None once closed and empty"""
+
+        with self._not_empty:
+            while True:
+                for lane in self.lanes:
+                    queue = self._queues[lane]
+                    if queue:
+                        item = queue.popleft()
+                        self._not_full.notify_all()
+                        return item
+
+                if self.is_closed:
+                    return None
+
+                self._not_empty.wait()
+
+    def close(self):
+        with self._lock:
+            self.is_closed = True
+            self._not_empty.notify_all()
+            self._not_full.notify_all()
+
+    def sizes(self):
+        with self._lock:
+            return dict((lane, len(queue)) for lane, queue in self._queues.iteritems())
+
+def _wait(condition, predicate, timeout):
+    """Wait on a held condition until predicate() is true, or timeout seconds have passed"""
+
+    if timeout is None:
+        while not predicate():
+            condition.wait()
+        return
+
+    end = default_timer() + timeout
+    while not predicate():
+        remaining = end - default_timer()
+        if remaining <= 0:
+            return
+        condition.wait(remaining)
+
+# the API of each worker process (inherited from the parent when the pool's processes are forked)
+_process_api = None
+
+def _init_process(api):
+    global _process_api
+    _process_api = api
+
+def _run_in_process(operation, args, kwargs):
+    """Perform an operation in a worker process, returning (True, result) or (False, error)"""
+
+    try:
+        return True, _perform(_process_api, operation, args, kwargs)
+    except Exception as err:
+        # tracebacks can't be sent back to the parent process
+        if hasattr(err, 'trace'):
+            err.trace = None
+        return False, err
+
+def _perform(api, operation, args, kwargs):
+    return getattr(api, operation)(*args, **kwargs)
+
+class ServiceBus(object):
+    """Runs API operations, sent as messages, on pools of worker threads or processes.
+
+    Each pool has a bounded queue per priority lane, and its workers take messages from the highest
+    priority lane with messages waiting. Messages are routed to pools by resource name, and those
+    for resources without a route go to the default pool. When a lane is full, senders wait for
+    space (backpressure) or, if they are not allowed to wait, the message is rejected with a
+    BusFullError.
+
+    Messages are dicts, in the same form as the operations of API.batch, with an 'environment':
+        'operation': one of 'create', 'read', 'update', 'delete', 'lookup' or 'execute'
+        'name': the name of the resource
+        'methods': the methods to call ('method' for the single method of a 'delete')
+        'instance_args': the instance arguments of a 'read', 'update' or 'delete'
+        'create_method' and 'creation_args': the creation method and arguments of a 'create'
+        'environment': the environment in which the operation is performed
+        'allowed_method_types' (optional): overrides the operation's allowed method types
+        'encode' (optional): whether to encode the result (the default is True)
+        'fields' (optional): the fields of each resource to encode in the result of a 'read' or 'lookup'
+        'if_none_match' (optional): makes a 'read' or 'lookup' conditional (see API.read)
+
+    Process pools are forked from the process which starts the bus, so every resource must be
+    attached to the API before then, and the results (and errors) of their operations must be
+    picklable.
+
+    Args:
+        api (API): The API which performs the operations
+        pools (dict): pool name -> {'workers': int, 'processes': bool, 'max_queue': int}, the worker
+            pools to start (a default pool is added if none is given)
+        routes (dict): resource name -> pool name, the pool which runs each resource's operations
+        lanes (List[str]): The names of the priority lanes, highest priority first
+        max_queue (int): The number of messages each lane of a pool can hold, unless the pool sets its own
+
+    """
+
+    def __init__(self, api, pools=None, routes=None, lanes=DEFAULT_LANES, max_queue=DEFAULT_MAX_QUEUE):
+        self.api = api
+        self.routes = dict(routes or {})
+        self.lanes = tuple(lanes)
+
+        pools = dict(pools or {})
+        if DEFAULT_POOL not in pools:
+            pools[DEFAULT_POOL] = {}
+
+        for route, pool_name in self.routes.iteritems():
+            if pool_name not in pools:
+                raise ValueError("'" + route + "' is routed to an undefined pool '" + pool_name + "'")
+
+        # pool name -> pool dict of its queue, threads, process pool (if any) and counters
+        self._pools = {}
+        for pool_name, config in pools.iteritems():
+            self._pools[pool_name] = self._start_pool(pool_name, config, max_queue)
+
+    def _start_pool(self, pool_name, config, max_queue):
+        workers = config.get('workers', DEFAULT_WORKERS)
+        pool = {
+            'name': pool_name,
+            'queue': _LaneQueue(self.lanes, config.get('max_queue', max_queue)),
+            'threads': [],
+            'processes': None,
+            'sent': 0,
+            'rejected': 0,
+            'completed': 0,
+            'failed': 0,
+            'lock': threading.Lock()
+        }
+
+        if config.get('processes', False):
+            pool['processes'] = multiprocessing.Pool(workers, _init_process, (self.api,))
+
+        # a thread per worker takes messages from the pool's queue (handing them to a process, in a process pool)
+        for i in xrange(workers):
+            thread = threading.Thread(target=self._work, args=(pool,), name='resawesome-bus-' + pool_name + '-' + str(i))
+            thread.daemon = True
+            thread.start()
+            pool['threads'].append(thread)
+
+        return pool
+
+    def send(self, message, lane=DEFAULT_LANE, block=True, timeout=None):
+        """Queue a message for its resource's pool, returning a Future of its result.
+
+        Args:
+            message (dict): The operation to perform (see ServiceBus)
+            lane (str): The priority lane to queue the message in
+            block (bool): Whether to wait for space if the lane is full, rather than rejecting the message
+            timeout (float): The number of seconds to wait for space, or None to wait indefinitely
+
+        Raises:
+            BusFullError: If the lane is full, and the message could not wait for space
+            BusClosedError: If the bus has been closed
+
+        """
+
+        operation, args, kwargs = _operation_call(message)
+        return self._send(message.get('name'), operation, args, kwargs, lane, block, timeout)
+
+    def _send(self, name, operation, args, kwargs, lane, block, timeout):
+        if lane not in self.lanes:
+            raise ValueError("'" + str(lane) + "' is not a lane of this bus")
+
+        pool = self._pools[self.routes.get(name, DEFAULT_POOL)]
+        future = Future()
+
+        try:
+            pool['queue'].put(lane, (operation, args, kwargs, future), block, timeout)
+        except BusFullError:
+            with pool['lock']:
+                pool['rejected'] += 1
+            raise
+
+        with pool['lock']:
+            pool['sent'] += 1
+
+        return future
+
+    def _work(self, pool):
+        while True:
+            item = pool['queue'].get()
+            if item is None:
+                return
+
+            operation, args, kwargs, future = item
+            if pool['processes'] is None:
+                try:
+                    result = _perform(self.api, operation, args, kwargs)
+                except Exception as err:
+                    future._set_error(err, sys.exc_info()[2])
+                else:
+                    future._set_result(result)
+            else:
+                try:
+                    is_successful, result = pool['processes'].apply(_run_in_process, (operation, args, kwargs))
+                except Exception as err:
+                    # the message or its result couldn't be sent between processes
+                    is_successful, result = False, err
+
+                if is_successful:
+                    future._set_result(result)
+                else:
+                    future._set_error(result)
+
+            with pool['lock']:
+                if future.successful():
+                    pool['completed'] += 1
+                else:
+                    pool['failed'] += 1
+
+    def close(self, wait=True):
+        """Stop accepting messages. Queued messages are still run, and if wait is True, this waits for them to finish."""
+
+        for pool in self._pools.itervalues():
+            pool['queue'].close()
+
+        if wait:
+            for pool in self._pools.itervalues():
+                for thread in pool['threads']:
+                    thread.join()
+
+        for pool in self._pools.itervalues():
+            if pool['processes'] is not None:
+                pool['processes'].close()
+                if wait:
+                    pool['processes'].join()
+
+    def stats(self):
+        """pool name -> {'queued': {lane: count}, 'sent', 'rejected', 'completed', 'failed'}"""
+
+        stats = {}
+        for pool_name, pool in self._pools.iteritems():
+            with pool['lock']:
+                stats[pool_name] = {
+                    'queued': pool['queue'].sizes(),
+                    'sent': pool['sent'],
+                    'rejected': pool['rejected'],
+                    'completed': pool['completed'],
+                    'failed': pool['failed']
+                }
+        return stats
+
+    # Public Interface
+    # each takes the same arguments as the API operation, with the lane, block and timeout arguments of send
+
+    def create(self, name, *args, **kwargs):
+        return self._send_call('create', name, args, kwargs)
+
+    def read(self, name, *args, **kwargs):
+        return self._send_call('read', name, args, kwargs)
+
+    def update(self, name, *args, **kwargs):
+        return self._send_call('update', name, args, kwargs)
+
+    def delete(self, name, *args, **kwargs):
+        return self._send_call('delete', name, args, kwargs)
+
+    def lookup(self, name, *args, **kwargs):
+        return self._send_call('lookup', name, args, kwargs)
+
+    def execute(self, name, *args, **kwargs):
+        return self._send_call('execute', name, args, kwargs)
+
+    def _send_call(self, operation, name, args, kwargs):
+        lane = kwargs.pop('lane', DEFAULT_LANE)
+        block = kwargs.pop('block', True)
+        timeout = kwargs.pop('timeout', None)
+        return self._send(name, operation, (name,) + args, kwargs, lane, block, timeout)
+
+def _operation_call(message):
+    """Translate a message into the API method, args and kwargs which perform it"""
+
+    operation = message.get('operation')
+    if operation not in DEFAULT_ALLOWED_METHOD_TYPES:
+        raise ValueError("'" + str(operation) + "' is not a resource operation")
+
+    name = message.get('name')
+    environment = message.get('environment') or {}
+    kwargs = {
+        'allowed_method_types': message.get('allowed_method_types', DEFAULT_ALLOWED_METHOD_TYPES[operation]),
+        'encode': message.get('encode', True)
+    }
+
+    if operation in ('read', 'lookup') and message.get('fields') is not None:
+        kwargs['fields'] = message.get('fields')
+    if operation in ('read', 'lookup') and message.get('if_none_match') is not None:
+        kwargs['if_none_match'] = message.get('if_none_match')
+
+    if operation == 'create':
+        args = (name, message.get('create_method'), message.get('creation_args'), message.get('methods'), environment)
+    elif operation == 'delete':
+        args = (name, message.get('method'), message.get('instance_args') or {}, environment)
+    elif operation in ('read', 'update'):
+        args = (name, message.get('methods') or [], message.get('instance_args') or {}, environment)
+    else:
+        args = (name, message.get('methods') or [], environment)
+
+    return operation, args, kwargs
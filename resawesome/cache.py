@@ -0,0 +1,336 @@
+import binascii
+import collections
+import os
+import sys
+import threading
+import time
+
+class LRUCache(object):
+    """A bounded, thread safe, least-recently-used cache whose entries can expire.
+
+    Args:
+        max_entries (int): The maximum number of entries to keep
+        ttl (float): The number of seconds an entry is kept for, or None to keep entries until evicted
+        on_evict (Callable[[key, value], None]): Called when an entry is evicted or expires
+        clock (Callable[[], float]): The time source used for expiry
+        max_size (int): The maximum total size of the entries, or None to only bound the number of entries
+        sizeof (Callable[[value], int]): Estimates the size of a value, when max_size is given
+
+    """
+
+    def __init__(self, max_entries, ttl=None, on_evict=None, clock=time.time, max_size=None, sizeof=None):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.on_evict = on_evict
+        self.clock = clock
+        self.max_size = max_size
+        self.sizeof = sizeof
+
+        # key -> (value, expiry time, size), in least to most recently used order
+        self._entries = collections.OrderedDict()
+        self._lock = threading.RLock()
+
+        # the total size of the entries, if max_size is given
+        self.size = 0
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key, default=None):
+        evicted = None
+        with self._lock:
+            entry = self._entries.pop(key, None)
+            if entry is not None and entry[1] is not None and entry[1] <= self.clock():
+                self.size -= entry[2]
+                evicted = (key, entry[0])
+                entry = None
+
+            if entry is None:
+                self.misses += 1
+                value = default
+            else:
+                self.hits += 1
+                self._entries[key] = entry
+                value = entry[0]
+
+        if evicted is not None:
+            self._evicted(*evicted)
+
+        return value
+
+    def set(self, key, value):
+        size = 0
+        if self.max_size is not None:
+            size = self.sizeof(value)
+
+        evicted = []
+        with self._lock:
+            self._remove(key)
+            expiry = None if self.ttl is None else self.clock() + self.ttl
+            self._entries[key] = (value, expiry, size)
+            self.size += size
+
+            while len(self._entries) > self.max_entries or (self.max_size is not None and self.size > self.max_size and len(self._entries) > 1):
+                old_key, old_entry = self._entries.popitem(last=False)
+                self.size -= old_entry[2]
+                evicted.append((old_key, old_entry[0]))
+
+        for old_key, old_value in evicted:
+            self._evicted(old_key, old_value)
+
+    def pop(self, key, default=None):
+        with self._lock:
+            entry = self._remove(key)
+
+        return default if entry is None else entry[0]
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.size = 0
+
+    def stats(self):
+        with self._lock:
+            stats = {
+                'entries': len(self._entries),
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions
+            }
+            if self.max_size is not None:
+                stats['size'] = self.size
+            return stats
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __contains__(self, key):
+        return key in self._entries
+
+    def _remove(self, key):
+        # must be called while holding the lock
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self.size -= entry[2]
+        return entry
+
+    def _evicted(self, key, value):
+        self.evictions += 1
+        if self.on_evict is not None:
+            self.on_evict(key, value)
+
+class IndexedLRUCache(LRUCache):
+    """An LRUCache whose keys are tuples beginning with an identity, so that every entry
+    for an identity can be invalidated together.
+    """
+
+    def __init__(self, max_entries, ttl=None, on_evict=None, clock=time.time, max_size=None, sizeof=None):
+        super(IndexedLRUCache, self).__init__(max_entries, ttl, on_evict, clock, max_size, sizeof)
+
+        # identity -> set of keys
+        self._index = {}
+
+    def set(self, key, value):
+        with self._lock:
+            self._index.setdefault(key[0], set()).add(key)
+        super(IndexedLRUCache, self).set(key, value)
+
+    def pop(self, key, default=None):
+        with self._lock:
+            self._unindex(key)
+        return super(IndexedLRUCache, self).pop(key, default)
+
+    def invalidate(self, identity):
+        """Discard every entry for an identity"""
+
+        with self._lock:
+            for key in self._index.pop(identity, ()):
+                self._remove(key)
+
+    def clear(self):
+        with self._lock:
+            self._index.clear()
+            super(IndexedLRUCache, self).clear()
+
+    def _unindex(self, key):
+        keys = self._index.get(key[0], None)
+        if keys is not None:
+            keys.discard(key)
+            if not keys:
+                del self._index[key[0]]
+
+    def _evicted(self, key, value):
+        with self._lock:
+            self._unindex(key)
+        super(IndexedLRUCache, self)._evicted(key, value)
+
+class ViewCache(IndexedLRUCache):
+    """Caches the serialized views of resources which define both an identity and a version method.
+
+    Views are keyed by resource identity, version, permission and the environment arguments
+    taken by the serializer, and are invalidated when their resource is committed.
+
+    Args:
+        max_entries (int): The maximum number of views to keep
+        ttl (float): The number of seconds a view is kept for, or None to keep views until evicted
+
+    """
+
+    def __init__(self, max_entries, ttl=None):
+        super(ViewCache, self).__init__(max_entries, ttl)
+
+def estimate_size(value):
+    """A shallow estimate of the memory used by an object, its attribute dict and the attributes' values"""
+
+    size = sys.getsizeof(value)
+    attributes = getattr(value, '__dict__', None)
+    if attributes is not None:
+        size += sys.getsizeof(attributes)
+        for attribute in attributes.itervalues():
+            size += sys.getsizeof(attribute)
+    return size
+
+class InstanceCache(LRUCache):
+    """Caches resource instances across requests, for resources registered as cacheable.
+
+    Instances are keyed by resource name and instance arguments, and are evicted when they are
+    committed or deleted. Cached instances are shared between requests (and threads), so only
+    resources whose instances are safe to share should be registered as cacheable.
+
+    Args:
+        max_entries (int): The maximum number of instances to keep
+        ttl (float): The number of seconds an instance is kept for, or None to keep instances until evicted
+        max_size (int): The maximum estimated size (in bytes) of the instances kept, or None for no limit
+        sizeof (Callable[[instance], int]): Estimates the size of an instance
+
+    """
+
+    def __init__(self, max_entries, ttl=None, max_size=None, sizeof=estimate_size):
+        super(InstanceCache, self).__init__(max_entries, ttl, max_size=max_size, sizeof=sizeof)
+
+def _close_cursor(token, cursor):
+    # release whatever an evicted cursor's iterator holds (e.g. a database cursor)
+    close = getattr(cursor['iterator'], 'close', None)
+    if close is not None:
+        close()
+
+class CursorStore(LRUCache):
+    """Holds the iterators of paginated lookups between requests, under opaque cursor tokens.
+
+    Each cursor can only be taken by an environment with the same key arguments as the one which
+    created it, and only once: taking a cursor removes it, and its next page is held under a new token.
+    Iterators of cursors which are evicted or expire are closed, if they can be.
+
+    Args:
+        max_entries (int): The maximum number of cursors to hold
+        ttl (float): The number of seconds a cursor is held for, or None to hold cursors until evicted
+        key_args (List[str]): The environment arguments identifying who may take a cursor
+
+    """
+
+    def __init__(self, max_entries, ttl=None, key_args=('_user_id',)):
+        super(CursorStore, self).__init__(max_entries, ttl, on_evict=_close_cursor)
+        self.key_args = tuple(key_args)
+
+    def hold(self, cursor, environment):
+        """Hold a cursor (a dict with an 'iterator'), returning its token"""
+
+        token = binascii.hexlify(os.urandom(16))
+        cursor['owner'] = self._owner(environment)
+        self.set(token, cursor)
+        return token
+
+    def take(self, token, environment):
+        """Remove and return the cursor held under a token, or None if there is no such cursor for this environment"""
+
+        owner = self._owner(environment)
+        with self._lock:
+            cursor = self.get(token, None)
+            if cursor is None or cursor['owner'] != owner:
+                return None
+            self.pop(token)
+
+        return cursor
+
+    def _owner(self, environment):
+        return tuple(environment.get(arg) for arg in self.key_args)
+
+# the value of keys which aren't in a ResultCache
+_MISSING = object()
+
+class ResultCache(LRUCache):
+    """Caches the results of a resource method, computing each missing result only once at a time.
+
+    When several threads look up the same missing key together, the first computes the result,
+    and the others wait for it (and share its result, or its error) instead of computing it again.
+
+    Args:
+        max_entries (int): The maximum number of results to keep
+        ttl (float): The number of seconds a result is kept for, or None to keep results until evicted
+
+    """
+
+    def __init__(self, max_entries, ttl=None):
+        super(ResultCache, self).__init__(max_entries, ttl)
+
+        # key -> in flight computation dict of 'done' (an Event), 'result' and 'error'
+        self._flights = {}
+        # incremented when the cache is cleared, so that results computed beforehand aren't kept
+        self._generation = 0
+        self.coalesced = 0
+
+    def get_or_compute(self, key, compute):
+        """Get the result for a key, calling compute() to produce it if it is missing"""
+
+        result = self.get(key, _MISSING)
+        if result is not _MISSING:
+            return result
+
+        with self._lock:
+            flight = self._flights.get(key, None)
+            is_computing = flight is None
+            generation = self._generation
+            if is_computing:
+                flight = self._flights[key] = {
+                    'done': threading.Event(),
+                    'result': None,
+                    'error': None
+                }
+            else:
+                self.coalesced += 1
+
+        if not is_computing:
+            flight['done'].wait()
+            if flight['error'] is not None:
+                err, trace = flight['error']
+                raise err, None, trace
+            return flight['result']
+
+        try:
+            flight['result'] = compute()
+            with self._lock:
+                if self._generation == generation:
+                    self.set(key, flight['result'])
+        except Exception as err:
+            flight['error'] = (err, sys.exc_info()[2])
+            raise
+        finally:
+            with self._lock:
+                if self._flights.get(key, None) is flight:
+                    del self._flights[key]
+            flight['done'].set()
+
+        return flight['result']
+
+    def clear(self):
+        with self._lock:
+            self._generation += 1
+            # later lookups compute their results again, rather than waiting on computations begun before
+            self._flights = {}
+            super(ResultCache, self).clear()
+
+    def stats(self):
+        stats = super(ResultCache, self).stats()
+        stats['coalesced'] = self.coalesced
+        return stats
@@ -0,0 +1,175 @@
+import collections
+import threading
+
+from timeit import default_timer
+
+DEFAULT_MAX_QUEUE = 256
+
+class ChangeHub(object):
+    """Publishes the changes committed by an API (see API(changes=...)) to in-process subscribers.
+
+    Each change is an event dict of:
+        'name': the name of the committed instance's resource
+        'identity': the instance's identity, or None if its resource has no identity method
+        'method_types': the (sorted) types of the methods called on the instance before it was committed
+        'sequence': the number of changes published before it
+
+    Events only identify what changed, so subscribers must still read the instance (with its access
+    checks) to find out how it changed.
+
+    Args:
+        max_queue (int): The number of events each subscription holds, unless it sets its own
+
+    """
+
+    def __init__(self, max_queue=DEFAULT_MAX_QUEUE):
+        self.max_queue = max_queue
+        self.sequence = 0
+
+        # resource name -> subscriptions to it (None for subscriptions to every resource)
+        self._subscriptions = {}
+        self._lock = threading.Lock()
+
+    def subscribe(self, name=None, identity=None, max_queue=None):
+        """Subscribe to the changes of a resource (or every resource, if name is None), or of one of its instances.
+
+        Args:
+            name (str): The name of the resource, or None for every resource
+            identity: The identity of an instance of the resource, or None for all of its instances
+            max_queue (int): The number of events the subscription holds, or None for the hub's default
+
+        Returns:
+            Subscription: The subscription, which receives the events published until it is closed
+
+        """
+
+        if identity is not None and name is None:
+            raise ValueError('subscribing to an identity requires the name of its resource')
+
+        subscription = Subscription(self, name, identity, max_queue or self.max_queue)
+        with self._lock:
+            # copied on write, so that publishing doesn't hold the lock while delivering
+            self._subscriptions[name] = self._subscriptions.get(name, ()) + (subscription,)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            remaining = tuple(other for other in self._subscriptions.get(subscription.name, ()) if other is not subscription)
+            if remaining:
+                self._subscriptions[subscription.name] = remaining
+            else:
+                self._subscriptions.pop(subscription.name, None)
+
+    def publish(self, name, identity, method_types):
+        """Publish a change to every subscription to it"""
+
+        with self._lock:
+            event = {
+                'name': name,
+                'identity': identity,
+                'method_types': sorted(method_types),
+                'sequence': self.sequence
+            }
+            self.sequence += 1
+            subscriptions = self._subscriptions.get(name, ()) + self._subscriptions.get(None, ())
+
+        for subscription in subscriptions:
+            if subscription.identity is None or subscription.identity == identity:
+                subscription._put(event)
+
+class Subscription(object):
+    """A bounded queue of the change events (see ChangeHub) of a subscription.
+
+    Events are queued per changed instance (by resource name and identity): if an instance changes
+    again before its event has been taken, its queued event is replaced by the latest one (keeping
+    its place in the queue, with the method types of both). If the queue is full, the oldest event
+    is dropped to make room, and counted in dropped, so that slow consumers can tell that they should
+    read everything again.
+
+    Events are taken with get, all at once with drain (e.g. for long polling), or by iterating over
+    the subscription, which blocks for each event until the subscription is closed.
+    """
+
+    def __init__(self, hub, name, identity, max_queue):
+        self.hub = hub
+        self.name = name
+        self.identity = identity
+        self.max_queue = max_queue
+
+        self.coalesced = 0
+        self.dropped = 0
+        self.is_closed = False
+
+        # (resource name, identity) -> event, in the order they were first queued
+        self._events = collections.OrderedDict()
+        self._not_empty = threading.Condition(threading.Lock())
+
+    def _put(self, event):
+        key = (event['name'], event['identity'])
+        with self._not_empty:
+            if self.is_closed:
+                return
+
+            queued = self._events.get(key, None)
+            if queued is not None:
+                # latest wins, but keep every type of method which touched the instance
+                event = dict(event, method_types=sorted(set(queued['method_types']) | set(event['method_types'])))
+                self.coalesced += 1
+            elif len(self._events) >= self.max_queue:
+                self._events.popitem(last=False)
+                self.dropped += 1
+
+            self._events[key] = event
+            self._not_empty.notify()
+
+    def _wait(self, timeout):
+        """Wait (holding the lock) until there is an event, the subscription is closed, or timeout seconds have passed"""
+
+        if timeout is None:
+            while not self._events and not self.is_closed:
+                self._not_empty.wait()
+            return
+
+        end = default_timer() + timeout
+        while not self._events and not self.is_closed:
+            remaining = end - default_timer()
+            if remaining <= 0:
+                return
+            self._not_empty.wait(remaining)
+
+    def get(self, timeout=None):
+        """Take the next event, waiting up to timeout seconds for one (or indefinitely, if timeout is None), or None if there is none"""
+
+        with self._not_empty:
+            self._wait(timeout)
+            if not self._events:
+                return None
+            return self._events.popitem(last=False)[1]
+
+    def drain(self, timeout=0):
+        """Take every queued event, waiting up to timeout seconds for one if there are none"""
+
+        with self._not_empty:
+            self._wait(timeout)
+            events = self._events.values()
+            self._events.clear()
+            return events
+
+    def __len__(self):
+        with self._not_empty:
+            return len(self._events)
+
+    def __iter__(self):
+        while True:
+            event = self.get()
+            if event is None:
+                return
+            yield event
+
+    def close(self):
+        """Unsubscribe, waking any consumer waiting for an event. Events already queued can still be taken."""
+
+        self.hub.unsubscribe(self)
+        with self._not_empty:
+            self.is_closed = True
+            self._not_empty.notify_all()
@@ -1,4 +1,5 @@
 import functools
+from serialization import compile_converters
 from util import wraps
 
 READ    = 'read'
@@ -17,15 +18,41 @@ DEFAULT_ACCESS = {
     'execute': WRITE
 }
 
-def _make_decorator(maybe_func_or_access, types, method_type):
+# method types whose results can be cached
+CACHEABLE_METHOD_TYPES = ('read', 'lookup')
+
+DEFAULT_RESULT_CACHE_ENTRIES = 1024
+
+def _cache_options(cache, method_type):
+    """Validate and fill in the defaults of a method's result cache options"""
+
+    if cache is None:
+        return None
+
+    if method_type not in CACHEABLE_METHOD_TYPES:
+        raise ValueError("The results of '" + method_type + "' methods cannot be cached")
+
+    if cache is True:
+        cache = {}
+
+    return {
+        'ttl': cache.get('ttl', None),
+        'max_entries': cache.get('max_entries', DEFAULT_RESULT_CACHE_ENTRIES),
+        'key_args': None if cache.get('key_args', None) is None else tuple(cache['key_args'])
+    }
+
+def _make_decorator(maybe_func_or_access, types, method_type, cache=None):
     decorated_func = None
+    permission = DEFAULT_ACCESS[method_type]
 
     if callable(maybe_func_or_access):
         decorated_func = maybe_func_or_access
-    elif access is None and maybe_func_or_access is not None:
-        access = maybe_func_or_access
-    else:
-        access = DEFAULT_ACCESS[method_type]
+    elif maybe_func_or_access is not None:
+        permission = maybe_func_or_access
+
+    # compile the type declarations once, at decoration time
+    converters = compile_converters(types)
+    cache_options = _cache_options(cache, method_type)
 
     def _dec(func):
         @wraps(func)
@@ -36,6 +63,8 @@ def _make_decorator(maybe_func_or_access, types, method_type):
         _wrapped._permission  = permission
         _wrapped._method_type = method_type
         _wrapped._arg_types   = types
+        _wrapped._arg_converters = converters
+        _wrapped._cache = cache_options
 
         return _wrapped
 
@@ -44,8 +73,20 @@ def _make_decorator(maybe_func_or_access, types, method_type):
 def create(_arg=None, **types):
     return _make_decorator(_arg, types, 'create')
 
-def read(_arg=None, **types):
-    return _make_decorator(_arg, types, 'read')
+def read(_arg=None, _cache=None, **types):
+    """Export an instance method which reads from a resource.
+
+    Its results can be cached by the API with _cache, a dict of:
+        'ttl': the number of seconds a result is kept for (kept until evicted, by default)
+        'max_entries': the number of results to keep
+        'key_args': the names of the method's arguments (or of environment arguments) which its
+            result depends on (all of the method's arguments, by default)
+    or True for the default options. Results are cached per resource instance (for resources with
+    an identity method, or instances constructed by the API), and every cached result of a resource
+    is discarded when any of its instances are updated, deleted or committed, or any of its execute
+    methods are called. Access is still checked on every call.
+    """
+    return _make_decorator(_arg, types, 'read', _cache)
 
 def update(_arg=None, **types):
     return _make_decorator(_arg, types, 'update')
@@ -53,8 +94,9 @@ def update(_arg=None, **types):
 def delete(_arg=None, **types):
     return _make_decorator(_arg, types, 'delete')
 
-def lookup(_arg=None, **types):
-    return _make_decorator(_arg, types, 'lookup')
+def lookup(_arg=None, _cache=None, **types):
+    """Export a class method which reads from a resource. Its results can be cached, as per read."""
+    return _make_decorator(_arg, types, 'lookup', _cache)
 
 def execute(_arg=None, **types):
     return _make_decorator(_arg, types, 'execute')
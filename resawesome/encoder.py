@@ -0,0 +1,216 @@
+import collections
+import inspect
+import json
+import types
+
+# the kinds of values, which determine how they are encoded
+LEAF = 'leaf'
+RESOURCE = 'resource'
+MAPPING = 'mapping'
+SEQUENCE = 'sequence'
+CUSTOM = 'custom'
+
+# type -> kind, for builtin types
+BUILTIN_KINDS = {
+    int             : LEAF,
+    long            : LEAF,
+    float           : LEAF,
+    bool            : LEAF,
+    types.NoneType  : LEAF,
+    str             : LEAF,
+    unicode         : LEAF,
+    dict            : MAPPING,
+    list            : SEQUENCE,
+    tuple           : SEQUENCE,
+    set             : SEQUENCE,
+    frozenset       : SEQUENCE,
+    xrange          : SEQUENCE,
+    types.GeneratorType: SEQUENCE
+}
+
+def _classify(value):
+    """Determine the kind of a value whose type isn't in the dispatch table"""
+
+    if getattr(value, '_IS_RESOURCE', False):
+        return RESOURCE
+    elif isinstance(value, basestring):
+        # strings are iterable, but are encoded as they are
+        return LEAF
+    elif isinstance(value, collections.Mapping):
+        return MAPPING
+    elif isinstance(value, collections.Iterable):
+        return SEQUENCE
+
+    return LEAF
+
+def _mapping_parts(mapping):
+    """The pieces of JSON text of a mapping, with each of its values as a 1-tuple, to be encoded in its place"""
+
+    yield '{'
+    separator = ''
+    for key, value in mapping.iteritems():
+        yield separator + json.dumps(key if isinstance(key, basestring) else str(key)) + ': '
+        yield (value,)
+        separator = ', '
+    yield '}'
+
+def _sequence_parts(values, is_set):
+    """The pieces of JSON text of an iterable (tagged, if it is a set), with each of its values as a 1-tuple"""
+
+    yield '{"__type__": "set", "__value__": [' if is_set else '['
+    separator = ''
+    for value in values:
+        if separator:
+            yield separator
+        yield (value,)
+        separator = ', '
+    yield ']}' if is_set else ']'
+
+class Encoder(object):
+    """Encodes objects into serializable values, without recursing, dispatching on each value's exact type.
+
+    Mappings are encoded as dicts and other iterables as lists, with their values encoded, resources
+    are encoded by a serialize function, and every other value is left as it is. The kind of each
+    type is looked up in a dispatch table, and types which aren't in it are classified (with the
+    slower isinstance checks) the first time they are seen, and added to it.
+
+    Instances of old-style classes share a single type (InstanceType), which is never in the dispatch
+    table, so they are always looked up by their class, with _kind.
+
+    Encoders for other types can be registered, each returning a value which is encoded in its place.
+    """
+
+    def __init__(self):
+        # type -> kind
+        self._kinds = dict(BUILTIN_KINDS)
+        # type -> function transforming values of that type into a value to be encoded, for registered types
+        self._encoders = {}
+
+    def register(self, value_type, encoder):
+        """Encode values of a type (and its subclasses) with encoder(value), which returns the value to encode in its place"""
+
+        self._encoders[value_type] = encoder
+        self.reset()
+
+    def reset(self):
+        """Forget the kinds of the types seen so far, e.g. once classes have been attached to an API as resources"""
+
+        kinds = dict(BUILTIN_KINDS)
+        for value_type in self._encoders:
+            kinds[value_type] = CUSTOM
+        self._kinds = kinds
+
+    def _kind(self, value):
+        # the type of every instance of an old-style class is InstanceType, so they are told apart by their class
+        value_type = value.__class__
+        kind = self._kinds.get(value_type, None)
+        if kind is None:
+            kind = _classify(value)
+            if kind != RESOURCE:
+                # registered encoders apply to subclasses of their types
+                for base_type in inspect.getmro(value_type):
+                    if base_type in self._encoders:
+                        self._encoders[value_type] = self._encoders[base_type]
+                        kind = CUSTOM
+                        break
+            self._kinds[value_type] = kind
+
+        return kind
+
+    def encode(self, obj, serialize, keep_sets=False):
+        """Encode an object, serializing each resource in it with serialize(resource).
+
+        If keep_sets is True, sets are left as they are (to be tagged when dumped), rather than encoded as lists.
+        """
+
+        kinds = self._kinds
+        encoders = self._encoders
+
+        root = [obj]
+        # (value to encode, the container it is put in, its key or index in the container)
+        stack = [(obj, root, 0)]
+        while stack:
+            value, container, key = stack.pop()
+
+            kind = kinds.get(type(value), None)
+            if kind is None:
+                kind = self._kind(value)
+                kinds = self._kinds
+
+            if kind is LEAF:
+                container[key] = value
+                continue
+            elif kind is RESOURCE:
+                container[key] = serialize(value)
+                continue
+            elif kind is CUSTOM:
+                # encode the value which the registered encoder transforms this into
+                stack.append((encoders[value.__class__](value), container, key))
+                continue
+            elif keep_sets and isinstance(value, (set, frozenset)):
+                container[key] = value
+                continue
+
+            if kind is MAPPING:
+                encoded = dict(value)
+                items = encoded.iteritems()
+            else:
+                encoded = list(value)
+                items = enumerate(encoded)
+            container[key] = encoded
+
+            # values which aren't leaves are encoded in their place, in order
+            pending = [
+                (item_value, encoded, item_key)
+                for item_key, item_value in items
+                if kinds.get(type(item_value), None) is not LEAF
+            ]
+            pending.reverse()
+            stack.extend(pending)
+
+        return root[0]
+
+    def iter_json(self, obj, serialize, default):
+        """Encode an object as JSON text, yielding the pieces of the text as it is walked, without recursing.
+
+        Values are dispatched as per encode, but iterables are consumed lazily. Resources are dumped as
+        serialize(resource), sets are tagged as per serialization.get_encoder(wrap_types=True), and
+        leaves are dumped with default.
+        """
+
+        kinds = self._kinds
+        encoders = self._encoders
+
+        # the pieces of the containers being walked, innermost last
+        stack = [iter([(obj,)])]
+        while stack:
+            for piece in stack[-1]:
+                if not isinstance(piece, tuple):
+                    yield piece
+                    continue
+
+                value = piece[0]
+                while True:
+                    kind = kinds.get(type(value), None)
+                    if kind is None:
+                        kind = self._kind(value)
+                        kinds = self._kinds
+                    if kind is not CUSTOM:
+                        break
+                    value = encoders[value.__class__](value)
+
+                if kind is LEAF:
+                    yield json.dumps(value, default=default)
+                elif kind is RESOURCE:
+                    yield json.dumps(serialize(value), default=default)
+                elif kind is MAPPING:
+                    stack.append(_mapping_parts(value))
+                    break
+                elif type(value) in (list, tuple) and all(kinds.get(type(item), None) is LEAF for item in value):
+                    # lists of leaves are dumped at once
+                    yield json.dumps(value, default=default)
+                else:
+                    stack.append(_sequence_parts(value, isinstance(value, (set, frozenset))))
+                    break
+            else:
+                stack.pop()
@@ -0,0 +1,321 @@
+import argparse
+import json
+import sys
+
+from manifest import import_resource
+from resource import (
+    DEFAULT_CHUNK_SIZE,
+    ResourceNotFoundError,
+    ResourceMethodNotFoundError,
+    ResourceAccessDeniedError,
+    ResourceNotAllowedError,
+    ResourceArgumentError
+)
+from serialization import EncodedError, api_error_dict, binary_decode, binary_encode, get_encoder, json_decode, json_encode
+
+JSON_CONTENT_TYPE = 'application/json'
+BINARY_CONTENT_TYPE = 'application/x-resawesome-binary'
+DEFAULT_HOST = '127.0.0.1'
+DEFAULT_PORT = 8000
+CURSOR_PATH = '/_cursor'
+# the number of list items dumped by each call to the JSON encoder
+DUMP_BATCH_SIZE = 64
+# the request headers which responses with ETags vary by (those which environments are usually built from)
+DEFAULT_VARY = ('Authorization', 'Cookie')
+
+# content type -> function decoding a request body of that type
+BODY_DECODERS = {
+    JSON_CONTENT_TYPE  : json_decode,
+    BINARY_CONTENT_TYPE: binary_decode
+}
+
+class BadRequestError(ValueError):
+    pass
+
+class UnsupportedMediaTypeError(BadRequestError):
+    pass
+
+# error class -> response status, in order of precedence (any other error is a 500)
+ERROR_STATUSES = (
+    (ResourceNotFoundError, '404 Not Found'),
+    (ResourceMethodNotFoundError, '404 Not Found'),
+    (ResourceAccessDeniedError, '403 Forbidden'),
+    (ResourceNotAllowedError, '400 Bad Request'),
+    (ResourceArgumentError, '400 Bad Request'),
+    (BadRequestError, '400 Bad Request')
+)
+
+def _create(api, name, body, environment):
+    return api.create(name, body.get('create_method'), body.get('creation_args') or {}, body.get('methods'), environment, encode=False)
+
+def _read(api, name, body, environment):
+    return api.read(name, body.get('methods') or [], body.get('instance_args') or {}, environment, encode=False, fields=body.get('fields'), references=body.get('references', False), if_none_match=body.get('if_none_match'))
+
+def _update(api, name, body, environment):
+    return api.update(name, body.get('methods') or [], body.get('instance_args') or {}, environment, encode=False)
+
+def _delete(api, name, body, environment):
+    return api.delete(name, body.get('method'), body.get('instance_args') or {}, environment, encode=False)
+
+def _lookup(api, name, body, environment):
+    return api.lookup(name, body.get('methods') or [], environment, encode=False, fields=body.get('fields'), page_size=body.get('page_size'), references=body.get('references', False), if_none_match=body.get('if_none_match'))
+
+def _execute(api, name, body, environment):
+    return api.execute(name, body.get('methods') or [], environment, encode=False)
+
+def _next_page(api, name, body, environment):
+    return api.next_page(body.get('cursor'), environment, body.get('page_size'), encode=False)
+
+# operation -> function performing it with the arguments in a request body
+OPERATIONS = {
+    'create' : _create,
+    'read'   : _read,
+    'update' : _update,
+    'delete' : _delete,
+    'lookup' : _lookup,
+    'execute': _execute
+}
+
+_default_encoder = get_encoder(wrap_types=True)
+
+def _no_environment(environ):
+    return {}
+
+class Gateway(object):
+    """A WSGI application which performs API operations.
+
+    Each operation on a resource is routed from POST {prefix}/{resource name}/{operation}, with a
+    body holding its arguments, in the same form as the operations of API.batch:
+        'methods': the methods to call ('method' for the single method of a 'delete')
+        'instance_args': the instance arguments of a 'read', 'update' or 'delete'
+        'create_method' and 'creation_args': the creation method and arguments of a 'create'
+        'fields' (optional): the fields of each resource to encode in the result (see API.encode)
+        'page_size' (optional): the number of items in each page of a paginated 'lookup'
+        'references' (optional): whether to encode the result as a graph of references to resources
+        'if_none_match' (optional): the ETag of an earlier conditional 'read' or 'lookup' (see API.read),
+            which can also be sent as an If-None-Match header
+
+    Conditional reads and lookups respond with their ETag in an ETag header, and with 304 Not
+    Modified (and no body) if it matched. ETags depend on the environment, so these responses are
+    marked as private, and as varying by the request headers which environments are built from.
+
+    The following pages of a paginated lookup are taken from POST {prefix}/_cursor, with a body
+    holding the 'cursor' returned with the previous page (and, optionally, a 'page_size' and the
+    lookup's 'fields').
+
+    Bodies are decoded as tagged JSON, or in the binary format (see serialization), by their content
+    type. Results are encoded (see API.encode) and streamed back as chunks of tagged JSON text, or in the
+    binary format if the request accepts it.
+
+    Errors are responded with as {'error': error dict}, with a status by their class (see ERROR_STATUSES):
+    errors of the request (e.g. invalid arguments) are 4xx, and any other error (e.g. one raised by a
+    resource's method or hook) is a 500.
+
+    Routes are compiled when the gateway is created; compile_routes must be called again if
+    resources are attached to the API afterwards.
+
+    Args:
+        api (API): The API which performs the operations
+        environment (Callable[[dict], dict]): Builds the environment of an operation from the
+            WSGI environ of its request (e.g. authenticating the user)
+        prefix (str): The path under which the routes are mounted
+        chunk_size (int): The number of characters in each chunk of a JSON response
+        vary (List[str]): The request headers which environments are built from
+
+    """
+
+    def __init__(self, api, environment=_no_environment, prefix='', chunk_size=DEFAULT_CHUNK_SIZE, vary=DEFAULT_VARY):
+        self.api = api
+        self.environment = environment
+        self.prefix = prefix.rstrip('/')
+        self.chunk_size = chunk_size
+        self.vary = tuple(vary)
+
+        # path -> (resource name, operation function) lookup, for each route
+        self.routes = {}
+        self.compile_routes()
+
+    def compile_routes(self):
+        """Build the route of every operation on every resource attached to the API (lazily or not)"""
+
+        routes = {}
+        for name in set(self.api.resource_classes) | set(self.api.lazy_resources):
+            for operation, perform in OPERATIONS.iteritems():
+                routes[self.prefix + '/' + name + '/' + operation] = (name, perform)
+        routes[self.prefix + CURSOR_PATH] = (None, _next_page)
+
+        self.routes = routes
+
+    def __call__(self, environ, start_response):
+        route = self.routes.get(environ.get('PATH_INFO', ''), None)
+        if route is None:
+            return self._error(start_response, '404 Not Found', ResourceNotFoundError("'" + environ.get('PATH_INFO', '') + "' is not a resource operation"))
+
+        if environ.get('REQUEST_METHOD', 'GET') != 'POST':
+            return self._error(start_response, '405 Method Not Allowed', ResourceNotAllowedError('resource operations must be POSTed'), [('Allow', 'POST')])
+
+        name, perform = route
+        try:
+            body = _read_body(environ)
+            if environ.get('HTTP_IF_NONE_MATCH'):
+                body.setdefault('if_none_match', environ['HTTP_IF_NONE_MATCH'].strip().strip('"'))
+            environment = self.environment(environ)
+            result = perform(self.api, name, body, environment)
+        except UnsupportedMediaTypeError as err:
+            return self._error(start_response, '415 Unsupported Media Type', err)
+        except Exception as err:
+            return self._error(start_response, _error_status(err), err)
+
+        headers = []
+        if body.get('if_none_match') is not None and isinstance(result, dict) and 'not_modified' in result:
+            if result['etag'] is not None:
+                # ETags depend on the environment (e.g. the user), so they are only for the client's own cache
+                headers.extend([('ETag', '"' + result['etag'] + '"'), ('Cache-Control', 'private'), ('Vary', ', '.join(self.vary))])
+            if result['not_modified']:
+                start_response('304 Not Modified', headers)
+                return []
+
+        # encode the result before starting the response, so that failures are reported as errors
+        is_binary = BINARY_CONTENT_TYPE in environ.get('HTTP_ACCEPT', '')
+        try:
+            encoded = self.api.encode(result, environment, body.get('fields'), body.get('references', False))
+            if is_binary:
+                encoded = binary_encode(encoded)
+        except Exception as err:
+            # a result which can't be encoded is a fault of its resource, unless the request asked for an invalid encoding
+            return self._error(start_response, _error_status(err), err)
+
+        if is_binary:
+            start_response('200 OK', [('Content-Type', BINARY_CONTENT_TYPE), ('Content-Length', str(len(encoded)))] + headers)
+            return [encoded]
+
+        start_response('200 OK', [('Content-Type', JSON_CONTENT_TYPE)] + headers)
+        return _iter_json(encoded, self.chunk_size)
+
+    def _error(self, start_response, status, err, headers=()):
+        data = json_encode({'error': EncodedError(api_error_dict(err))})
+        start_response(status, [('Content-Type', JSON_CONTENT_TYPE), ('Content-Length', str(len(data)))] + list(headers))
+        return [data]
+
+def _read_body(environ):
+    """Decode the arguments of an operation from a request body"""
+
+    try:
+        length = int(environ.get('CONTENT_LENGTH') or 0)
+    except ValueError:
+        length = 0
+
+    if length <= 0:
+        return {}
+
+    content_type = environ.get('CONTENT_TYPE', '') or JSON_CONTENT_TYPE
+    decoder = BODY_DECODERS.get(content_type.split(';', 1)[0].strip(), None)
+    if decoder is None:
+        raise UnsupportedMediaTypeError("'" + content_type + "' is not a supported content type")
+
+    try:
+        body = decoder(environ['wsgi.input'].read(length))
+    except ValueError as err:
+        raise BadRequestError('the body of a resource operation could not be decoded: ' + str(err))
+    if not isinstance(body, dict):
+        raise BadRequestError('the body of a resource operation must be an object')
+
+    return body
+
+def _iter_json(encoded, chunk_size):
+    """Yield an encoded result as chunks of tagged JSON text, without holding all of its text in one string"""
+
+    buffered = []
+    buffered_size = 0
+    for piece in _json_pieces(encoded, True):
+        buffered.append(piece)
+        buffered_size += len(piece)
+        if buffered_size >= chunk_size:
+            yield ''.join(buffered)
+            buffered = []
+            buffered_size = 0
+
+    if buffered:
+        yield ''.join(buffered)
+
+def _json_pieces(encoded, is_top_level=False):
+    """Yields the pieces of JSON text which make up an encoded result.
+
+    Lists (and the top level dict, e.g. the result and commit of an update) are walked, and
+    every other value is dumped whole by the C encoder, rather than walking every value in
+    Python as json.JSONEncoder.iterencode does. Lists of anything other than lists are dumped
+    in runs of DUMP_BATCH_SIZE items.
+    """
+
+    if isinstance(encoded, list):
+        yield '['
+        if any(isinstance(val, list) for val in encoded):
+            is_first = True
+            for val in encoded:
+                if not is_first:
+                    yield ', '
+                is_first = False
+                for piece in _json_pieces(val):
+                    yield piece
+        else:
+            # dump runs of items together, as each call to the encoder has a fixed cost
+            for start in xrange(0, len(encoded), DUMP_BATCH_SIZE):
+                if start > 0:
+                    yield ', '
+                yield json.dumps(encoded[start:start + DUMP_BATCH_SIZE], default=_default_encoder)[1:-1]
+        yield ']'
+    elif is_top_level and isinstance(encoded, dict):
+        yield '{'
+        is_first = True
+        for key, val in encoded.iteritems():
+            if not is_first:
+                yield ', '
+            is_first = False
+            yield json.dumps(key if isinstance(key, basestring) else str(key)) + ': '
+            for piece in _json_pieces(val):
+                yield piece
+        yield '}'
+    else:
+        yield json.dumps(encoded, default=_default_encoder)
+
+def _error_status(err):
+    for error_class, status in ERROR_STATUSES:
+        if isinstance(err, error_class):
+            return status
+    return '500 Internal Server Error'
+
+def serve(app, host=DEFAULT_HOST, port=DEFAULT_PORT):
+    """Serve a WSGI application with the standard library's (single threaded) wsgiref server, for local testing"""
+
+    from wsgiref.simple_server import make_server
+
+    server = make_server(host, port, app)
+    try:
+        server.serve_forever()
+    finally:
+        server.server_close()
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Serve an API over HTTP with the wsgiref server, for local testing')
+    parser.add_argument('api', help="The API to serve, as 'module:attribute'")
+    parser.add_argument('--manifest', help='A resource manifest to load into the API lazily')
+    parser.add_argument('--environment', help="A function building operation environments from WSGI environs, as 'module:attribute'")
+    parser.add_argument('--prefix', default='', help='The path under which operations are routed')
+    parser.add_argument('--host', default=DEFAULT_HOST)
+    parser.add_argument('--port', type=int, default=DEFAULT_PORT)
+    args = parser.parse_args(argv)
+
+    api = import_resource(args.api)
+    if args.manifest:
+        api.load_manifest(args.manifest)
+
+    environment = _no_environment
+    if args.environment:
+        environment = import_resource(args.environment)
+
+    serve(Gateway(api, environment, args.prefix), args.host, args.port)
+
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
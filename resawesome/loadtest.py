@@ -0,0 +1,262 @@
+import argparse
+import json
+import math
+import multiprocessing
+import sys
+import threading
+import time
+
+from multiprocessing.pool import ThreadPool
+from timeit import default_timer
+
+import bus
+
+from manifest import import_resource
+from serialization import binary_encode, iter_binary_load
+
+# environment arguments containing any of these are left out of recordings
+DEFAULT_SCRUBBED = ('password', 'secret', 'token', 'auth', 'cookie', 'session', 'key')
+
+DEFAULT_CONCURRENCY = 8
+PERCENTILES = (50, 95, 99)
+
+def scrub_environment(environment, scrubbed=DEFAULT_SCRUBBED):
+    """Copy the plain (string, number, boolean or None) environment arguments whose names don't look secret"""
+
+    kept = {}
+    for name, value in environment.iteritems():
+        lower_name = name.lower()
+        if any(secret in lower_name for secret in scrubbed):
+            continue
+        if value is None or isinstance(value, (basestring, int, long, float, bool)):
+            kept[name] = value
+    return kept
+
+class Recorder(object):
+    """Records the API operations performed by an API (see API(recorder=...)) to a log, for replaying.
+
+    Each record is a dict of 'operation' (an API operation, or 'batch'), 'time' (seconds since the recorder was created),
+    'args' (the operation's arguments, other than its environment) and 'environment' (the
+    scrubbed environment), written in the binary format (see serialization). Operations whose
+    arguments can't be written in the binary format are skipped. Only operations made outside
+    of any other operation are recorded, including those made within a request or unit of work
+    (but not, e.g., those made by resource methods or by the operations of a batch).
+
+    Args:
+        output_file: The path or file-like object to write the log to
+        scrub (Callable[[dict], dict]): Copies the environment arguments which can be recorded
+
+    """
+
+    def __init__(self, output_file, scrub=scrub_environment):
+        if isinstance(output_file, basestring):
+            self._fp = open(output_file, 'ab')
+            self._owns_file = True
+        else:
+            self._fp = output_file
+            self._owns_file = False
+
+        self.scrub = scrub
+        self.recorded = 0
+        self.skipped = 0
+        self._start = default_timer()
+        self._lock = threading.Lock()
+
+    def record(self, operation, call_args):
+        """Record an operation, given its arguments by name"""
+
+        args = dict(call_args)
+        environment = args.pop('environment', None) or {}
+        record = {
+            'operation': operation,
+            'time': default_timer() - self._start,
+            'args': args,
+            'environment': self.scrub(environment)
+        }
+
+        try:
+            data = binary_encode(record)
+        except (TypeError, ValueError):
+            self.skipped += 1
+            return
+
+        with self._lock:
+            self._fp.write(data)
+            self._fp.flush()
+            self.recorded += 1
+
+    def close(self):
+        if self._owns_file:
+            self._fp.close()
+
+def read_log(log_file):
+    """Read the records of a log (a path or file-like object) written by a Recorder"""
+
+    if isinstance(log_file, basestring):
+        with open(log_file, 'rb') as fp:
+            return list(iter_binary_load(fp))
+
+    return list(iter_binary_load(log_file))
+
+def record_key(record):
+    """Label a record by its resource, operation and methods, e.g. 'thing.read(get,friend)'"""
+
+    args = record['args']
+    operation = record['operation']
+    if operation == 'batch':
+        return 'batch(' + ','.join(str(batched.get('name')) + '.' + str(batched.get('operation')) for batched in args.get('operations') or []) + ')'
+    elif operation == 'create':
+        methods = [args.get('create_method_name')] + list(args.get('methods') or [])
+    elif operation == 'delete':
+        methods = [args.get('method')]
+    else:
+        methods = args.get('methods') or []
+
+    labels = []
+    for method_data in methods:
+        labels.append(str(method_data.get('method')) if isinstance(method_data, dict) else str(method_data))
+
+    return str(args.get('name')) + '.' + operation + '(' + ','.join(labels) + ')'
+
+def _replay_record(api, record):
+    """Perform a recorded operation, returning its key, latency and whether it failed"""
+
+    kwargs = dict(record['args'])
+    kwargs['environment'] = record['environment']
+    operation = getattr(api, record['operation'])
+
+    start = default_timer()
+    try:
+        result = operation(**kwargs)
+        if kwargs.get('stream', False):
+            # streamed results are only encoded as they are consumed
+            for chunk in result:
+                pass
+        is_failed = False
+    except Exception:
+        is_failed = True
+
+    return record_key(record), default_timer() - start, is_failed
+
+def _replay_in_process(record):
+    # the API is set up in each worker process as per the service bus's process pools
+    return _replay_record(bus._process_api, record)
+
+def _paced(records, rate):
+    """Yield records, at most rate records per second (or as fast as possible, if rate is None)"""
+
+    start = default_timer()
+    for i, record in enumerate(records):
+        if rate is not None:
+            delay = start + i / float(rate) - default_timer()
+            if delay > 0:
+                time.sleep(delay)
+        yield record
+
+def percentile(sorted_values, percent):
+    """The nearest-rank percentile of a sorted list of values"""
+
+    if not sorted_values:
+        return None
+
+    # the smallest value with at least percent% of the values at or below it
+    rank = int(math.ceil(percent * len(sorted_values) / 100.0)) - 1
+    return sorted_values[min(max(rank, 0), len(sorted_values) - 1)]
+
+def _summary(latencies, errors):
+    latencies = sorted(latencies)
+    summary = {
+        'count': len(latencies),
+        'errors': errors,
+        'mean': sum(latencies) / len(latencies) if latencies else None
+    }
+    for percent in PERCENTILES:
+        summary['p' + str(percent)] = percentile(latencies, percent)
+    return summary
+
+def replay(api, records, concurrency=DEFAULT_CONCURRENCY, processes=False, rate=None):
+    """Replay recorded operations against an API, measuring their throughput and latency.
+
+    Args:
+        api (API): The API to perform the operations
+        records (List[dict]): The recorded operations (see read_log), performed in order of starting
+        concurrency (int): The number of operations performed at once
+        processes (bool): Whether to perform operations in (forked) worker processes, rather than threads
+        rate (float): The number of operations to start per second, or None to start them as fast as possible
+
+    Returns:
+        dict: {
+            'operations', 'errors', 'seconds', 'throughput' (operations per second),
+            'latency': {'count', 'errors', 'mean', 'p50', 'p95', 'p99'} (in seconds),
+            'calls': {resource.operation(methods): the same latency summary}
+        }
+
+    """
+
+    if processes:
+        pool = multiprocessing.Pool(concurrency, bus._init_process, (api,))
+        replay_record = _replay_in_process
+    else:
+        pool = ThreadPool(concurrency)
+        replay_record = lambda record: _replay_record(api, record)
+
+    # key -> latencies, and key -> error count
+    latencies = {}
+    errors = {}
+
+    start = default_timer()
+    try:
+        for key, latency, is_failed in pool.imap_unordered(replay_record, _paced(records, rate)):
+            latencies.setdefault(key, []).append(latency)
+            errors[key] = errors.get(key, 0) + (1 if is_failed else 0)
+    finally:
+        pool.close()
+        pool.join()
+    seconds = default_timer() - start
+
+    all_latencies = [latency for key_latencies in latencies.itervalues() for latency in key_latencies]
+    total_errors = sum(errors.itervalues())
+
+    return {
+        'operations': len(all_latencies),
+        'errors': total_errors,
+        'seconds': seconds,
+        'throughput': len(all_latencies) / seconds if seconds > 0 else None,
+        'latency': _summary(all_latencies, total_errors),
+        'calls': dict((key, _summary(key_latencies, errors[key])) for key, key_latencies in latencies.iteritems())
+    }
+
+def _milliseconds(seconds):
+    return '%10.2f' % (seconds * 1000.0) if seconds is not None else '%10s' % '-'
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Replay a log of recorded API operations, reporting throughput and latency percentiles')
+    parser.add_argument('api', help="The API to replay the operations against, as 'module:attribute'")
+    parser.add_argument('log', help='The log written by a Recorder')
+    parser.add_argument('--manifest', help='A resource manifest to load into the API lazily')
+    parser.add_argument('--concurrency', type=int, default=DEFAULT_CONCURRENCY, help='The number of operations performed at once')
+    parser.add_argument('--processes', action='store_true', help='Perform operations in worker processes, rather than threads')
+    parser.add_argument('--rate', type=float, help='The number of operations started per second (as fast as possible by default)')
+    parser.add_argument('--repeat', type=int, default=1, help='The number of times to replay the log')
+    parser.add_argument('--output', help='File to write the report to, as JSON')
+    args = parser.parse_args(argv)
+
+    api = import_resource(args.api)
+    if args.manifest:
+        api.load_manifest(args.manifest)
+
+    report = replay(api, read_log(args.log) * args.repeat, args.concurrency, args.processes, args.rate)
+
+    print '%d operations, %d errors in %.2fs: %.1f ops/sec' % (report['operations'], report['errors'], report['seconds'], report['throughput'] or 0)
+    print '%-40s %8s %8s %10s %10s %10s' % ('call', 'count', 'errors', 'p50 ms', 'p95 ms', 'p99 ms')
+    for key, summary in sorted(report['calls'].iteritems()) + [('(all)', report['latency'])]:
+        print '%-40s %8d %8d %s %s %s' % (key, summary['count'], summary['errors'], _milliseconds(summary['p50']), _milliseconds(summary['p95']), _milliseconds(summary['p99']))
+
+    if args.output:
+        with open(args.output, 'w') as output_file:
+            json.dump(report, output_file, indent=2, sort_keys=True)
+
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
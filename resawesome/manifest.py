@@ -0,0 +1,79 @@
+import argparse
+import importlib
+import json
+import sys
+
+MANIFEST_VERSION = 1
+
+def resource_path(cls):
+    """The dotted path ('module:ClassName') from which a resource class can be imported"""
+    return cls.__module__ + ':' + cls.__name__
+
+def import_resource(path):
+    """Import a resource class from its dotted path ('module:ClassName' or 'module.ClassName')"""
+
+    if ':' in path:
+        module_name, class_name = path.split(':', 1)
+    else:
+        module_name, class_name = path.rsplit('.', 1)
+
+    module = importlib.import_module(module_name)
+    return getattr(module, class_name)
+
+def generate_manifest(api, modules=()):
+    """Generate a manifest of the resources attached to an API, after importing the modules which define them.
+
+    Args:
+        api (API): The API to describe
+        modules (List[str]): The modules to import, which attach their resources to the API
+
+    Returns:
+        dict: {'version': 1, 'resources': {name: {'path', 'is_transactional', 'is_cacheable'}}}
+
+    """
+
+    for module_name in modules:
+        importlib.import_module(module_name)
+
+    resources = {}
+    for name, cls in api.resource_classes.iteritems():
+        resources[name] = {
+            'path': resource_path(cls),
+            'is_transactional': api.is_transactional.get(name, True),
+            'is_cacheable': api.is_cacheable.get(name, False)
+        }
+
+    return {
+        'version': MANIFEST_VERSION,
+        'resources': resources
+    }
+
+def write_manifest(manifest, fp):
+    json.dump(manifest, fp, indent=2, sort_keys=True)
+
+def read_manifest(fp):
+    manifest = json.load(fp)
+    if manifest.get('version', None) != MANIFEST_VERSION:
+        raise ValueError("Unsupported resource manifest version: " + repr(manifest.get('version', None)))
+    return manifest
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Generate a manifest of the resources attached to an API, for lazy registration')
+    parser.add_argument('api', help="The API to describe, as 'module:attribute'")
+    parser.add_argument('modules', nargs='*', help='The modules which attach resources to the API')
+    parser.add_argument('--output', '-o', help='File to write the manifest to (stdout by default)')
+    args = parser.parse_args(argv)
+
+    manifest = generate_manifest(import_resource(args.api), args.modules)
+
+    if args.output:
+        with open(args.output, 'w') as output_file:
+            write_manifest(manifest, output_file)
+    else:
+        write_manifest(manifest, sys.stdout)
+        sys.stdout.write('\n')
+
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,136 @@
+import bisect
+import threading
+
+# the upper bounds (in seconds) of each latency histogram bucket
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+# the phases of an API call which are timed
+PHASES = ('access', 'coercion', 'call', 'encode', 'commit')
+
+class Metrics(object):
+    """Records call counts, latency histograms and error counts of an API's calls.
+
+    Latencies are split by resource name, method name and phase (access, coercion, call, encode
+    or commit), and errors by resource name, method name and exception class. Phases which cover
+    a whole call, rather than a single method (encode, commit), are recorded with an empty method name.
+
+    Args:
+        buckets (List[float]): The upper bounds (in seconds) of the latency histogram buckets
+
+    """
+
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.buckets = tuple(sorted(buckets))
+
+        # (resource, method, phase) -> [bucket counts (with a final +Inf bucket), sum, count]
+        self._latencies = {}
+        # (resource, method, error class name) -> count
+        self._errors = {}
+        self._lock = threading.Lock()
+
+    def observe(self, resource, method, phase, seconds):
+        """Record the latency of a phase of a call"""
+
+        key = (resource, method, phase)
+        bucket = bisect.bisect_left(self.buckets, seconds)
+        with self._lock:
+            latency = self._latencies.get(key, None)
+            if latency is None:
+                latency = self._latencies[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            latency[0][bucket] += 1
+            latency[1] += seconds
+            latency[2] += 1
+
+    def error(self, resource, method, err):
+        """Record an error raised by a call"""
+
+        key = (resource, method, type(err).__name__)
+        with self._lock:
+            self._errors[key] = self._errors.get(key, 0) + 1
+
+    def reset(self):
+        with self._lock:
+            self._latencies.clear()
+            self._errors.clear()
+
+    def snapshot(self):
+        """A JSON serializable snapshot of the recorded metrics.
+
+        Returns:
+            dict: {
+                'latency': [{'resource', 'method', 'phase', 'count', 'sum', 'buckets': {upper bound: cumulative count}}],
+                'errors': [{'resource', 'method', 'error', 'count'}]
+            }
+
+        """
+
+        with self._lock:
+            latencies = [(key, list(latency[0]), latency[1], latency[2]) for key, latency in self._latencies.iteritems()]
+            errors = list(self._errors.iteritems())
+
+        snapshot = {
+            'latency': [],
+            'errors': []
+        }
+
+        for (resource, method, phase), bucket_counts, total, count in sorted(latencies):
+            snapshot['latency'].append({
+                'resource': resource,
+                'method': method,
+                'phase': phase,
+                'count': count,
+                'sum': total,
+                'buckets': dict(zip(self._bucket_labels(), _cumulative(bucket_counts)))
+            })
+
+        for (resource, method, error), count in sorted(errors):
+            snapshot['errors'].append({
+                'resource': resource,
+                'method': method,
+                'error': error,
+                'count': count
+            })
+
+        return snapshot
+
+    def prometheus(self, prefix='resawesome'):
+        """The recorded metrics in the Prometheus text exposition format"""
+
+        snapshot = self.snapshot()
+        bucket_labels = self._bucket_labels()
+
+        lines = [
+            '# HELP ' + prefix + '_phase_seconds Latency of each phase of resource method calls',
+            '# TYPE ' + prefix + '_phase_seconds histogram'
+        ]
+        for latency in snapshot['latency']:
+            labels = _labels(resource=latency['resource'], method=latency['method'], phase=latency['phase'])
+            for bucket_label in bucket_labels:
+                lines.append(prefix + '_phase_seconds_bucket{' + labels + ',le="' + bucket_label + '"} ' + str(latency['buckets'][bucket_label]))
+            lines.append(prefix + '_phase_seconds_sum{' + labels + '} ' + repr(latency['sum']))
+            lines.append(prefix + '_phase_seconds_count{' + labels + '} ' + str(latency['count']))
+
+        lines.append('# HELP ' + prefix + '_errors_total Errors raised by resource method calls')
+        lines.append('# TYPE ' + prefix + '_errors_total counter')
+        for error in snapshot['errors']:
+            labels = _labels(resource=error['resource'], method=error['method'], error=error['error'])
+            lines.append(prefix + '_errors_total{' + labels + '} ' + str(error['count']))
+
+        return '\n'.join(lines) + '\n'
+
+    def _bucket_labels(self):
+        return [repr(bucket) for bucket in self.buckets] + ['+Inf']
+
+def _cumulative(bucket_counts):
+    total = 0
+    cumulative = []
+    for bucket_count in bucket_counts:
+        total += bucket_count
+        cumulative.append(total)
+    return cumulative
+
+def _escape(value):
+    return unicode(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+def _labels(**labels):
+    return ','.join(name + '="' + _escape(value) + '"' for name, value in sorted(labels.iteritems()))
@@ -0,0 +1,106 @@
+from collections import namedtuple
+
+from decorators import DEFAULT_ACCESS
+from util import getargspec
+
+CALLABLE = 'callable'
+PROPERTY = 'property'
+
+# An immutable description of how to call a single method on a resource class.
+#   name:        the attribute name of the method
+#   kind:        CALLABLE or PROPERTY
+#   args:        tuple of (arg_name, is_sendable, converter) triples, in call order, where converter
+#                converts a sent value into its declared type (or is None if it has no declared type)
+#   method_type: the decorated method type (e.g. 'read', 'lookup') or None
+#   permission:  the permission required to call this method, or None
+#   arg_types:   the type declarations recorded by the method's decorator
+#   cache:       the result cache options recorded by the method's decorator (see decorators.read), or None
+CallPlan = namedtuple('CallPlan', ['name', 'kind', 'args', 'method_type', 'permission', 'arg_types', 'cache'])
+
+# An immutable set of call plans for a resource class.
+#   name:         the name of the resource (or of the class, if it isn't a named resource)
+#   cls:          the resource class
+#   methods:      dict of exported method/property name -> CallPlan
+#   unexported:   frozenset of callable attribute names which are not exported
+#   access:       CallPlan for the instance access method, or None
+#   class_access: CallPlan for the class access method, or None
+#   access_level: CallPlan for the access level method, or None
+#   serializer:   CallPlan for the serialization method, or None
+#   commit:       CallPlan for the commit method, or None
+#   identity:     CallPlan for the identity method, or None
+#   version:      CallPlan for the version method, or None
+#   commit_many:  CallPlan for the class method committing many instances, or None
+#   class_version: CallPlan for the class version method, or None
+ResourcePlan = namedtuple('ResourcePlan', ['name', 'cls', 'methods', 'unexported', 'access', 'class_access', 'access_level', 'serializer', 'commit', 'identity', 'version', 'commit_many', 'class_version'])
+
+def _plan_args(func):
+    converters = getattr(func, '_arg_converters', None) or {}
+    args = []
+    for i, arg_name in enumerate(getargspec(func).args):
+        if i == 0 and (arg_name == 'self' or arg_name == 'cls'):
+            continue # these don't get passed in
+        args.append((arg_name, not arg_name.startswith('_'), converters.get(arg_name, None)))
+    return tuple(args)
+
+def plan_call(cls, name):
+    """Build a CallPlan for the attribute 'name' of a class, or None if it is not callable"""
+
+    attr = getattr(cls, name, None)
+    if isinstance(attr, property):
+        return CallPlan(name, PROPERTY, (), 'read', DEFAULT_ACCESS['read'], {}, None)
+    elif attr is None or not callable(attr):
+        return None
+
+    return CallPlan(
+        name,
+        CALLABLE,
+        _plan_args(attr),
+        getattr(attr, '_method_type', None),
+        getattr(attr, '_permission', None),
+        getattr(attr, '_arg_types', None) or {},
+        getattr(attr, '_cache', None)
+    )
+
+def plan_resource(cls, api, name=None):
+    """Build a ResourcePlan for a resource class, using the method names configured on an API"""
+
+    methods = {}
+    unexported = set()
+    for attr_name in dir(cls):
+        if attr_name in api.method_names:
+            continue
+
+        attr = getattr(cls, attr_name, None)
+        if isinstance(attr, property) or getattr(attr, '_is_exported', False):
+            methods[attr_name] = plan_call(cls, attr_name)
+        elif callable(attr):
+            unexported.add(attr_name)
+
+    return ResourcePlan(
+        cls.__name__ if name is None else name,
+        cls,
+        methods,
+        frozenset(unexported),
+        plan_call(cls, api.access_method_name),
+        plan_call(cls, api.class_access_method_name),
+        plan_call(cls, api.access_level_method_name),
+        plan_call(cls, api.serialization_method_name),
+        plan_call(cls, api.commit_method_name),
+        plan_call(cls, api.identity_method_name),
+        plan_call(cls, api.version_method_name),
+        plan_call(cls, api.commit_many_method_name),
+        plan_call(cls, api.class_version_method_name)
+    )
+
+def plan_args(call_plan, sent_args, custom_args):
+    """Equivalent to util.populate_args, using the precomputed arguments of a CallPlan"""
+
+    kwargs = {}
+    for arg_name, is_sendable, converter in call_plan.args:
+        if arg_name in custom_args:
+            kwargs[arg_name] = custom_args[arg_name]
+        elif is_sendable and arg_name in sent_args:
+            value = sent_args[arg_name]
+            kwargs[arg_name] = value if converter is None else converter(value)
+
+    return kwargs
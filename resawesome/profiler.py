@@ -0,0 +1,179 @@
+import os
+import random
+import sys
+import threading
+import time
+
+from timeit import default_timer
+
+SAMPLE = 'sample'
+TRACE = 'trace'
+
+DEFAULT_ENVIRONMENT_KEY = '_profile'
+DEFAULT_INTERVAL = 0.001
+
+def _frame_label(code):
+    return code.co_name + ' (' + os.path.basename(code.co_filename) + ':' + str(code.co_firstlineno) + ')'
+
+def _sampled_stack(frame, entry_frame):
+    """The labels of a sampled thread's frames, outermost first, up to (but excluding) the profiled call's entry frame"""
+
+    labels = []
+    while frame is not None and frame is not entry_frame:
+        labels.append(_frame_label(frame.f_code))
+        frame = frame.f_back
+
+    if frame is None:
+        # the thread has already returned from the profiled call
+        return None
+
+    labels.reverse()
+    return labels
+
+class Profiler(object):
+    """Profiles individual API calls, aggregating their stacks per resource and operation.
+
+    A call is profiled if its environment has a true environment_key, or, at random, for a
+    sample_rate fraction of calls. Profiled calls are either sampled (their thread's stack is
+    recorded every interval seconds, by a background thread) or traced (every function call and
+    return is recorded with sys.setprofile, the hook used by cProfile, which is slower but exact).
+
+    Stacks are aggregated as collapsed stacks, 'resource;operation;frame;frame... weight', where
+    the weight is the number of samples, or the microseconds spent in the innermost frame when
+    traced, which can be turned into a flamegraph (e.g. with flamegraph.pl).
+
+    Args:
+        mode (str): SAMPLE or TRACE
+        sample_rate (float): The fraction of calls to profile, besides those requested by their environment
+        environment_key (str): The environment argument which requests that a call is profiled
+        interval (float): The number of seconds between samples, when sampling
+
+    """
+
+    def __init__(self, mode=SAMPLE, sample_rate=0.0, environment_key=DEFAULT_ENVIRONMENT_KEY, interval=DEFAULT_INTERVAL):
+        if mode not in (SAMPLE, TRACE):
+            raise ValueError("'" + str(mode) + "' is not a profiling mode")
+
+        self.mode = mode
+        self.sample_rate = sample_rate
+        self.environment_key = environment_key
+        self.interval = interval
+
+        # collapsed stack -> weight
+        self.stacks = {}
+        self._lock = threading.Lock()
+
+        # thread ident -> (entry frame, stack prefix), of the calls being sampled
+        self._sampled = {}
+        self._sampler = None
+        # thread idents of the calls being profiled
+        self._profiling = set()
+
+    def should_profile(self, environment):
+        if environment and environment.get(self.environment_key, False):
+            return True
+        return self.sample_rate > 0 and random.random() < self.sample_rate
+
+    def is_profiling(self):
+        """Whether a call is already being profiled in this thread"""
+        return threading.current_thread().ident in self._profiling
+
+    def profile(self, prefix, func, *args, **kwargs):
+        """Call func, profiling it, with its stacks prefixed by the given labels (e.g. resource and operation)"""
+
+        ident = threading.current_thread().ident
+        self._profiling.add(ident)
+        try:
+            if self.mode == TRACE:
+                return self._trace(prefix, func, args, kwargs)
+            return self._sample(ident, prefix, func, args, kwargs)
+        finally:
+            self._profiling.discard(ident)
+
+    def _sample(self, ident, prefix, func, args, kwargs):
+        entry_frame = sys._getframe()
+        with self._lock:
+            self._sampled[ident] = (entry_frame, prefix)
+            if self._sampler is None:
+                self._sampler = threading.Thread(target=self._sample_threads, name='resawesome-profiler')
+                self._sampler.daemon = True
+                self._sampler.start()
+
+        try:
+            return func(*args, **kwargs)
+        finally:
+            with self._lock:
+                del self._sampled[ident]
+
+    def _sample_threads(self):
+        while True:
+            with self._lock:
+                if not self._sampled:
+                    self._sampler = None
+                    return
+                sampled = self._sampled.items()
+
+            frames = sys._current_frames()
+            for ident, (entry_frame, prefix) in sampled:
+                labels = _sampled_stack(frames.get(ident, None), entry_frame)
+                if labels:
+                    self._add(prefix + labels, 1)
+
+            # release the frames, so that they aren't kept alive while sleeping
+            frames = None
+            time.sleep(self.interval)
+
+    def _trace(self, prefix, func, args, kwargs):
+        # [label, start time, time spent in callees] of each frame being run, outermost first
+        frames = []
+        # collapsed stack -> microseconds
+        weights = {}
+
+        def _on_event(frame, event, arg):
+            if event == 'call':
+                frames.append([_frame_label(frame.f_code), default_timer(), 0.0])
+            elif event == 'c_call':
+                frames.append(['<' + getattr(arg, '__name__', '?') + '>', default_timer(), 0.0])
+            elif frames and (event == 'return' or event == 'c_return' or event == 'c_exception'):
+                elapsed = default_timer() - frames[-1][1]
+                stack = ';'.join(prefix + [label for label, start, callees in frames])
+                weights[stack] = weights.get(stack, 0.0) + elapsed - frames[-1][2]
+                frames.pop()
+                if frames:
+                    frames[-1][2] += elapsed
+
+        previous = sys.getprofile()
+        sys.setprofile(_on_event)
+        try:
+            return func(*args, **kwargs)
+        finally:
+            sys.setprofile(previous)
+            with self._lock:
+                for stack, seconds in weights.iteritems():
+                    self.stacks[stack] = self.stacks.get(stack, 0) + int(round(seconds * 1e6))
+
+    def _add(self, labels, weight):
+        stack = ';'.join(labels)
+        with self._lock:
+            self.stacks[stack] = self.stacks.get(stack, 0) + weight
+
+    def collapsed(self):
+        """The aggregated stacks, as lines of the collapsed stack format"""
+
+        with self._lock:
+            stacks = sorted(self.stacks.iteritems())
+        return [stack + ' ' + str(weight) for stack, weight in stacks if weight > 0]
+
+    def dump(self, output_file):
+        """Write the aggregated stacks to a file (a path or file-like object), in the collapsed stack format"""
+
+        lines = ''.join(line + '\n' for line in self.collapsed())
+        if isinstance(output_file, basestring):
+            with open(output_file, 'w') as fp:
+                fp.write(lines)
+        else:
+            output_file.write(lines)
+
+    def reset(self):
+        with self._lock:
+            self.stacks.clear()
@@ -1,16 +1,50 @@
 import functools
 import collections
+import contextlib
+import hashlib
+import inspect
+import itertools
+import json
+import re
 import sys
-
-from util import populate_args
+import threading
+
+from multiprocessing.pool import ThreadPool
+from timeit import default_timer
+
+from access import DEFAULT_KEY_ARGS, MISSING
+from cache import ResultCache
+from decorators import DEFAULT_ACCESS
+from encoder import Encoder
+from manifest import import_resource, read_manifest
+from plans import PROPERTY, plan_resource, plan_args
+from scope import RequestScope
+from serialization import get_encoder
+from unitofwork import UnitOfWork
+from util import argument_error, compile_field_mask, copy_containers, freeze, getargspec, instance_key
 
 DEFAULT_ROOT = None
 DEFAULT_COMMIT_METHOD_NAME = '_commit'
+DEFAULT_COMMIT_MANY_METHOD_NAME = '_commit_many'
 DEFAULT_ACCESS_METHOD_NAME = '_has_access'
 DEFAULT_CLASS_ACCESS_METHOD_NAME = '_has_class_access'
 DEFAULT_SERIALIZATION_METHOD_NAME = '_serialize'
 DEFAULT_ACCESS_LEVEL_METHOD_NAME = '_access_level'
+DEFAULT_IDENTITY_METHOD_NAME = '_identity'
+DEFAULT_VERSION_METHOD_NAME = '_version'
+DEFAULT_CLASS_VERSION_METHOD_NAME = '_class_version'
 DEFAULT_PERMISSION_ORDER = ['write', 'read']
+DEFAULT_CHUNK_SIZE = 8192
+
+# operation -> allowed method types, for operations performed in a batch
+DEFAULT_ALLOWED_METHOD_TYPES = {
+    'create' : ('read', 'update', 'create'),
+    'read'   : ('read',),
+    'update' : ('read', 'update', 'delete'),
+    'delete' : ('delete',),
+    'lookup' : ('lookup',),
+    'execute': ('execute',)
+}
 
 class ResourceNotFoundError(ImportError):
     pass
@@ -27,6 +61,106 @@ class ResourceNotAllowedError(Exception):
 class ResourceMethodFailedError(Exception):
     pass
 
+class ResourceCursorNotFoundError(ResourceNotFoundError):
+    pass
+
+class ResourceArgumentError(ValueError):
+    """Raised for operations sent invalid arguments, e.g. instance arguments which a resource can't be constructed with"""
+    pass
+
+def _method_error(error_class, message, method_name, sent_arguments, original_err=None, trace=None):
+    err = error_class(message)
+    err.method = method_name
+    err.args = sent_arguments
+    if original_err is not None:
+        err.error = original_err
+        err.trace = trace
+    return err
+
+# returned for methods which produce no result (properties which aren't set)
+_NO_RESULT = object()
+
+def _independent_groups(items):
+    """Groups a list of operations or methods into lists of adjacent items which can be run together.
+
+    Items marked as independent (dicts with a true 'independent' key) are grouped with adjacent
+    independent items, every other item is in a group of its own.
+    """
+
+    def _is_independent(item):
+        return isinstance(item, collections.Mapping) and item.get('independent', False)
+
+    group = []
+    for item in items:
+        if group and not (_is_independent(item) and _is_independent(group[-1])):
+            yield group
+            group = []
+        group.append(item)
+
+    if group:
+        yield group
+
+def _request_scoped(method):
+    """Runs an API method within a request scope (joining the current one, if there is one),
+    profiling it if the API has a profiler which chooses to profile it, and recording it if the
+    API has a recorder and it is an operation made outside of any other operation (whether or not
+    it is made within a request)"""
+
+    # the position of the environment argument, not counting self
+    environment_index = getargspec(method).args.index('environment') - 1
+    is_recorded = method.__name__ in DEFAULT_ALLOWED_METHOD_TYPES or method.__name__ == 'batch'
+
+    @functools.wraps(method)
+    def _wrapped(self, *args, **kwargs):
+        # the number of API methods being called in this thread, outside of this one
+        depth = getattr(self._local, 'depth', 0)
+        if is_recorded and depth == 0 and self.recorder is not None:
+            call_args = inspect.getcallargs(method, self, *args, **kwargs)
+            del call_args['self']
+            self.recorder.record(method.__name__, call_args)
+
+        self._local.depth = depth + 1
+        try:
+            with self.request():
+                profiler = self.profiler
+                if profiler is not None and not profiler.is_profiling():
+                    environment = args[environment_index] if len(args) > environment_index else kwargs.get('environment')
+                    if profiler.should_profile(environment):
+                        return profiler.profile(_profile_prefix(method, self, args, kwargs), method, self, *args, **kwargs)
+
+                return method(self, *args, **kwargs)
+        finally:
+            self._local.depth = depth
+
+    return _wrapped
+
+def _method_label(method_data):
+    if isinstance(method_data, basestring):
+        return method_data
+    elif isinstance(method_data, collections.Mapping):
+        return str(method_data.get('method'))
+    return str(method_data)
+
+def _profile_prefix(method, api, args, kwargs):
+    """The labels of a profiled API call: its resource name, and its operation and methods"""
+
+    call_args = inspect.getcallargs(method, api, *args, **kwargs)
+    if method.__name__ == 'batch':
+        operations = call_args['operations']
+        return ['batch', 'batch(' + ','.join(str(operation.get('name')) + '.' + str(operation.get('operation')) for operation in operations) + ')']
+
+    if 'name' not in call_args:
+        return [method.__name__]
+
+    if method.__name__ == 'create':
+        methods = [call_args['create_method_name']] + list(call_args['methods'] or [])
+    elif method.__name__ == 'delete':
+        methods = [call_args['method']]
+    else:
+        methods = call_args['methods'] or []
+
+    return [str(call_args['name']), method.__name__ + '(' + ','.join(_method_label(method_data) for method_data in methods) + ')']
+
 class API(object):
     """Defines an API to which resource classes are attached.
 
@@ -46,9 +180,32 @@ class API(object):
 
         execute: Performs updates/mutations by calling class methods (static methods)
 
+        batch: Performs many of the above operations in a single call
+
     Helpers:
         encode: Transforms an object into a serializable form, encoding any embedded resource
                 classes using the access restrictions requied by a given environment
+
+        iter_encode: Transforms an object into chunks of JSON text, lazily encoding it as per encode
+
+        register_encoder: Adds a function to encode values of a (non-resource) type with encode
+
+        invalidate_plans: Rebuilds the precompiled call plans of resource classes which have
+                been modified at runtime
+
+        register_lazy: Adds a resource by the dotted path of its class, to be imported on first use
+
+        load_manifest: Adds the resources in a manifest file (see manifest.generate_manifest) lazily
+
+        warm_up: Imports and plans lazily added resources ahead of their first use
+
+        request: A context manager which shares state (e.g. cached access decisions) between
+                the API calls made while handling a single request
+
+        unit_of_work: A context manager which defers commits, so that changed instances are
+                committed together when flushed
+
+        next_page: Continues a paginated lookup from its cursor
     """
 
     def __init__(
@@ -59,7 +216,19 @@ class API(object):
         class_access_method_name=DEFAULT_CLASS_ACCESS_METHOD_NAME,
         serialization_method_name=DEFAULT_SERIALIZATION_METHOD_NAME,
         access_level_method_name=DEFAULT_ACCESS_LEVEL_METHOD_NAME,
-        permission_order=DEFAULT_PERMISSION_ORDER
+        permission_order=DEFAULT_PERMISSION_ORDER,
+        identity_method_name=DEFAULT_IDENTITY_METHOD_NAME,
+        version_method_name=DEFAULT_VERSION_METHOD_NAME,
+        access_cache=None,
+        view_cache=None,
+        metrics=None,
+        instance_cache=None,
+        commit_many_method_name=DEFAULT_COMMIT_MANY_METHOD_NAME,
+        cursor_store=None,
+        profiler=None,
+        recorder=None,
+        changes=None,
+        class_version_method_name=DEFAULT_CLASS_VERSION_METHOD_NAME
     ):
         """Create and configure a new API to which resource classes can be attached.
 
@@ -79,6 +248,27 @@ class API(object):
                 access permission for a given environment and resource class
             permission_order (List[str]): The order in which to evaluate permissions, if no access level
                 method is defined on a resource class
+            identity_method_name (str): The name of the (optional) method used to identify resource
+                instances, returning a hashable value which is unique within its resource class
+            version_method_name (str): The name of the (optional) method used to get the current version
+                (e.g. a revision number or etag) of a resource instance
+            access_cache (AccessCache): A cache of access decisions, or None to evaluate access on every call
+            view_cache (ViewCache): A cache of the serialized views of resources which define identity and
+                version methods, or None to serialize resources every time they are encoded
+            metrics (Metrics): Records the latency and errors of each phase of API calls, or None to not record them
+            instance_cache (InstanceCache): A cache of the instances of cacheable resources, shared across
+                requests, or None to construct instances in each request
+            commit_many_method_name (str): The name of the (optional) class method used to commit many instances
+                of a resource class at once, returning a list of their results (or errors) in order
+            cursor_store (CursorStore): Holds the iterators of paginated lookups between requests, or None
+                to not paginate lookups
+            profiler (Profiler): Profiles the API calls which it chooses to (see Profiler), or None to not profile calls
+            recorder (Recorder): Records the operations made on the API, for replaying (see loadtest), or None
+                to not record them
+            changes (ChangeHub): Publishes the changes to resource instances as they are committed, or None to
+                not publish them
+            class_version_method_name (str): The name of the (optional) class method used to get the current
+                version of a resource's lookups, for conditional lookups
 
         """
 
@@ -87,20 +277,63 @@ class API(object):
         self.access_method_name = access_method_name
         self.class_access_method_name = class_access_method_name
         self.serialization_method_name = serialization_method_name
+        self.access_level_method_name = access_level_method_name
         self.permission_order = permission_order
-
-        self.method_names = set([commit_method_name, access_method_name, class_access_method_name, serialization_method_name])
+        self.identity_method_name = identity_method_name
+        self.version_method_name = version_method_name
+        self.access_cache = access_cache
+        self.view_cache = view_cache
+        self.metrics = metrics
+        self.instance_cache = instance_cache
+        self.commit_many_method_name = commit_many_method_name
+        self.cursor_store = cursor_store
+        self.profiler = profiler
+        self.recorder = recorder
+        self.changes = changes
+        self.class_version_method_name = class_version_method_name
+
+        self.method_names = set([
+            commit_method_name,
+            access_method_name,
+            class_access_method_name,
+            serialization_method_name,
+            access_level_method_name,
+            identity_method_name,
+            version_method_name,
+            commit_many_method_name,
+            class_version_method_name
+        ])
 
         # name -> class lookup for each resource
         self.resource_classes = {}
         # name -> bool lookup, determines if a resource is transactional        
         self.is_transactional = {}
-
-    def resource(self, cls=None, name=None, is_transactional=True):
-        """Configurable decorator to apply to resource classes, to add them to this API"""
+        # name -> bool lookup, determines if a resource's instances can be cached across requests
+        self.is_cacheable = {}
+        # name -> (dotted class path, is_transactional, is_cacheable) lookup, for resources not yet imported
+        self.lazy_resources = {}
+        self._lazy_lock = threading.RLock()
+        # name -> ResourcePlan lookup, the precompiled call plans for each resource
+        self.resource_plans = {}
+        # class -> ResourcePlan lookup, for resolving plans of encoded instances
+        self._class_plans = {}
+        # holds the RequestScope of the request being handled by each thread
+        self._local = threading.local()
+        # encodes results, with any encoders registered for other types
+        self.encoder = Encoder()
+        # name -> (method name -> ResultCache) lookup, for methods whose results are cached
+        self.result_caches = {}
+        self._result_cache_lock = threading.Lock()
+
+    def resource(self, cls=None, name=None, is_transactional=True, is_cacheable=False):
+        """Configurable decorator to apply to resource classes, to add them to this API
+
+        Instances of cacheable resources are kept in the API's instance cache (if it has one) between
+        requests, and read without being constructed again.
+        """
 
         if cls is None:
-            return functools.partial(self.resource, name=name, is_transactional=is_transactional)
+            return functools.partial(self.resource, name=name, is_transactional=is_transactional, is_cacheable=is_cacheable)
 
         if name is None:
             if self.module_root is not None:
@@ -109,219 +342,1010 @@ class API(object):
                 name = cls.__module__ + '.' + cls.__name__
 
         cls._IS_RESOURCE = True
+        # the encoder may have seen instances of this class before it was a resource
+        self.encoder.reset()
 
         self.resource_classes[name] = cls
         self.is_transactional[name] = is_transactional
+        self.is_cacheable[name] = is_cacheable
+        self.resource_plans[name] = self._class_plans[cls] = plan_resource(cls, self, name)
+        self.lazy_resources.pop(name, None)
 
         return cls
 
+    def register_lazy(self, name, path, is_transactional=True, is_cacheable=False):
+        """Add a resource by the dotted path of its class ('module:ClassName'), without importing it.
+
+        The class is imported and planned the first time the resource is used. If importing its
+        module attaches it to this API, that registration is used, otherwise it is attached with
+        the given name and options.
+        """
+
+        if name not in self.resource_classes:
+            self.lazy_resources[name] = (path, is_transactional, is_cacheable)
+
+    def load_manifest(self, manifest_file):
+        """Lazily add every resource in a manifest file (a path or file-like object)"""
+
+        if isinstance(manifest_file, basestring):
+            with open(manifest_file) as fp:
+                manifest = read_manifest(fp)
+        else:
+            manifest = read_manifest(manifest_file)
+
+        for name, entry in manifest['resources'].iteritems():
+            self.register_lazy(name, entry['path'], entry.get('is_transactional', True), entry.get('is_cacheable', False))
+
+    def warm_up(self, names=None):
+        """Import and plan lazily added resources (all of them, if names is None) ahead of their first use"""
+
+        if names is None:
+            names = list(self.lazy_resources.keys())
+
+        for name in names:
+            self._get_plan(name)
+
+    def _load_lazy(self, name):
+        """Import a lazily added resource, returning whether it was found"""
+
+        with self._lazy_lock:
+            if name in self.resource_classes:
+                # loaded by another thread
+                return True
+
+            lazy_resource = self.lazy_resources.get(name, None)
+            if lazy_resource is None:
+                return False
+
+            path, is_transactional, is_cacheable = lazy_resource
+            cls = import_resource(path)
+            if name not in self.resource_classes:
+                self.resource(cls, name=name, is_transactional=is_transactional, is_cacheable=is_cacheable)
+
+            return True
+
+    def invalidate_plans(self, name=None):
+        """Rebuild the precompiled call plans for resource classes patched at runtime.
+
+        Args:
+            name (str): The name of the resource to rebuild, or None to rebuild every resource
+
+        """
+
+        if name is None:
+            self._class_plans.clear()
+            self.result_caches.clear()
+            names = list(self.resource_classes.keys())
+        else:
+            self._class_plans.pop(self._get_resource(name), None)
+            self.result_caches.pop(name, None)
+            names = [name]
+
+        for resource_name in names:
+            cls = self.resource_classes[resource_name]
+            self.resource_plans[resource_name] = self._class_plans[cls] = plan_resource(cls, self, resource_name)
+
+    @contextlib.contextmanager
+    def request(self):
+        """Context manager which shares a RequestScope between the API calls made within it.
+
+        Calls made outside of a request each run in their own scope.
+        """
+
+        scope = getattr(self._local, 'scope', None)
+        if scope is not None:
+            # join the enclosing request
+            yield scope
+            return
+
+        self._local.scope = RequestScope()
+        try:
+            yield self._local.scope
+        finally:
+            self._local.scope = None
+
+    def _current_scope(self):
+        return getattr(self._local, 'scope', None)
+
+    def _identity(self, plan, instance):
+        """Identify a resource instance (or class) by its identity method, or None if it has none"""
+
+        if instance is plan.cls:
+            return plan.cls
+        elif plan.identity is None:
+            return None
+
+        return (plan.cls, getattr(instance, plan.identity.name)())
+
+    def _access_identity(self, plan, parent, scope):
+        """Identify a resource for the access cache, and whether its decisions can be shared across requests"""
+
+        identity = self._identity(plan, parent)
+        if identity is not None:
+            return identity, True
+
+        # without an identity method, decisions can only be cached within a request
+        if scope is not None:
+            scope.instances[id(parent)] = parent
+        return ('instance', id(parent)), False
+
+    def _check_access(self, plan, parent, access_plan, permission, environment):
+        """Call a resource's access method for a permission, using the access cache if there is one"""
+
+        access_method = getattr(parent, access_plan.name)
+        access_kwargs = plan_args(access_plan, {'permission': permission}, environment)
+
+        cache = self.access_cache
+        if cache is None:
+            return access_method(**access_kwargs)
+
+        scope = self._current_scope()
+        identity, shared = self._access_identity(plan, parent, scope)
+        key, decision = cache.get(scope, identity, permission, environment, shared)
+        if decision is MISSING:
+            decision = bool(access_method(**access_kwargs))
+            cache.set(scope, key, decision, shared)
+
+        return decision
+
+    def _instance(self, plan, instance_args, shared=True):
+        """Find or construct the instance of a resource for some instance arguments.
+
+        Each instance is only constructed once per request. If shared is True, instances of
+        cacheable resources are also taken from (and kept in) the instance cache. Otherwise (e.g.
+        for updates) the instance is never one held in the instance cache: if the request has
+        already read the shared instance, it is replaced by a new one, which the request uses
+        from then on, so that uncommitted changes are never seen by other requests.
+        """
+
+        scope = self._current_scope()
+        key = instance_key(plan.name, instance_args)
+
+        is_cacheable = self.instance_cache is not None and self.is_cacheable.get(plan.name, False)
+
+        if scope is not None:
+            instance = scope.identity_map.get(key, None)
+            if instance is not None:
+                if shared or not is_cacheable or self.instance_cache.get(key, None) is not instance:
+                    return instance
+
+                # the shared instance is taken for writing
+                self.instance_cache.pop(key)
+                scope.instance_keys.pop(id(instance), None)
+
+        cache = None
+        if shared and is_cacheable:
+            cache = self.instance_cache
+
+        instance = None
+        if cache is not None:
+            instance = cache.get(key, None)
+
+        if instance is None:
+            try:
+                instance = plan.cls(**instance_args)
+            except TypeError:
+                # only a failure to bind the arguments is the client's; errors raised by the constructor are the resource's
+                reason = argument_error(getattr(plan.cls, '__init__', None), instance_args)
+                if reason is None:
+                    raise
+                raise ResourceArgumentError("'" + plan.cls.__name__ + "' cannot be constructed with these instance arguments (" + reason + ")")
+            if cache is not None:
+                cache.set(key, instance)
+
+        if scope is not None:
+            scope.identity_map[key] = instance
+            scope.instance_keys[id(instance)] = key
+
+        return instance
+
+    def _evict_instance(self, instance):
+        """Remove an instance which has been committed or deleted from the identity map and instance cache"""
+
+        scope = self._current_scope()
+        if scope is None:
+            return
+
+        key = scope.instance_keys.pop(id(instance), None)
+        if key is not None:
+            scope.identity_map.pop(key, None)
+            if self.instance_cache is not None:
+                self.instance_cache.pop(key)
+
+    def _invalidate_access(self, plan, instance):
+        """Discard the cached access decisions of a resource instance which has been written to"""
+
+        if self.access_cache is not None:
+            scope = self._current_scope()
+            identity, shared = self._access_identity(plan, instance, scope)
+            self.access_cache.invalidate(identity, scope)
+
+    def _plan_for(self, cls):
+        """Look up (or build, for unregistered classes) the call plan for a resource class"""
+
+        plan = self._class_plans.get(cls, None)
+        if plan is None:
+            plan = self._class_plans[cls] = plan_resource(cls, self)
+
+        return plan
+
     def _access_level(self, resource_instance, environment):
         """Determine a resource's most restrictive access permission for a given environment"""
 
+        plan = self._plan_for(resource_instance.__class__)
+
+        cache = self.access_cache
+        if cache is not None:
+            scope = self._current_scope()
+            identity, shared = self._access_identity(plan, resource_instance, scope)
+            key, access_level = cache.get(scope, identity, self.access_level_method_name, environment, shared)
+            if access_level is not MISSING:
+                return access_level
+
         # determine if the resource instance has a method to provide the 
         # highest level of access this environment can give
-        access_level_method = getattr(resource_instance, self.access_level_method_name, None)
-        if access_level_method is not None:
-            access_level_kwargs = populate_args(access_level_method, environment)
-            access_level = access_level_method(**access_level_kwargs)
+        if plan.access_level is not None:
+            access_level_method = getattr(resource_instance, plan.access_level.name)
+            access_level = access_level_method(**plan_args(plan.access_level, {}, environment))
         else:
             # fall back on calling its access method in the provided
             # permissions order
-            access_method = getattr(resource_instance, self.access_method_name, None)
             access_level = None
 
-            if access_method is not None:
+            if plan.access is not None:
                 for permission in self.permission_order:
-                    access_kwargs = populate_args(access_method, {'permission': permission}, environment)
-                    if access_method(**access_kwargs):
-                        access_method = permission
+                    if self._check_access(plan, resource_instance, plan.access, permission, environment):
+                        access_level = permission
                         break
 
+        if cache is not None:
+            cache.set(scope, key, access_level, shared)
+
         return access_level
 
-    def encode(self, obj, environment):
-        """Encodes an object into a serializable view, based on the environment's access level"""
-        def _encode(inner_obj):
-            encoded = inner_obj
-
-            # encode resource objects with their specified serializer,
-            # according to the highest level of access which the environment arguments allow
-            if getattr(inner_obj, '_IS_RESOURCE', False):
-                # determine the access level in this environment
-                permission = self._access_level(obj, environment)
-                # retrieve the serializer
-                serializer = getattr(inner_obj, self.serialization_method_name, None)
-                
-                if serializer is not None:
-                    # encode the resource using its serializer with the provided permission
-                    serializer_kwargs = populate_args(serializer, {'permission': permission}, environment)
-                    encoded = serializer(**serializer_kwargs)
-                else:
-                    raise ValueError("Unable to serialize: object '" + obj.__name__ + "' has no method '" + self.serialization_method_name + "'")
-            elif isinstance(inner_obj, collections.Mapping):
-                # recurse on dictionary-like objects
-                encoded = {}
-                for key, val in inner_obj.iteritems():
-                    encoded[key] = _encode(val)
-            elif isinstance(inner_obj, collections.Iterable):
-                # recurse on array-like objects
-                encoded = []
-                for val in inner_obj:
-                    encoded.append(_encode(val))
-
-            return encoded
-
-        return _encode(obj)
+    def encode(self, obj, environment, fields=None, references=False):
+        """Encodes an object into a serializable view, based on the environment's access level.
+
+        If fields is given, as a list of (dotted) field paths or a field mask (see util.compile_field_mask),
+        each encoded resource's view only has those fields. The mask is passed to serializers which take a
+        'fields' argument, so that they can skip computing the other fields, and applied to what they return.
+        Dotted paths select the fields of embedded resources (and dicts) within a view.
+
+        If references is True, each resource is serialized once, into a table of views, and is encoded
+        as a reference to its view wherever it appears (including within views). The result is a
+        tagged graph, {'__type__': 'graph', '__value__': {'resources': {id: view}, 'result': ...}},
+        in which references are {'__type__': 'ref', '__value__': id}, and which is decoded by
+        serialization.decode_references (and by the tagged JSON decoders). Resources are the same
+        if they have the same identity (see the identity method), or are the same instance.
+        """
+
+        if references:
+            if fields is not None:
+                raise ResourceArgumentError('Unable to encode: field masks cannot be combined with references')
+            return self._encode_graph(obj, environment)
+
+        mask = compile_field_mask(fields)
+
+        # encode resource objects with their specified serializer,
+        # according to the highest level of access which the environment arguments allow
+        return self.encoder.encode(obj, lambda resource: self._serialize(resource, environment, mask))
+
+    def register_encoder(self, value_type, encoder):
+        """Encode values of a type (and its subclasses) with encoder(value), which returns a value to encode in its place"""
+
+        self.encoder.register(value_type, encoder)
+
+    def _encode_graph(self, obj, environment):
+        """Encodes an object as a graph of references to a table of resource views (see encode)"""
+
+        # ref id -> encoded view
+        resources = {}
+        # resource identity (or instance id) -> ref id
+        ref_ids = {}
+
+        # (ref id, resource) of the resources referred to, whose views haven't been encoded yet
+        pending = collections.deque()
+
+        def _reference(resource):
+            plan = self._plan_for(resource.__class__)
+            identity = self._identity(plan, resource)
+            key = ('instance', id(resource)) if identity is None else identity
+
+            ref_id = ref_ids.get(key, None)
+            if ref_id is None:
+                # views are encoded once they are referred to, so that cycles refer back to their ids
+                ref_id = ref_ids[key] = str(len(ref_ids))
+                pending.append((ref_id, resource))
+
+            return {'__type__': 'ref', '__value__': ref_id}
+
+        result = self.encoder.encode(obj, _reference, keep_sets=True)
+        while pending:
+            ref_id, resource = pending.popleft()
+            resources[ref_id] = self.encoder.encode(self._serialize(resource, environment), _reference, keep_sets=True)
+
+        return {
+            '__type__': 'graph',
+            '__value__': {
+                'resources': resources,
+                'result': result
+            }
+        }
+
+    def iter_encode(self, obj, environment, chunk_size=DEFAULT_CHUNK_SIZE, fields=None):
+        """Encodes an object as JSON text, yielding chunks of the text as the object is walked.
+
+        Resources are encoded as per encode, but generators and other iterables are consumed lazily,
+        so that large results are written out as they are produced. Datetimes, sets, exceptions and
+        types are tagged as per serialization.get_encoder(wrap_types=True).
+
+        Args:
+            obj: The object to encode
+            environment (dict): The environment determining the access level of embedded resources
+            chunk_size (int): The number of characters to buffer before yielding a chunk
+            fields (List[str]): The fields of each encoded resource's view, as per encode
+
+        """
+
+        default = get_encoder(wrap_types=True)
+        mask = compile_field_mask(fields)
+
+        buffered = []
+        buffered_size = 0
+        for piece in self.encoder.iter_json(obj, lambda resource: self._serialize(resource, environment, mask), default):
+            buffered.append(piece)
+            buffered_size += len(piece)
+            if buffered_size >= chunk_size:
+                yield ''.join(buffered)
+                buffered = []
+                buffered_size = 0
+
+        if buffered:
+            yield ''.join(buffered)
+
+    def _serialize(self, resource_instance, environment, mask=None):
+        """Serialize a resource with the highest level of access which the environment allows.
+
+        If given, the view is projected onto a field mask (see encode).
+        """
+
+        # retrieve the serializer
+        plan = self._plan_for(resource_instance.__class__)
+        serializer_plan = plan.serializer
+        if serializer_plan is None:
+            raise ValueError("Unable to serialize: object '" + resource_instance.__class__.__name__ + "' has no method '" + self.serialization_method_name + "'")
+
+        # determine the access level in this environment
+        permission = self._access_level(resource_instance, environment)
+        serializer_kwargs = plan_args(serializer_plan, {'permission': permission, 'fields': mask}, environment)
+
+        # look for a cached view of this version of the resource
+        cache = self.view_cache
+        view_key = None
+        if cache is not None and plan.identity is not None and plan.version is not None:
+            version = getattr(resource_instance, plan.version.name)(**plan_args(plan.version, {}, environment))
+            view_key = (self._identity(plan, resource_instance), version, freeze(serializer_kwargs))
+            view = cache.get(view_key, MISSING)
+            if view is not MISSING:
+                # cached views are shared by every request, so callers which change their results must get a copy
+                view = copy_containers(view)
+                return view if mask is None else self._project(view, mask, environment)
+
+        # encode the resource using its serializer with the provided permission
+        serializer = getattr(resource_instance, serializer_plan.name)
+        view = serializer(**serializer_kwargs)
+
+        if view_key is not None:
+            cache.set(view_key, copy_containers(view))
+
+        return view if mask is None else self._project(view, mask, environment)
+
+    def _project(self, view, mask, environment):
+        """Copy the fields of a serialized view which are in a field mask, encoding embedded resources"""
+
+        if not isinstance(view, collections.Mapping):
+            # only dict-like views have fields
+            return view
+
+        projected = {}
+        for name, field_mask in mask.iteritems():
+            if name in view:
+                projected[name] = self._project_field(view[name], field_mask, environment)
+
+        return projected
+
+    def _project_field(self, value, mask, environment):
+        if getattr(value, '_IS_RESOURCE', False):
+            return self._serialize(value, environment, mask)
+        elif mask is None or isinstance(value, basestring):
+            return value
+        elif isinstance(value, collections.Mapping):
+            return self._project(value, mask, environment)
+        elif isinstance(value, collections.Iterable):
+            # project each item of a list of embedded resources (or dicts)
+            return [self._project_field(val, mask, environment) for val in value]
+
+        return value
 
     def _get_resource(self, name):
         """Look up a resource class by name"""
 
         resource_class = self.resource_classes.get(name, None)
         if resource_class is None:
-            raise ResourceNotFoundError("'" + name + "' is not defined as an identifiable resource")
+            if not self._load_lazy(name):
+                raise ResourceNotFoundError("'" + name + "' is not defined as an identifiable resource")
+            resource_class = self.resource_classes[name]
 
         return resource_class
 
-    def _call(self, class_obj, parent, methods, access_method_name, environment, allowed_method_types=None, encode=True):
+    def _get_plan(self, name):
+        """Look up the call plan of a resource by name"""
+
+        plan = self.resource_plans.get(name, None)
+        if plan is None:
+            if not self._load_lazy(name):
+                raise ResourceNotFoundError("'" + name + "' is not defined as an identifiable resource")
+            plan = self.resource_plans[name]
+
+        return plan
+
+    def _call(self, plan, parent, methods, access_plan, environment, allowed_method_types=None, encode=True, granted=None, fields=None, references=False):
         """Performs access and permission checking, calls each specified method 
         (its arguments are combined with the provided environment).
+
+        If given, granted is a permission -> bool dict of access decisions already
+        made for this parent in this environment, which is shared between calls.
+        Fields and references are the options of encoding the result (see encode).
         """
 
+        class_obj = plan.cls
+
         # look up the access method to check for access
-        access_method = getattr(parent, access_method_name, None)
-        if access_method is None:
+        if access_plan is None:
             raise ResourceMethodNotFoundError("'" + class_obj.__name__ + "' is missing an access method")
 
+        # permission -> bool, so that access is only evaluated once per permission
+        if granted is None:
+            granted = {}
+
+        result = []
+
+        for group in _independent_groups(methods):
+            if len(group) == 1:
+                prepared = self._prepare_method(plan, parent, group[0], access_plan, environment, allowed_method_types, granted)
+                outcomes = [self._invoke_method(plan, parent, prepared, environment)]
+            else:
+                # check every independent method before calling any of them
+                prepared = [
+                    self._prepare_method(plan, parent, method_data, access_plan, environment, allowed_method_types, granted)
+                    for method_data in group
+                ]
+                outcomes = self._map_methods(lambda prepared_method: self._invoke_method(plan, parent, prepared_method, environment), prepared)
+
+            result.extend(outcome for outcome in outcomes if outcome is not _NO_RESULT)
+
+        if encode:
+            if self.metrics is None:
+                result = self.encode(result, environment, fields, references)
+            else:
+                start = default_timer()
+                try:
+                    result = self.encode(result, environment, fields, references)
+                except Exception as err:
+                    self.metrics.error(plan.name, '', err)
+                    raise
+                finally:
+                    self.metrics.observe(plan.name, '', 'encode', default_timer() - start)
+
+        return result
+
+    def _prepare_method(self, plan, parent, method_data, access_plan, environment, allowed_method_types, granted):
+        """Finds the plan of a method to call, checking that it is allowed and that access is granted"""
+
+        class_obj = plan.cls
+
+        if isinstance(method_data, basestring):
+            method_name = method_data
+            sent_arguments = {}
+        else:
+            method_name = method_data.get('method')
+            sent_arguments = method_data.get('args') or {}
+
+        method_name = method_name.lower()
+
+        if method_name in self.method_names:
+            raise _method_error(ResourceMethodNotFoundError, "'" + class_obj.__name__ + "' cannot export method '" + method_name + "'", method_name, sent_arguments)
+
+        method_plan = plan.methods.get(method_name, None)
+        if method_plan is None:
+            if method_name in plan.unexported:
+                message = "'" + class_obj.__name__ + "' has no exported method '" + method_name + "'"
+            else:
+                message = "'" + class_obj.__name__ + "' has no method or decorated property '" + method_name + "'"
+            raise _method_error(ResourceMethodNotFoundError, message, method_name, sent_arguments)
+
+        method_type = method_plan.method_type
+        permission = method_plan.permission
+        if method_plan.kind == PROPERTY and len(sent_arguments) > 0:
+            # setting a decorated property is an update
+            method_type = 'update'
+            permission = DEFAULT_ACCESS['update']
+
         # check if this is an acceptable method of execution as per allowed_method_types
-        if allowed_method_types is not None and method._method_type not in allowed_method_types:
+        if allowed_method_types is not None and method_type not in allowed_method_types:
             raise ResourceNotAllowedError("'" + class_obj.__name__ + "' is not allowed to access '" + method_name + "' in this manner")
 
         # check that access can be granted to call this method
-        permission = method._permission
-        access_kwargs = populate_args(access_method, {'permission': permission}, environment)
-        if not access_method(**access_kwargs):
+        if permission not in granted:
+            if self.metrics is None:
+                granted[permission] = self._check_access(plan, parent, access_plan, permission, environment)
+            else:
+                start = default_timer()
+                try:
+                    granted[permission] = self._check_access(plan, parent, access_plan, permission, environment)
+                except Exception as err:
+                    self.metrics.error(plan.name, method_name, err)
+                    raise
+                finally:
+                    self.metrics.observe(plan.name, method_name, 'access', default_timer() - start)
+        if not granted[permission]:
             raise ResourceAccessDeniedError("'" + class_obj.__name__ + "' has denied access to '" + method_name + "'")
 
-        result = []
+        return method_plan, method_name, method_type, sent_arguments
 
-        for method_data in methods:
-            if isinstance(method_data, basestring):
-                method_name = method_data
-                sent_arguments = {}
-            else:
-                method_name = method_data.get('method')
-                sent_arguments = method_data.get('args')
-
-            method_name = method_name.lower()
-
-            if method_name in self.method_names:
-                err = ResourceMethodNotFoundError("'" + class_obj.__name__ + "' cannot export method '" + method_name + "'")
-                err.method = method_name
-                err.args = sent_arguments
-                raise err
-            
-            class_method = getattr(class_obj, method_name, None)
-            if isinstance(class_method, property):
-                # this "method" is a decorated property
-                num_args = len(sent_arguments)
+    def _invoke_method(self, plan, parent, prepared, environment):
+        """Calls a prepared method (or gets/sets a property), returning its result or _NO_RESULT"""
 
+        method_plan, method_name, method_type, sent_arguments = prepared
+        metrics = self.metrics
+        result = _NO_RESULT
+        method = method_kwargs = None
 
-                try:
-                    if num_args == 0:
-                        result.append(getattr(parent, method_name))
-                    elif method_name in sent_arguments:
-                        value = sent_arguments[method_name]
-                        setattr(parent, method_name, value)
-                        result.append(value)
-                except Exception as original_err:
-                    # pass on the error information
-                    trace = sys.exc_info()[2]
-                    err = ResourceMethodFailedError("'" + class_obj.__name__ + "' failed to execute '" + method_name + "'")
-                    err.method = method_name
-                    err.args = sent_arguments
-                    err.error = original_err
-                    err.trace = trace
-                    raise err, None, trace
-
-            elif callable(class_method):
-                # this is a callable method
-                # lookup the method and ensure it is exported
-                method = getattr(parent, method_name, None)
-                if method is None or not getattr(method, '_is_exported', False):
-                    err = ResourceMethodNotFoundError("'" + class_obj.__name__ + "' has no exported method '" + method_name + "'")
-                    err.method = method_name
-                    err.args = sent_arguments
-                    raise err
-
-                method_kwargs = populate_args(method, sent_arguments, environment)
-                
-                try:
-                    call_result = method(**method_kwargs)
-                except Exception as original_err:
-                    # pass on the error information
-                    trace = sys.exc_info()[2]
-                    err = ResourceMethodFailedError("'" + class_obj.__name__ + "' failed to execute '" + method_name + "'")
-                    err.method = method_name
-                    err.args = sent_arguments
-                    err.error = original_err
-                    err.trace = trace
-                    raise err, None, trace
-
-                result.append(call_result)
+        try:
+            if method_plan.kind == PROPERTY:
+                # this "method" is a decorated property
+                if len(sent_arguments) == 0:
+                    result = getattr(parent, method_name)
+                elif method_name in sent_arguments:
+                    result = sent_arguments[method_name]
+                    setattr(parent, method_name, result)
             else:
-                err = ResourceMethodNotFoundError("'" + class_obj.__name__ + "' has no method or decorated property '" + method_name + "'")
-                err.method = method_name
-                err.args = sent_arguments
-                raise err
-
-        if encode:
-            result = self.encode(result, environment)
+                # this is an exported callable method
+                method = getattr(parent, method_name)
+                if metrics is None:
+                    method_kwargs = plan_args(method_plan, sent_arguments, environment)
+                    result = self._call_method(plan, parent, method_plan, method, method_kwargs, environment)
+                else:
+                    start = default_timer()
+                    try:
+                        method_kwargs = plan_args(method_plan, sent_arguments, environment)
+                    finally:
+                        coerced = default_timer()
+                        metrics.observe(plan.name, method_name, 'coercion', coerced - start)
+                    try:
+                        result = self._call_method(plan, parent, method_plan, method, method_kwargs, environment)
+                    finally:
+                        # failed calls are timed too, so that the latencies aren't only those of successful calls
+                        metrics.observe(plan.name, method_name, 'call', default_timer() - coerced)
+
+            if method_type == 'update' or method_type == 'delete':
+                self._invalidate_access(plan, parent)
+            if method_type == 'update' or method_type == 'delete' or method_type == 'execute':
+                self._invalidate_results(plan)
+            if method_type == 'delete':
+                self._evict_instance(parent)
+        except Exception as original_err:
+            # pass on the error information
+            trace = sys.exc_info()[2]
+            if metrics is not None:
+                metrics.error(plan.name, method_name, original_err)
+            reason = None
+            if method is not None and method_kwargs is None:
+                # the sent arguments couldn't be converted
+                reason = str(original_err)
+            elif method is not None and isinstance(original_err, TypeError):
+                # only a failure to bind the arguments is the client's; errors raised by the method are the resource's
+                reason = argument_error(method, method_kwargs)
+            if reason is not None:
+                err = _method_error(ResourceArgumentError, "'" + method_name + "' of '" + plan.cls.__name__ + "' cannot be called with these arguments (" + reason + ")", method_name, sent_arguments, original_err, trace)
+            else:
+                err = _method_error(ResourceMethodFailedError, "'" + plan.cls.__name__ + "' failed to execute '" + method_name + "'", method_name, sent_arguments, original_err, trace)
+            raise err, None, trace
 
         return result
 
-    def _commit(self, name, instance, environment, encode=True):
+    def _call_method(self, plan, parent, method_plan, method, method_kwargs, environment):
+        """Call a method, or take its result from its result cache, if it has one"""
+
+        if method_plan.cache is None:
+            return method(**method_kwargs)
+
+        identity = self._identity(plan, parent)
+        if identity is None:
+            # without an identity method, instances are identified by the arguments they were constructed with
+            scope = self._current_scope()
+            identity = None if scope is None else scope.instance_keys.get(id(parent), None)
+            if identity is None:
+                return method(**method_kwargs)
+
+        key_args = method_plan.cache['key_args']
+        if key_args is None:
+            args = method_kwargs
+        else:
+            args = [method_kwargs[arg] if arg in method_kwargs else environment.get(arg) for arg in key_args]
+
+        key = (identity, freeze(args))
+        try:
+            hash(key)
+        except TypeError:
+            # the result depends on arguments which can't be compared
+            return method(**method_kwargs)
+
+        def _compute():
+            result = method(**method_kwargs)
+            if isinstance(result, collections.Iterator) and not isinstance(result, (collections.Sequence, collections.Mapping)):
+                # iterators (e.g. generators or cursors) can only be consumed once
+                result = list(result)
+            return result
+
+        return self._result_cache(plan, method_plan).get_or_compute(key, _compute)
+
+    def _result_cache(self, plan, method_plan):
+        caches = self.result_caches.get(plan.name, None)
+        cache = None if caches is None else caches.get(method_plan.name, None)
+        if cache is None:
+            with self._result_cache_lock:
+                caches = self.result_caches.setdefault(plan.name, {})
+                cache = caches.get(method_plan.name, None)
+                if cache is None:
+                    cache = caches[method_plan.name] = ResultCache(method_plan.cache['max_entries'], method_plan.cache['ttl'])
+
+        return cache
+
+    def _invalidate_results(self, plan):
+        """Discard the cached method results of a resource which has been written to"""
+
+        caches = self.result_caches.get(plan.name, None)
+        if caches is not None:
+            for cache in caches.values():
+                cache.clear()
+
+    def _map_methods(self, func, prepared):
+        """Calls func on each of a group of independent prepared methods (sequentially, in this API)"""
+
+        return map(func, prepared)
+
+    def _in_scope(self, scope, func, *args):
+        """Calls func within a given request scope, for work handed to another thread"""
+
+        previous_scope = self._current_scope()
+        previous_depth = getattr(self._local, 'depth', 0)
+        self._local.scope = scope
+        # the work belongs to the operation which handed it over, so the operations it makes are nested in it
+        self._local.depth = previous_depth + 1
+        try:
+            return func(*args)
+        finally:
+            self._local.scope = previous_scope
+            self._local.depth = previous_depth
+
+    def _commit(self, name, instance, environment, encode=True, method_types=()):
+        """Commit the changes to a transactional resource instance, made by methods of the given types.
+
+        Within a unit of work, the instance is only marked as changed, and its unit of work entry is returned.
+        """
+
+        if not self.is_transactional.get(name, True):
+            return None
+
+        scope = self._current_scope()
+        unit_of_work = None if scope is None else scope.unit_of_work
+        if unit_of_work is not None:
+            entry = unit_of_work.add(name, instance, environment, encode, method_types)
+            if unit_of_work.should_flush():
+                self.flush()
+            return entry
+
+        return self._commit_now(name, instance, environment, encode, method_types)
+
+    def _commit_now(self, name, instance, environment, encode, method_types=()):
         commit_result = None
         # commit changes to the resource
-        if self.is_transactional.get(name, True):
-            commit_method = getattr(instance, self.commit_method_name, None)
-            if commit_method is not None:
-                commit_kwargs = populate_args(commit_method, environment)
-                commit_result = commit_result(**commit_kwargs)
-                if encode:
-                    commit_result = self.encode(commit_result, environment)
+        plan = self._plan_for(instance.__class__)
+        if plan.commit is not None:
+            commit_method = getattr(instance, plan.commit.name)
+            if self.metrics is None:
+                commit_result = commit_method(**plan_args(plan.commit, {}, environment))
+            else:
+                start = default_timer()
+                try:
+                    commit_result = commit_method(**plan_args(plan.commit, {}, environment))
+                except Exception as err:
+                    self.metrics.error(name, '', err)
+                    raise
+                finally:
+                    self.metrics.observe(name, '', 'commit', default_timer() - start)
+            self._committed(plan, instance, method_types)
+            if encode:
+                commit_result = self.encode(commit_result, environment)
 
         return commit_result
 
-    def _class_call(self, name, methods, environment, allowed_method_types=('lookup', 'execute'), encode=True):
-        resource_class = self._get_resource(name)
+    def _committed(self, plan, instance, method_types=()):
+        """Discard anything cached about an instance which has been committed, and publish its change"""
+
+        self._invalidate_access(plan, instance)
+        self._invalidate_results(plan)
+        self._evict_instance(instance)
+        if self.view_cache is not None and plan.identity is not None:
+            self.view_cache.invalidate(self._identity(plan, instance))
+        if self.changes is not None:
+            identity = None if plan.identity is None else getattr(instance, plan.identity.name)()
+            self.changes.publish(plan.name, identity, method_types)
+
+    def _method_types(self, plan, methods):
+        """The types of the exported methods (by their method data) of a resource"""
+
+        method_types = set()
+        for method_data in methods or ():
+            method_plan = plan.methods.get(_method_label(method_data), None)
+            if method_plan is not None:
+                method_types.add(method_plan.method_type)
+        return method_types
+
+    @contextlib.contextmanager
+    def unit_of_work(self, flush_threshold=None):
+        """Context manager which defers commits until the changed instances are flushed.
+
+        Within it, create, update and delete (and batch) only mark transactional instances as
+        changed, returning their UnitOfWork entries in place of commit results. Changed instances
+        are committed when flush is called, when flush_threshold instances have changed, and when
+        the context exits without an error. They are committed in groups, one per resource class
+        and environment, with the class' commit-many method if it has one, otherwise one at a time.
+
+        Args:
+            flush_threshold (int): The number of changed instances at which they're committed, or
+                None to only commit them explicitly and at the end of the unit of work
+
+        """
+
+        with self.request() as scope:
+            if scope.unit_of_work is not None:
+                # join the enclosing unit of work
+                yield scope.unit_of_work
+                return
+
+            scope.unit_of_work = UnitOfWork(flush_threshold)
+            try:
+                yield scope.unit_of_work
+                self.flush()
+            finally:
+                scope.unit_of_work = None
+
+    def flush(self):
+        """Commit the instances changed in the current unit of work, returning their entries"""
+
+        scope = self._current_scope()
+        unit_of_work = None if scope is None else scope.unit_of_work
+        if unit_of_work is None:
+            return []
+
+        # (resource class, environment) -> changed instances, in the order they were changed
+        groups = collections.OrderedDict()
+        for pending in unit_of_work.take():
+            entry, environment, encode = pending
+            groups.setdefault((entry['instance'].__class__, freeze(environment)), []).append(pending)
+
+        entries = []
+        for group in groups.itervalues():
+            self._flush_group(group)
+            entries.extend(entry for entry, environment, encode in group)
+
+        return entries
+
+    def _flush_group(self, group):
+        """Commit a group of changed instances of the same resource class, in the same environment"""
+
+        first_entry, environment, encode = group[0]
+        name = first_entry['name']
+        plan = self._plan_for(first_entry['instance'].__class__)
+
+        if plan.commit_many is None:
+            # commit each instance on its own
+            for entry, environment, encode in group:
+                try:
+                    entry['result'] = self._commit_now(name, entry['instance'], environment, encode, entry['method_types'])
+                    entry['is_committed'] = True
+                except Exception as original_err:
+                    trace = sys.exc_info()[2]
+                    entry['error'] = _method_error(ResourceMethodFailedError, "'" + plan.cls.__name__ + "' failed to commit", self.commit_method_name, {}, original_err, trace)
+            return
+
+        instances = [entry['instance'] for entry, environment, encode in group]
+        commit_many_method = getattr(plan.cls, plan.commit_many.name)
+        start = default_timer()
+        try:
+            results = commit_many_method(instances, **plan_args(plan.commit_many, {}, environment))
+        except Exception as original_err:
+            trace = sys.exc_info()[2]
+            if self.metrics is not None:
+                self.metrics.error(name, '', original_err)
+                self.metrics.observe(name, '', 'commit', default_timer() - start)
+            err = _method_error(ResourceMethodFailedError, "'" + plan.cls.__name__ + "' failed to commit", plan.commit_many.name, {}, original_err, trace)
+            for entry, environment, encode in group:
+                entry['error'] = err
+            return
+
+        if self.metrics is not None:
+            self.metrics.observe(name, '', 'commit', default_timer() - start)
+
+        if results is None:
+            results = [None] * len(instances)
+        else:
+            results = list(results)
+
+        if len(results) < len(instances):
+            # instances without a result weren't reported as committed
+            missing = ValueError(plan.commit_many.name + ' returned ' + str(len(results)) + ' results for ' + str(len(instances)) + ' instances')
+            results.extend([missing] * (len(instances) - len(results)))
+
+        for (entry, environment, encode), result in zip(group, results):
+            if isinstance(result, Exception):
+                # the commit-many method reports an instance's failure by returning its error
+                entry['error'] = _method_error(ResourceMethodFailedError, "'" + plan.cls.__name__ + "' failed to commit", plan.commit_many.name, {}, result, None)
+                continue
+
+            self._committed(plan, entry['instance'], entry['method_types'])
+            entry['result'] = self.encode(result, environment) if encode else result
+            entry['is_committed'] = True
+
+    def _class_call(self, name, methods, environment, allowed_method_types=('lookup', 'execute'), encode=True, fields=None, references=False, granted=None):
+        plan = self._get_plan(name)
 
         # call the class (static) method and encode the result
         return self._call(
-            resource_class,
-            resource_class,
+            plan,
+            plan.cls,
             methods,
-            self.class_access_method_name,
+            plan.class_access,
             environment,
             allowed_method_types,
-            encode
+            encode,
+            granted=granted,
+            fields=fields,
+            references=references
         )
 
+    def _etag(self, plan, parent, methods, access_plan, environment, allowed_method_types, options):
+        """Check access to the methods to call on a resource instance (or class), and compute the ETag of their result.
+
+        The ETag is a digest of the parent's version, the access granted to the methods, the methods,
+        the environment arguments they take, the environment arguments which access decisions depend
+        on (those of the access cache, or the user id), and the options of encoding their result,
+        computed without calling any of the methods.
+
+        Returns:
+            tuple: The ETag, or None if the resource has no version method for the parent, and the
+                permission -> bool dict of the access decisions made
+
+        """
+
+        granted = {}
+        if access_plan is None:
+            # the call itself reports the missing access method
+            return None, granted
+
+        # the environment arguments of each method, which its result may depend on
+        method_environments = []
+        for method_data in methods:
+            method_plan = self._prepare_method(plan, parent, method_data, access_plan, environment, allowed_method_types, granted)[0]
+            method_environments.append(sorted(plan_args(method_plan, {}, environment).iteritems()))
+
+        version_plan = plan.class_version if parent is plan.cls else plan.version
+        if version_plan is None:
+            return None, granted
+
+        key_args = self.access_cache.key_args if self.access_cache is not None else DEFAULT_KEY_ARGS
+        components = [
+            plan.name,
+            getattr(parent, version_plan.name)(**plan_args(version_plan, {}, environment)),
+            sorted(granted.iteritems()),
+            methods,
+            method_environments,
+            # the access levels of the resources embedded in the result depend on these
+            [environment.get(arg) for arg in key_args],
+            options
+        ]
+        if parent is not plan.cls:
+            # the view of the instance depends on its access level, and the environment arguments of its serializer
+            components.append(self._access_level(parent, environment))
+            if plan.serializer is not None:
+                components.append(plan_args(plan.serializer, {}, environment))
+
+        # the C encoder is only used when keys aren't sorted: dicts with their keys in another order only cost a mismatch
+        return hashlib.sha1(json.dumps(components, default=repr)).hexdigest(), granted
+
+    def _conditional_result(self, etag, if_none_match, call):
+        """The result of a conditional read or lookup: not modified if its ETag matches, otherwise call()"""
+
+        if etag is not None and etag == if_none_match:
+            return {
+                'not_modified': True,
+                'etag': etag,
+                'result': None
+            }
+
+        return {
+            'not_modified': False,
+            'etag': etag,
+            'result': call()
+        }
+
     # Public Interface
 
-    def lookup(self, name, methods, environment, allowed_method_types=('lookup',), encode=True):
-        """Performs a read operation by calling class/static methods on a named resource."""
+    @_request_scoped
+    def lookup(self, name, methods, environment, allowed_method_types=('lookup',), encode=True, stream=False, fields=None, page_size=None, references=False, if_none_match=None):
+        """Performs a read operation by calling class/static methods on a named resource.
 
-        return self._class_call(name, methods, environment, allowed_method_types=allowed_method_types, encode=encode)
+        If stream is True, the result is returned as an iterator of JSON text chunks (see iter_encode).
+        If fields are given, only those fields of each resource in the result are encoded (see encode).
+        If references is True, the result is encoded as a graph of references to resources (see encode).
+
+        If page_size is given, a single method is called, and only the first page_size items of the
+        iterable it returns are taken and encoded. The iterable is held in the cursor store, so that
+        the following pages can be taken from it with next_page, without calling the method again.
+        The result is then a dict of 'result' (the page) and 'cursor' (the token of the next page,
+        or None if this is the last page).
+
+        If if_none_match is given, the lookup is conditional (see read), and its ETag is computed from
+        the version returned by the resource's class version method.
+        """
+
+        if if_none_match is None:
+            return self._lookup(name, methods, environment, allowed_method_types, encode, stream, fields, page_size, references)
+
+        plan = self._get_plan(name)
+        etag, granted = self._etag(plan, plan.cls, methods, plan.class_access, environment, allowed_method_types, [encode, stream, fields, page_size, references])
+        return self._conditional_result(etag, if_none_match, lambda: self._lookup(name, methods, environment, allowed_method_types, encode, stream, fields, page_size, references, granted))
+
+    def _lookup(self, name, methods, environment, allowed_method_types, encode, stream, fields, page_size, references, granted=None):
+        if page_size is not None:
+            if self.cursor_store is None:
+                raise ValueError('Unable to paginate: the API has no cursor store')
+            if len(methods) != 1:
+                raise ResourceArgumentError('Unable to paginate: a paginated lookup must call a single method')
 
+            result = self._class_call(name, methods, environment, allowed_method_types=allowed_method_types, encode=False, granted=granted)
+            if len(result) == 0 or isinstance(result[0], (basestring, collections.Mapping)) or not isinstance(result[0], collections.Iterable):
+                raise ValueError("Unable to paginate: '" + name + "' did not return an iterable")
+
+            cursor = {
+                'name': name,
+                'iterator': iter(result[0]),
+                'peeked': [],
+                'page_size': page_size,
+                'fields': fields
+            }
+            return self._next_page(cursor, environment, page_size, encode)
+
+        if stream:
+            result = self._class_call(name, methods, environment, allowed_method_types=allowed_method_types, encode=references, references=references, granted=granted)
+            return self.iter_encode(result, environment, fields=fields)
+
+        return self._class_call(name, methods, environment, allowed_method_types=allowed_method_types, encode=encode, fields=fields, references=references, granted=granted)
+
+    @_request_scoped
     def execute(self, name, methods, environment, allowed_method_types=('execute',), encode=True):
         """Performs an update/mutation operation by calling class/static methods on a named resource."""
 
         return self._class_call(name, methods, environment, allowed_method_types=allowed_method_types, encode=encode)
     
+    @_request_scoped
     def create(self, name, create_method_name, creation_args, methods, environment, allowed_method_types=('read', 'update', 'create'), encode=True):
         """Creates an instance of a named resource, with methods to call on the created instance."""
 
-        resource_class = self._get_resource(name)
+        plan = self._get_plan(name)
+        resource_class = plan.cls
         create_methods = [{
             'method': create_method_name, 
             'args': creation_args
@@ -329,30 +1353,31 @@ class API(object):
 
         # create an instance
         instance = self._call(
-            resource_class,
+            plan,
             resource_class,
             create_methods,
-            self.class_access_method_name,
+            plan.class_access,
             environment,
             allowed_method_types=('create',),
             encode=False
         )[0]
 
         if not isinstance(instance, resource_class):
-            raise ResourceMethodNotFoundError("'" + class_name + "' has no creation method '" + method_name + "'")
+            raise ResourceMethodNotFoundError("'" + resource_class.__name__ + "' has no creation method '" + create_method_name + "'")
 
+        result = None
         if methods is not None and len(methods) > 0:
             result = self._call(
-                resource_class,
+                plan,
                 instance,
                 methods,
-                self.access_method_name,
+                plan.access,
                 environment,
                 tuple(method_type for method_type in allowed_method_types if method_type != 'create'),
                 encode=encode
             )
 
-        commit = self._commit(name, instance, environment, encode=encode)
+        commit = self._commit(name, instance, environment, encode=encode, method_types=set(['create']) | self._method_types(plan, methods))
 
         return {
             'instance': instance,
@@ -360,37 +1385,71 @@ class API(object):
             'commit': commit
         }
 
-    def read(self, name, methods, instance_args, environment, allowed_method_types=('read',), encode=True):
-        """Performs a read operation by calling methods on an instance of a named resource."""
+    @_request_scoped
+    def read(self, name, methods, instance_args, environment, allowed_method_types=('read',), encode=True, stream=False, fields=None, references=False, if_none_match=None):
+        """Performs a read operation by calling methods on an instance of a named resource.
+
+        If stream is True, the result is returned as an iterator of JSON text chunks (see iter_encode).
+        If fields are given, only those fields of each resource in the result are encoded (see encode).
+        If references is True, the result is encoded as a graph of references to resources (see encode).
+
+        If if_none_match is given (the ETag of an earlier conditional read, or '' for the first), the
+        read is conditional. Before any method is called, access to each is checked, and an ETag is
+        computed from the instance's version (returned by its version method), its access level, the
+        methods and the encoding options. If it matches if_none_match, the methods are not called and
+        nothing is serialized, and the result is {'not_modified': True, 'etag': etag, 'result': None},
+        otherwise it is {'not_modified': False, 'etag': etag, 'result': the result}. Resources without a
+        version method have no ETag (None), so are never unmodified. Versions must change whenever the
+        result would, including when the resources it embeds change.
+        """
+
+        plan = self._get_plan(name)
+        instance = self._instance(plan, instance_args) # instantiate the resource
+
+        if if_none_match is None:
+            return self._read(plan, instance, methods, environment, allowed_method_types, encode, stream, fields, references)
 
-        resource_class = self._get_resource(name)
+        etag, granted = self._etag(plan, instance, methods, plan.access, environment, allowed_method_types, [encode, stream, fields, references])
+        return self._conditional_result(etag, if_none_match, lambda: self._read(plan, instance, methods, environment, allowed_method_types, encode, stream, fields, references, granted))
 
+    def _read(self, plan, instance, methods, environment, allowed_method_types, encode, stream, fields, references, granted=None):
         # call the instance method and encode the result
         result = self._call(
-            resource_class,
-            resource_class(**instance_args), # instantiate the resource
+            plan,
+            instance,
             methods,
-            self.access_method_name,
+            plan.access,
             environment,
             allowed_method_types,
-            encode
+            encode and (references or not stream),
+            granted=granted,
+            fields=fields,
+            references=references
         )
 
+        if stream:
+            return self.iter_encode(result, environment, fields=fields)
+
         return result
 
+    @_request_scoped
     def update(self, name, methods, instance_args, environment, allowed_method_types=('read', 'update', 'delete'), encode=True):
         """Performs an update/mutation operation by calling methods on an instance of a named resource."""
 
-        resource_class = self._get_resource(name)
+        return self._update(name, methods, instance_args, environment, allowed_method_types, encode)
 
-        instance = resource_class(**instance_args)
+    def _update(self, name, methods, instance_args, environment, allowed_method_types, encode):
+        plan = self._get_plan(name)
+
+        # instances to be updated aren't shared with other requests
+        instance = self._instance(plan, instance_args, shared=False)
 
         # call the instance method and encode the result
         result = self._call(
-            resource_class,
+            plan,
             instance, # instantiate the resource
             methods,
-            self.access_method_name,
+            plan.access,
             environment,
             allowed_method_types,
             encode=encode
@@ -398,12 +1457,253 @@ class API(object):
                     
         return {
             'result': result,
-            'commit': self._commit(name, instance, environment, encode=encode)
+            'commit': self._commit(name, instance, environment, encode=encode, method_types=self._method_types(plan, methods))
         }
 
+    @_request_scoped
     def delete(self, name, method, instance_args, environment, allowed_method_types=('delete',), encode=True):
         """Performs a delete operation by calling an instance method of a named resource."""
 
-        result = self.update(name, [method], instance_args, environment, allowed_method_types=allowed_method_types, encode=encode)
+        result = self._update(name, [method], instance_args, environment, allowed_method_types, encode)
         result['result'] = result['result'][0]
         return result
+
+    @_request_scoped
+    def next_page(self, cursor, environment, page_size=None, encode=True):
+        """Takes the next page of a paginated lookup (see lookup) from its cursor token.
+
+        Args:
+            cursor (str): The cursor token returned with the previous page
+            environment (dict): The environment in which to encode the page, which must have the
+                same key arguments (see CursorStore) as the lookup's environment
+            page_size (int): The number of items to take, or None for the lookup's page size
+            encode (bool): Whether to encode the page
+
+        Returns:
+            dict: The page as 'result', and the token of the following page as 'cursor' (or None)
+
+        Raises:
+            ResourceCursorNotFoundError: If there is no such cursor, e.g. it has expired or been taken
+
+        """
+
+        held = None if self.cursor_store is None else self.cursor_store.take(cursor, environment)
+        if held is None:
+            raise ResourceCursorNotFoundError("'" + str(cursor) + "' is not a cursor")
+
+        return self._next_page(held, environment, page_size or held['page_size'], encode)
+
+    def _next_page(self, cursor, environment, page_size, encode):
+        # take one more item than needed, to find out if there is another page
+        items = cursor['peeked'] + list(itertools.islice(cursor['iterator'], page_size + 1 - len(cursor['peeked'])))
+        cursor['peeked'] = items[page_size:]
+        items = items[:page_size]
+
+        token = None
+        if cursor['peeked']:
+            token = self.cursor_store.hold(cursor, environment)
+
+        if encode:
+            items = self.encode(items, environment, cursor['fields'])
+
+        return {
+            'result': items,
+            'cursor': token
+        }
+
+    @_request_scoped
+    def batch(self, operations, environment, encode=True, max_workers=None):
+        """Performs many operations in a single call.
+
+        Operations on the same resource instance share one constructed instance and one access
+        evaluation per permission, and each transactional instance is committed once, after every
+        operation has run. A failed operation does not prevent the others from running.
+
+        Args:
+            operations (List[dict]): The operations to perform, in order. Each is a dict of:
+                'operation': one of 'create', 'read', 'update', 'delete', 'lookup' or 'execute'
+                'name': the name of the resource
+                'methods': the methods to call ('method' for the single method of a 'delete')
+                'instance_args': the instance arguments of a 'read', 'update' or 'delete'
+                'create_method' and 'creation_args': the creation method and arguments of a 'create'
+                'allowed_method_types' (optional): overrides the operation's allowed method types
+                'independent' (optional): whether this operation can run in parallel with adjacent
+                    operations which are also marked as independent
+            environment (dict): The environment in which every operation is performed
+            encode (bool): Whether to encode the results
+            max_workers (int): The number of threads used to run independent operations
+
+        Returns:
+            List[dict]: The outcome of each operation, in order, with 'result', 'commit' and 'error'
+                keys ('create' operations also have an 'instance' key). If the operation failed,
+                'error' is a ResourceMethodFailedError with method, args, error and trace fields.
+
+        """
+
+        scope = self._current_scope()
+        # instance key -> target, for sharing instances and access decisions between operations
+        targets = {}
+        # targets to commit once every operation has run, in the order they were first changed
+        dirty_targets = []
+        entries = []
+        pool = None
+
+        try:
+            for group in _independent_groups(operations):
+                # construct instances in order, before any of the group is run
+                prepared = [
+                    (operation, self._batch_target(operation, targets))
+                    for operation in group
+                ]
+
+                def _run(prepared_operation):
+                    operation, target = prepared_operation
+                    return self._batch_run(operation, target, environment, encode)
+
+                if len(prepared) > 1:
+                    if pool is None:
+                        pool = ThreadPool(max_workers)
+                    # run the operations within this request's scope, on the pool's threads
+                    outcomes = pool.map(lambda prepared_operation: self._in_scope(scope, _run, prepared_operation), prepared)
+                else:
+                    outcomes = [_run(prepared[0])]
+
+                for entry, dirty_target in outcomes:
+                    entries.append(entry)
+                    if dirty_target is not None:
+                        if not dirty_target['entries']:
+                            dirty_targets.append(dirty_target)
+                        dirty_target['entries'].append(entry)
+        finally:
+            if pool is not None:
+                pool.close()
+
+        # commit each changed instance once
+        for target in dirty_targets:
+            try:
+                commit = self._commit(target['name'], target['instance'], environment, encode=encode, method_types=target['method_types'])
+            except Exception as original_err:
+                err = self._batch_error(target['name'], 'commit', original_err, sys.exc_info()[2])
+                for entry in target['entries']:
+                    entry['error'] = err
+            else:
+                for entry in target['entries']:
+                    entry['commit'] = commit
+
+        return entries
+
+    def _batch_target(self, operation, targets):
+        """Finds or constructs the shared target (instance and access decisions) of a batch operation"""
+
+        name = operation.get('name')
+        operation_name = operation.get('operation')
+        try:
+            plan = self._get_plan(name)
+            if operation_name not in DEFAULT_ALLOWED_METHOD_TYPES:
+                raise ResourceNotAllowedError("'" + str(operation_name) + "' is not a resource operation")
+
+            if operation_name in ('read', 'update', 'delete'):
+                instance_args = operation.get('instance_args') or {}
+                key = instance_key(name, instance_args)
+                is_shared = (operation_name == 'read')
+                target = targets.get(key, None)
+                if target is None:
+                    target = targets[key] = self._new_batch_target(name, plan, self._instance(plan, instance_args, shared=is_shared), plan.access)
+                    target['is_shared'] = is_shared
+                elif target['is_shared'] and not is_shared:
+                    # writes never change the shared instance (see _instance), so switch the target to a private one
+                    target['instance'] = self._instance(plan, instance_args, shared=False)
+                    target['granted'] = {}
+                    target['is_shared'] = False
+            else:
+                key = (name,)
+                if key not in targets:
+                    targets[key] = self._new_batch_target(name, plan, plan.cls, plan.class_access)
+        except Exception as original_err:
+            return self._batch_error(name, operation_name, original_err, sys.exc_info()[2])
+
+        return targets[key]
+
+    def _new_batch_target(self, name, plan, instance, access_plan):
+        return {
+            'name': name,
+            'plan': plan,
+            'instance': instance,
+            'access_plan': access_plan,
+            'granted': {},
+            # whether the instance may be the one held in the instance cache (which is never written to)
+            'is_shared': False,
+            'entries': [],
+            # the types of the methods called on the instance, if it is changed
+            'method_types': set()
+        }
+
+    def _batch_run(self, operation, target, environment, encode):
+        """Runs a single batch operation on its target, returning its entry and the target it changed (if any)"""
+
+        operation_name = operation.get('operation')
+        entry = {
+            'result': None,
+            'commit': None,
+            'error': None
+        }
+        dirty_target = None
+
+        if isinstance(target, Exception):
+            entry['error'] = target
+            return entry, dirty_target
+
+        plan = target['plan']
+        allowed_method_types = operation.get('allowed_method_types', DEFAULT_ALLOWED_METHOD_TYPES[operation_name])
+
+        try:
+            if operation_name == 'create':
+                entry['instance'] = None
+                create_methods = [{
+                    'method': operation.get('create_method'),
+                    'args': operation.get('creation_args')
+                }]
+                instance = self._call(plan, plan.cls, create_methods, target['access_plan'], environment, ('create',), encode=False, granted=target['granted'])[0]
+                if not isinstance(instance, plan.cls):
+                    raise ResourceMethodNotFoundError("'" + plan.cls.__name__ + "' has no creation method '" + str(operation.get('create_method')) + "'")
+
+                entry['instance'] = instance
+                dirty_target = self._new_batch_target(target['name'], plan, instance, plan.access)
+                dirty_target['method_types'].add('create')
+
+                methods = operation.get('methods')
+                if methods is not None and len(methods) > 0:
+                    allowed_method_types = tuple(method_type for method_type in allowed_method_types if method_type != 'create')
+                    entry['result'] = self._call(plan, instance, methods, plan.access, environment, allowed_method_types, encode, granted=dirty_target['granted'])
+            elif operation_name == 'delete':
+                dirty_target = target
+                entry['result'] = self._call(plan, target['instance'], [operation.get('method')], target['access_plan'], environment, allowed_method_types, encode, granted=target['granted'])[0]
+            else:
+                if operation_name == 'update':
+                    dirty_target = target
+                entry['result'] = self._call(plan, target['instance'], operation.get('methods') or [], target['access_plan'], environment, allowed_method_types, encode, granted=target['granted'])
+        except Exception as original_err:
+            entry['error'] = self._batch_error(target['name'], operation_name, original_err, sys.exc_info()[2])
+            # as with update, a failed operation doesn't commit its target
+            dirty_target = None
+
+        if dirty_target is not None and self.changes is not None:
+            methods = [operation.get('method')] if operation_name == 'delete' else operation.get('methods')
+            dirty_target['method_types'].update(self._method_types(plan, methods))
+
+        return entry, dirty_target
+
+    def _batch_error(self, name, operation_name, original_err, trace):
+        """Reports a failed batch operation as a ResourceMethodFailedError"""
+
+        if isinstance(original_err, ResourceMethodFailedError):
+            return original_err
+
+        return _method_error(
+            ResourceMethodFailedError,
+            "'" + str(name) + "' failed to perform '" + str(operation_name) + "'",
+            getattr(original_err, 'method', None),
+            original_err.args if hasattr(original_err, 'method') else {},
+            original_err,
+            trace
+        )
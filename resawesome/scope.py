@@ -0,0 +1,14 @@
+class RequestScope(object):
+    """State shared by every API call made while handling a single request (see API.request)"""
+
+    def __init__(self):
+        # access cache key -> access decision
+        self.access = {}
+        # id -> instance, for instances keyed by id, so that their ids are not reused during the request
+        self.instances = {}
+        # instance key -> instance, so that each resource instance is only constructed once per request
+        self.identity_map = {}
+        # id -> instance key, of the instances in the identity map
+        self.instance_keys = {}
+        # the UnitOfWork collecting changed instances, if commits are deferred (see API.unit_of_work)
+        self.unit_of_work = None
@@ -1,38 +1,208 @@
+import json
+import struct
+import types
+
 from datetime import datetime
+from itertools import izip
+
+ISO_FORMATS = ('%Y-%m-%dT%H:%M:%S.%f', '%Y-%m-%dT%H:%M:%S', '%Y-%m-%d')
+
+class ParseError(ValueError):
+    pass
+
+def date_to_isoformat(value):
+    return value.isoformat()
+
+def isoformat_to_date(value):
+    for iso_format in ISO_FORMATS:
+        try:
+            return datetime.strptime(value, iso_format)
+        except ValueError:
+            pass
+    raise ParseError("'" + value + "' is not an ISO 8601 date")
+
+def timestamp_to_datetime(value):
+    return datetime.utcfromtimestamp(value)
+
+class EncodedError(Exception):
+    """An exception decoded from its error dict (see get_encoder), which encodes back into the same dict"""
+
+    def __init__(self, error_dict):
+        super(EncodedError, self).__init__(error_dict.get('message', None) if isinstance(error_dict, dict) else error_dict)
+        self.error_dict = error_dict
+
+def _exception_dict(value):
+    error_dict = getattr(value, 'error_dict', None)
+    if error_dict is None:
+        error_dict = {
+            'type': type(value).__name__,
+            'message': str(value)
+        }
+    return error_dict
+
+def api_error_dict(err):
+    """The error dict of an error raised by an API operation, for sending it back to the caller (as an EncodedError)"""
+
+    error_dict = {
+        'type': type(err).__name__,
+        # API errors replace their args with the arguments sent to the failed method, so use their message
+        'message': getattr(err, 'message', None) or str(err)
+    }
+    if getattr(err, 'method', None) is not None:
+        error_dict['method'] = err.method
+    return error_dict
+
+def _type_name(value):
+    return repr(value)
+
+# type -> (tag, function transforming values of that type into a JSON serializable form)
+# tags are None for types which are encoded as plain JSON
+TAG_ENCODERS = {
+    datetime           : ('datetime', date_to_isoformat),
+    set                : ('set', list),
+    frozenset          : ('set', list),
+    types.GeneratorType: (None, list)
+}
+
+# base types for subclasses which aren't in TAG_ENCODERS, in order of precedence
+TAG_ENCODER_BASES = (
+    (datetime, ('datetime', date_to_isoformat)),
+    (set, ('set', list)),
+    (frozenset, ('set', list)),
+    (Exception, ('exception', _exception_dict)),
+    (type, ('type', _type_name))
+)
+
+def _decode_datetime(value):
+    return convert_arg('datetime', value)
+
+class Reference(object):
+    """A decoded reference to an entry of a graph's resource table, before it is resolved"""
+
+    __slots__ = ('ref_id',)
+
+    def __init__(self, ref_id):
+        self.ref_id = ref_id
+
+def _reference_id(value):
+    """The id referred to by a value, if it is a reference (decoded or still tagged), otherwise None"""
+
+    if isinstance(value, Reference):
+        return value.ref_id
+    elif isinstance(value, dict) and value.get('__type__', None) == 'ref':
+        return value.get('__value__')
+    return None
+
+def decode_references(graph):
+    """Resolve the references in a graph encoded by API.encode(..., references=True).
+
+    Every reference to a resource is replaced by the same (shared) decoded view, so cycles
+    between resources are decoded as cycles between their views.
+
+    Args:
+        graph (dict): The value of a 'graph' tagged value: {'resources': {id: view}, 'result': ...}
+
+    Returns:
+        The result, with its references resolved
+
+    """
+
+    resources = graph['resources']
+    root = [graph['result']]
+
+    # walk every container once, replacing references with the views they refer to
+    stack = [root] + [view for view in resources.itervalues() if isinstance(view, (dict, list))]
+    visited = set()
+    while stack:
+        container = stack.pop()
+        if id(container) in visited:
+            continue
+        visited.add(id(container))
+
+        items = container.iteritems() if isinstance(container, dict) else enumerate(container)
+        for key, val in list(items):
+            ref_id = _reference_id(val)
+            if ref_id is not None:
+                container[key] = resources[ref_id]
+            elif isinstance(val, (dict, list)):
+                stack.append(val)
+
+    return root[0]
+
+# tag -> function transforming a tagged value back into its type
+TAG_DECODERS = {
+    'datetime' : _decode_datetime,
+    'set'      : set,
+    'exception': EncodedError,
+    'type'     : lambda value: value,
+    'ref'      : Reference,
+    'graph'    : decode_references
+}
+
+def _tag_encoder(obj):
+    obj_type = type(obj)
+    tag_encoder = TAG_ENCODERS.get(obj_type, None)
+    if tag_encoder is None:
+        for base_type, base_tag_encoder in TAG_ENCODER_BASES:
+            if isinstance(obj, base_type):
+                tag_encoder = base_tag_encoder
+                break
+        else:
+            return None, None
+
+        # dispatch directly on this type from now on
+        TAG_ENCODERS[obj_type] = tag_encoder
+
+    return tag_encoder
 
 def get_decoder(types={}):
+    """Create a JSON object_hook which decodes tagged ({'__type__': ..., '__value__': ...}) values.
+
+    Args:
+        types (dict): Overrides the decoding of tags, as tag -> type declaration (see convert_arg)
+
+    """
+
     def decode_default(obj):
         if isinstance(obj, dict) and '__type__' in obj:
             obj_type = obj['__type__']
             obj_val  = obj.get('__value__')
 
+            if not isinstance(obj_type, basestring):
+                raise ParseError("Type tags must be strings, not " + repr(obj_type))
+
             if obj_type in types:
-                obj_type = types[obj_type]
+                return convert_arg(types[obj_type], obj_val)
 
-            return convert_arg(obj_type, obj_val)
+            tag_decoder = TAG_DECODERS.get(obj_type, None)
+            if tag_decoder is not None:
+                return tag_decoder(obj_val)
+
+            try:
+                return convert_arg(obj_type, obj_val)
+            except TypeError:
+                # tags come from the wire, so an unknown tag is bad input
+                raise ParseError("Unable to decode a value tagged '" + obj_type + "'")
         else:
             return obj
 
     return decode_default
 
 def get_encoder(wrap_types=False):
+    """Create a JSON default function which encodes datetimes, sets, generators, exceptions and types.
+
+    Args:
+        wrap_types (bool): Whether to tag encoded values with their type, as
+            {'__type__': ..., '__value__': ...}, so that they can be decoded (see get_decoder)
+
+    """
+
     def encode_default(obj):
-        wrapped_type = None
-        encoded_object = obj
-
-        if isinstance(obj, datetime):
-            wrapped_type = 'datetime'
-            encoded_object = date_to_isoformat(obj)
-        elif isinstance(obj, types.GeneratorType) or isinstance(obj, set):
-            if isinstance(obj, set):
-                wrapped_type = 'set'
-            encoded_object = list(obj)
-        elif isinstance(obj, Exception):
-            wrapped_type = 'exception'
-            encoded_object = obj.error_dict
-        elif isinstance(obj, type):
-            wrapped_type = 'type'
-            encoded_object = repr(obj)
+        wrapped_type, transform = _tag_encoder(obj)
+        if transform is None:
+            raise TypeError(repr(obj) + " is not JSON serializable")
+
+        encoded_object = transform(obj)
 
         if wrap_types and wrapped_type is not None:
             encoded_object = {
@@ -44,8 +214,31 @@ def get_encoder(wrap_types=False):
 
     return encode_default
 
+_default_encoder = get_encoder(wrap_types=True)
+_default_decoder = get_decoder()
+
+def json_encode(obj):
+    """Encode an object as JSON text, tagging types which JSON can't represent"""
+    return json.dumps(obj, default=_default_encoder)
+
 def json_decode(obj):
-    return obj # TODO
+    """Decode JSON text, decoding any tagged types"""
+    return json.loads(obj, object_hook=_default_decoder)
+
+def json_dump(obj, fp):
+    """Encode an object as JSON text into a file-like object, writing it as it is encoded"""
+    for chunk in json.JSONEncoder(default=_default_encoder).iterencode(obj):
+        fp.write(chunk)
+
+def json_load(fp):
+    """Decode a JSON document from a file-like object"""
+    return json.load(fp, object_hook=_default_decoder)
+
+def iter_json_load(fp):
+    """Decode a stream of newline delimited JSON documents from a file-like object, one at a time"""
+    for line in fp:
+        if line.strip():
+            yield json_decode(line)
 
 def _convert_datetime(value):
     try:
@@ -66,7 +259,50 @@ def _convert_list(value):
         value = [value]
     return value
 
-def convert_arg(type_name, value):
+def _convert_bool(value):
+    value = value.lower()
+    return value == 'true' or value == 'yes' or value == '1'
+
+def _convert_json(value):
+    try:
+        return json_decode(value)
+    except ValueError:
+        return value
+
+# type name -> function converting a string into that type
+STRING_CONVERTERS = {
+    'list'    : _convert_list,
+    'tuple'   : lambda value: (value,),
+    'datetime': _convert_datetime,
+    'dict'    : lambda value: json_decode(value),
+    'int'     : int,
+    'long'    : long,
+    'float'   : float,
+    'bool'    : _convert_bool,
+    'json'    : _convert_json
+}
+
+# type name -> (type, types of element which the type can convert in bulk), for lists of numbers
+BULK_CONVERTERS = {
+    'int'  : (int, frozenset([str, unicode, int])),
+    'long' : (long, frozenset([str, unicode, long])),
+    'float': (float, frozenset([str, unicode, float]))
+}
+
+# type declaration -> compiled converter, for types and the type names in STRING_CONVERTERS
+_compiled_converters = {}
+
+def compile_converter(type_name):
+    """Compile a type declaration into a function which converts a value into that type.
+
+    The compiled function is equivalent to convert_arg(type_name, value), but the declaration
+    is only examined once. A declaration wrapped in a list (e.g. [int]) converts a list of
+    values (decoded from a string if needed) into a list of that type, in a single pass.
+    """
+
+    if isinstance(type_name, list):
+        return _compile_list_converter(type_name[0] if len(type_name) > 0 else None)
+
     converter = None
     if not isinstance(type_name, basestring):
         converter = type_name
@@ -74,41 +310,535 @@ def convert_arg(type_name, value):
     elif type_name == 'json':
         converter = json_decode
 
-    if isinstance(value, basestring):
-        if type_name == 'list':
-            value = _convert_list(value)
-        elif type_name == 'tuple':
-            value = (value,)
-        elif type_name == 'datetime':
-            value = _convert_datetime(value)
-        elif type_name == 'dict':
-            value = json_decode(value)
-        elif type_name == 'int':
-            value = int(value)
-        elif type_name == 'long':
-            value = long(value)
-        elif type_name == 'float':
-            value = float(value)
-        elif type_name == 'bool':
-            value = (value.lower() == 'true') or (value.lower() == 'yes') or (value.lower() == '1')
-        elif type_name == 'json':
-            try:
-                value = converter(value)
-            except ValueError:
-                value = value
-        elif converter is not None:
-            if isinstance(converter, type) and isinstance(value, converter):
+    convert_string = STRING_CONVERTERS.get(type_name, None)
+    if convert_string is None and converter is not None:
+        if isinstance(converter, type):
+            def convert_string(value):
                 # Converter is a type constructor (class, function, or python type) and
-                # value is already an instance of this type
-                pass
-            else:
-                value = converter(value)
-    elif isinstance(value, int) or isinstance(value, float):
-        if type_name == 'datetime':
-            value = timestamp_to_datetime(value)
+                # value may already be an instance of this type
+                return value if isinstance(value, converter) else converter(value)
+        else:
+            convert_string = converter
 
-    if value is not None and type(value).__name__ != type_name and not converter:
-        raise TypeError("Expecting <type '" + type_name + "'>")
+    convert_number = timestamp_to_datetime if type_name == 'datetime' else None
+    check_type = converter is None
 
-    return value
+    def _convert(value):
+        if isinstance(value, basestring):
+            if convert_string is not None:
+                value = convert_string(value)
+        elif convert_number is not None and isinstance(value, (int, float)):
+            value = convert_number(value)
+
+        if check_type and value is not None and type(value).__name__ != type_name:
+            raise TypeError("Expecting <type '" + type_name + "'>")
+
+        return value
+
+    return _convert
+
+def _compile_list_converter(element_type_name):
+    convert_list = compile_converter('list')
+    if element_type_name is None:
+        return convert_list
+
+    convert_element = compile_converter(element_type_name)
+    bulk_type, bulk_element_types = BULK_CONVERTERS.get(getattr(element_type_name, '__name__', element_type_name), (None, ()))
+
+    def _convert(values):
+        values = convert_list(values)
+        if values is None:
+            return values
+        elif bulk_type is not None and set(map(type, values)) <= bulk_element_types:
+            # convert every element at once
+            return map(bulk_type, values)
+        return [convert_element(value) for value in values]
+
+    return _convert
+
+def compile_converters(types):
+    """Compile a dict of argument name -> type declaration into a dict of argument name -> converter"""
+
+    return dict((arg_name, compile_converter(type_name)) for arg_name, type_name in types.iteritems())
+
+def convert_arg(type_name, value):
+    if isinstance(type_name, basestring) and type_name not in STRING_CONVERTERS:
+        # only known type names are cached, as type names may come from the wire (see get_decoder)
+        return compile_converter(type_name)(value)
+
+    try:
+        converter = _compiled_converters.get(type_name, None)
+    except TypeError:
+        # unhashable declarations (e.g. [int]) aren't cached
+        return compile_converter(type_name)(value)
+
+    if converter is None:
+        converter = _compiled_converters[type_name] = compile_converter(type_name)
+
+    return converter(value)
+
+# Binary Format
+#
+# A compact, length-prefixed binary encoding of the same values as the JSON codec. Each value
+# is a one byte tag, followed by:
+#   'N', 'T', 'F':      nothing (None, True, False)
+#   'b', 'h', 'i', 'q': a signed 8, 16, 32 or 64 bit integer (the smallest which fits)
+#   'L':                a long length, then a decimal string (integers which don't fit in 64 bits)
+#   'd':                a 64 bit float
+#   'c', 's':           a short or long length, then a byte string
+#   'v', 'u':           a short or long length, then a utf-8 encoded unicode string
+#   'a', 'l':           a short or long item count, then each item (lists)
+#   'p', 't':           a short or long item count, then each item (tuples)
+#   'e', 'S':           a short or long item count, then each item (sets)
+#   'P':                a list of integers, floats or booleans, packed: the format of its items ('b',
+#                       'h', 'i' or 'q' as above, 'd' or '?'), a long item count, then each item
+#                       (without tags)
+#   'G':                a list of dicts with the same keys (a table): a long row count, their shape
+#                       (as per 'K', 'R' or 'W', without values), then a list of each key's values
+#   'm', 'D':           a short or long item count, then each key and value (dicts)
+#   'K':                a short key count, then each key, then each value (dicts with a new shape)
+#   'R', 'W':           a short or long shape index, then each value (dicts with the same keys, in
+#                       the same order, as a shape already written)
+#   'z':                year, month, day, hour, minute, second, microsecond (naive, or in UTC)
+#   'E':                the error dict of an exception
+#   'Y':                a long length, then a string naming a type
+# Short lengths, counts and indexes are unsigned 8 bit integers, long ones are unsigned 32 bit
+# integers, and all values are big endian. Shapes are numbered in the order they are first written
+# within each encoded object, so that the keys of dicts which share them (e.g. rows) are written once.
+
+_LENGTH = struct.Struct('>I')
+_INT16 = struct.Struct('>h')
+_INT32 = struct.Struct('>i')
+_INT64 = struct.Struct('>q')
+_FLOAT = struct.Struct('>d')
+_DATETIME = struct.Struct('>HBBBBBI')
+
+_INT_MIN = -2 ** 63
+_INT_MAX = 2 ** 63 - 1
+
+# short length -> its byte
+_SHORT = [chr(i) for i in xrange(256)]
+# 8 bit integer -> its encoded value, and byte -> 8 bit integer
+_INT8_VALUES = dict((i, 'b' + chr(i & 0xff)) for i in xrange(-128, 128))
+_INT8_READS = dict((chr(i & 0xff), i) for i in xrange(-128, 128))
+
+# packed format -> the size of each item
+_PACKED_SIZES = {'b': 1, 'h': 2, 'i': 4, 'q': 8, 'd': 8, '?': 1}
+# type -> the packed format of lists of it (integers use the smallest format which fits)
+_PACKED_FORMATS = {int: None, float: 'd', bool: '?'}
+
+# the fewest items in a list which is packed (or written as a table)
+PACK_MIN_ITEMS = 4
+
+# the number of bytes read from a stream at a time
+DEFAULT_READ_SIZE = 65536
+
+class BinaryDecodeError(ValueError):
+    pass
+
+class _TruncatedError(BinaryDecodeError):
+    pass
+
+def _write_int(value, write, shapes):
+    if -0x80 <= value < 0x80:
+        write(_INT8_VALUES[value])
+    elif -0x8000 <= value < 0x8000:
+        write('h' + _INT16.pack(value))
+    elif -0x80000000 <= value < 0x80000000:
+        write('i' + _INT32.pack(value))
+    elif _INT_MIN <= value <= _INT_MAX:
+        write('q' + _INT64.pack(value))
+    else:
+        _write_long_bytes('L', str(value), write)
+
+def _packed_format(low, high):
+    """The packed format of integers from low to high, or None if they don't fit in 64 bits"""
+
+    if -0x80 <= low and high < 0x80:
+        return 'b'
+    elif -0x8000 <= low and high < 0x8000:
+        return 'h'
+    elif -0x80000000 <= low and high < 0x80000000:
+        return 'i'
+    elif _INT_MIN <= low and high <= _INT_MAX:
+        return 'q'
+    return None
+
+def _write_bytes(short_tag, long_tag, value, write):
+    length = len(value)
+    if length < 256:
+        write(short_tag + _SHORT[length] + value)
+    else:
+        _write_long_bytes(long_tag, value, write)
+
+def _write_long_bytes(tag, value, write):
+    write(tag + _LENGTH.pack(len(value)))
+    write(value)
+
+def _write_count(short_tag, long_tag, count, write):
+    write(short_tag + _SHORT[count] if count < 256 else long_tag + _LENGTH.pack(count))
+
+def _write_items(short_tag, long_tag, value, write, shapes):
+    _write_count(short_tag, long_tag, len(value), write)
+    for item in value:
+        _write_value(item, write, shapes)
+
+def _write_list(value, write, shapes):
+    count = len(value)
+    if count >= PACK_MIN_ITEMS:
+        item_type = type(value[0])
+        if item_type in _PACKED_FORMATS and all(type(item) is item_type for item in value):
+            item_format = _PACKED_FORMATS[item_type] or _packed_format(min(value), max(value))
+            if item_format is not None:
+                write('P' + item_format + _LENGTH.pack(count) + struct.pack('>' + str(count) + item_format, *value))
+                return
+        elif item_type is dict and _write_table(value, write, shapes):
+            return
+
+    _write_items('a', 'l', value, write, shapes)
+
+def _write_table(rows, write, shapes):
+    """Write a list of dicts with the same keys as a table of columns, returning False (writing nothing) if they don't have them"""
+
+    keys = tuple(rows[0])
+    if not 0 < len(keys) < 256:
+        return False
+
+    key_types = tuple(map(type, keys))
+    shape = shapes.get(keys, None)
+    if shape is not None and shape[1] != key_types:
+        return False
+
+    for row in rows:
+        if type(row) is not dict or tuple(row) != keys or tuple(map(type, row)) != key_types:
+            return False
+
+    write('G' + _LENGTH.pack(len(rows)))
+    _write_shape(keys, write, shapes)
+    for key in keys:
+        _write_list([row[key] for row in rows], write, shapes)
+    return True
+
+def _write_shape(keys, write, shapes):
+    """Write the shape of dicts with some keys: the keys, if it is new, otherwise its index.
+
+    Returns False (writing nothing) if keys which are equal to these, but of other types (e.g. 1 and
+    True, or 'a' and u'a'), already have the shape.
+    """
+
+    key_types = tuple(map(type, keys))
+    shape = shapes.get(keys, None)
+    if shape is None:
+        shapes[keys] = (len(shapes), key_types)
+        write('K' + _SHORT[len(keys)])
+        for key in keys:
+            _write_value(key, write, shapes)
+    elif shape[1] == key_types:
+        _write_count('R', 'W', shape[0], write)
+    else:
+        return False
+
+    return True
+
+def _write_dict(value, write, shapes):
+    count = len(value)
+    if 0 < count < 256 and _write_shape(tuple(value), write, shapes):
+        for val in value.itervalues():
+            _write_value(val, write, shapes)
+        return
+
+    _write_count('m', 'D', count, write)
+    for key, val in value.iteritems():
+        _write_value(key, write, shapes)
+        _write_value(val, write, shapes)
+
+def _write_datetime(value, write, shapes):
+    if value.tzinfo is not None:
+        value = (value - value.utcoffset()).replace(tzinfo=None)
+    write('z' + _DATETIME.pack(value.year, value.month, value.day, value.hour, value.minute, value.second, value.microsecond))
+
+# type -> function writing a value of that type
+BINARY_WRITERS = {
+    type(None)         : lambda value, write, shapes: write('N'),
+    bool               : lambda value, write, shapes: write('T' if value else 'F'),
+    int                : _write_int,
+    long               : _write_int,
+    float              : lambda value, write, shapes: write('d' + _FLOAT.pack(value)),
+    str                : lambda value, write, shapes: _write_bytes('c', 's', value, write),
+    unicode            : lambda value, write, shapes: _write_bytes('v', 'u', value.encode('utf-8'), write),
+    list               : _write_list,
+    tuple              : lambda value, write, shapes: _write_items('p', 't', value, write, shapes),
+    set                : lambda value, write, shapes: _write_items('e', 'S', value, write, shapes),
+    frozenset          : lambda value, write, shapes: _write_items('e', 'S', value, write, shapes),
+    dict               : _write_dict,
+    datetime           : _write_datetime,
+    types.GeneratorType: lambda value, write, shapes: _write_list(list(value), write, shapes)
+}
+
+# base types for subclasses which aren't in BINARY_WRITERS, in order of precedence
+BINARY_WRITER_BASES = (
+    (bool, BINARY_WRITERS[bool]),
+    (int, _write_int),
+    (long, _write_int),
+    (float, BINARY_WRITERS[float]),
+    (str, BINARY_WRITERS[str]),
+    (unicode, BINARY_WRITERS[unicode]),
+    # (subclasses of dict and list could have their own iteration order or items, so aren't packed or shaped)
+    (dict, lambda value, write, shapes: _write_dict(dict(value), write, shapes)),
+    (tuple, BINARY_WRITERS[tuple]),
+    (list, lambda value, write, shapes: _write_list(list(value), write, shapes)),
+    (set, BINARY_WRITERS[set]),
+    (frozenset, BINARY_WRITERS[frozenset]),
+    (datetime, _write_datetime),
+    (Exception, lambda value, write, shapes: (write('E'), _write_value(_exception_dict(value), write, shapes))),
+    (type, lambda value, write, shapes: _write_long_bytes('Y', _type_name(value), write))
+)
+
+def _write_value(value, write, shapes):
+    writer = BINARY_WRITERS.get(type(value), None)
+    if writer is None:
+        for base_type, base_writer in BINARY_WRITER_BASES:
+            if isinstance(value, base_type):
+                writer = base_writer
+                break
+        else:
+            raise TypeError(repr(value) + " cannot be binary encoded")
+
+        # dispatch directly on this type from now on
+        BINARY_WRITERS[type(value)] = writer
+
+    writer(value, write, shapes)
+
+# Each reader takes the binary data, the offset after a value's tag and the shapes read so far,
+# and returns the value and the offset after it. Reading past the end of the data raises an
+# IndexError, struct.error or _TruncatedError.
+
+def _read_slice(data, offset, length):
+    end = offset + length
+    if end > len(data):
+        raise _TruncatedError("Unexpected end of binary data")
+    return data[offset:end], end
+
+def _read_short_bytes(data, offset, shapes):
+    return _read_slice(data, offset + 1, ord(data[offset]))
+
+def _read_long_bytes(data, offset, shapes):
+    return _read_slice(data, offset + 4, _LENGTH.unpack_from(data, offset)[0])
+
+def _read_short_unicode(data, offset, shapes):
+    value, offset = _read_slice(data, offset + 1, ord(data[offset]))
+    return value.decode('utf-8'), offset
+
+def _read_long_unicode(data, offset, shapes):
+    value, offset = _read_long_bytes(data, offset, shapes)
+    return value.decode('utf-8'), offset
+
+def _read_items(data, offset, count, shapes):
+    readers = BINARY_READERS
+    items = []
+    append = items.append
+    for i in xrange(count):
+        tag = data[offset]
+        # short strings and small integers are read inline, being the most common
+        if tag == 'c':
+            start = offset + 2
+            offset = start + ord(data[offset + 1])
+            append(data[start:offset])
+        elif tag == 'b':
+            append(_INT8_READS[data[offset + 1]])
+            offset += 2
+        elif tag == 'v':
+            start = offset + 2
+            offset = start + ord(data[offset + 1])
+            if offset > len(data):
+                raise _TruncatedError("Unexpected end of binary data")
+            append(data[start:offset].decode('utf-8'))
+        elif tag == 'N':
+            append(None)
+            offset += 1
+        else:
+            item, offset = readers[tag](data, offset + 1, shapes)
+            append(item)
+
+    if offset > len(data):
+        # a string was cut short
+        raise _TruncatedError("Unexpected end of binary data")
+    return items, offset
+
+def _read_short_items(data, offset, shapes):
+    return _read_items(data, offset + 1, ord(data[offset]), shapes)
+
+def _read_long_items(data, offset, shapes):
+    return _read_items(data, offset + 4, _LENGTH.unpack_from(data, offset)[0], shapes)
+
+def _read_packed(data, offset, shapes):
+    item_format = data[offset]
+    size = _PACKED_SIZES.get(item_format, None)
+    if size is None:
+        raise BinaryDecodeError("Unknown packed integer format '" + item_format + "'")
+
+    count = _LENGTH.unpack_from(data, offset + 1)[0]
+    offset += 5
+    return list(struct.unpack_from('>' + str(count) + item_format, data, offset)), offset + count * size
+
+def _read_pairs(data, offset, count, shapes):
+    readers = BINARY_READERS
+    value = {}
+    for i in xrange(count):
+        key, offset = readers[data[offset]](data, offset + 1, shapes)
+        value[key], offset = readers[data[offset]](data, offset + 1, shapes)
+    return value, offset
+
+def _read_shape(data, offset, shapes):
+    """Read the shape (its tag and keys, or index) at an offset, returning its keys and the offset after it"""
+
+    tag = data[offset]
+    if tag == 'K':
+        keys, offset = _read_items(data, offset + 2, ord(data[offset + 1]), shapes)
+        shapes.append(keys)
+        return keys, offset
+    elif tag == 'R':
+        index = ord(data[offset + 1])
+        offset += 2
+    elif tag == 'W':
+        index = _LENGTH.unpack_from(data, offset + 1)[0]
+        offset += 5
+    else:
+        raise BinaryDecodeError("Expected a dict shape, not '" + tag + "'")
+
+    if index >= len(shapes):
+        raise BinaryDecodeError("Unknown dict shape " + str(index))
+    return shapes[index], offset
+
+def _read_shaped(data, offset, shapes):
+    # the shape starts at the dict's tag
+    keys, offset = _read_shape(data, offset - 1, shapes)
+    values, offset = _read_items(data, offset, len(keys), shapes)
+    return dict(izip(keys, values)), offset
+
+def _read_table(data, offset, shapes):
+    count = _LENGTH.unpack_from(data, offset)[0]
+    keys, offset = _read_shape(data, offset + 4, shapes)
+
+    columns = []
+    for key in keys:
+        column, offset = _read_value(data, offset, shapes)
+        if not isinstance(column, list) or len(column) != count:
+            raise BinaryDecodeError("Table column of " + repr(key) + " is not a list of " + str(count) + " values")
+        columns.append(column)
+
+    return [dict(izip(keys, row)) for row in izip(*columns)], offset
+
+def _read_tuple(read_items):
+    def _read(data, offset, shapes):
+        items, offset = read_items(data, offset, shapes)
+        return tuple(items), offset
+    return _read
+
+def _read_set(read_items):
+    def _read(data, offset, shapes):
+        items, offset = read_items(data, offset, shapes)
+        return set(items), offset
+    return _read
+
+def _read_datetime(data, offset, shapes):
+    return datetime(*_DATETIME.unpack_from(data, offset)), offset + _DATETIME.size
+
+def _read_error(data, offset, shapes):
+    error_dict, offset = _read_value(data, offset, shapes)
+    return EncodedError(error_dict), offset
+
+def _read_long_int(data, offset, shapes):
+    digits, offset = _read_long_bytes(data, offset, shapes)
+    return int(digits), offset
+
+# tag -> function reading a value of that tag
+BINARY_READERS = {
+    'N': lambda data, offset, shapes: (None, offset),
+    'T': lambda data, offset, shapes: (True, offset),
+    'F': lambda data, offset, shapes: (False, offset),
+    'b': lambda data, offset, shapes: (_INT8_READS[data[offset]], offset + 1),
+    'h': lambda data, offset, shapes: (_INT16.unpack_from(data, offset)[0], offset + 2),
+    'i': lambda data, offset, shapes: (_INT32.unpack_from(data, offset)[0], offset + 4),
+    'q': lambda data, offset, shapes: (_INT64.unpack_from(data, offset)[0], offset + 8),
+    'L': _read_long_int,
+    'd': lambda data, offset, shapes: (_FLOAT.unpack_from(data, offset)[0], offset + 8),
+    'c': _read_short_bytes,
+    's': _read_long_bytes,
+    'v': _read_short_unicode,
+    'u': _read_long_unicode,
+    'a': _read_short_items,
+    'l': _read_long_items,
+    'p': _read_tuple(_read_short_items),
+    't': _read_tuple(_read_long_items),
+    'e': _read_set(_read_short_items),
+    'S': _read_set(_read_long_items),
+    'P': _read_packed,
+    'm': lambda data, offset, shapes: _read_pairs(data, offset + 1, ord(data[offset]), shapes),
+    'D': lambda data, offset, shapes: _read_pairs(data, offset + 4, _LENGTH.unpack_from(data, offset)[0], shapes),
+    'K': _read_shaped,
+    'R': _read_shaped,
+    'W': _read_shaped,
+    'G': _read_table,
+    'z': _read_datetime,
+    'E': _read_error,
+    'Y': _read_long_bytes
+}
+
+# the errors raised by reading past the end of the data
+_TRUNCATED_ERRORS = (IndexError, struct.error, _TruncatedError)
+
+def _read_value(data, offset, shapes):
+    return BINARY_READERS[data[offset]](data, offset + 1, shapes)
+
+def _decode(data, offset):
+    """Decode the object at an offset of binary data, returning it and the offset after it"""
+
+    try:
+        return _read_value(data, offset, [])
+    except KeyError as err:
+        raise BinaryDecodeError("Unknown binary tag " + repr(err.args[0]))
+
+def binary_encode(obj):
+    """Encode an object in the binary format"""
+    pieces = []
+    _write_value(obj, pieces.append, {})
+    return ''.join(pieces)
+
+def binary_decode(data):
+    """Decode an object from the binary format"""
+    try:
+        return _decode(data, 0)[0]
+    except _TRUNCATED_ERRORS:
+        raise BinaryDecodeError("Unexpected end of binary data")
+
+def binary_dump(obj, fp):
+    """Encode an object in the binary format into a file-like object, writing it as it is encoded"""
+    _write_value(obj, fp.write, {})
+
+def binary_load(fp):
+    """Decode a single object from (the rest of) a file-like object holding the binary format"""
+    return binary_decode(fp.read())
+
+def iter_binary_load(fp, read_size=DEFAULT_READ_SIZE):
+    """Decode a stream of objects from a file-like object holding the binary format, one at a time"""
+
+    data = ''
+    offset = 0
+    while True:
+        try:
+            value, end = _decode(data, offset)
+        except _TRUNCATED_ERRORS:
+            # read more of the stream, doubling what is buffered for objects which span many reads
+            chunk = fp.read(max(read_size, len(data) - offset))
+            if not chunk:
+                if offset < len(data):
+                    raise BinaryDecodeError("Unexpected end of binary data")
+                return
+
+            data = data[offset:] + chunk
+            offset = 0
+            continue
 
+        yield value
+        offset = end
@@ -0,0 +1,318 @@
+import multiprocessing
+import threading
+
+from bus import Future, _operation_call
+from resource import (
+    ResourceNotFoundError,
+    ResourceMethodNotFoundError,
+    ResourceAccessDeniedError,
+    ResourceNotAllowedError,
+    ResourceMethodFailedError,
+    ResourceCursorNotFoundError,
+    ResourceArgumentError
+)
+from serialization import EncodedError, api_error_dict, binary_decode, binary_encode
+from util import instance_key
+
+# partitions of operations across shards
+BY_NAME = 'name'
+BY_INSTANCE = 'instance'
+
+# sent to a shard's process to stop it, once it has performed the operations sent before it
+_STOP = None
+
+# error type name -> error class, for errors raised again in the process which sent the operation
+# (any other error is raised as an EncodedError)
+SHARD_ERRORS = dict((error_class.__name__, error_class) for error_class in (
+    ResourceNotFoundError,
+    ResourceMethodNotFoundError,
+    ResourceAccessDeniedError,
+    ResourceNotAllowedError,
+    ResourceMethodFailedError,
+    ResourceCursorNotFoundError,
+    ResourceArgumentError,
+    ValueError,
+    TypeError,
+    KeyError
+))
+
+class ShardCrashedError(Exception):
+    """Raised for the operations which a shard's process was performing (or had been sent) when it exited"""
+    pass
+
+class ShardsClosedError(Exception):
+    pass
+
+def _shard_error(error_dict):
+    """Rebuild an error sent back by a shard"""
+
+    error_class = SHARD_ERRORS.get(error_dict.get('type'), None)
+    if error_class is None:
+        return EncodedError(error_dict)
+
+    err = error_class(error_dict.get('message'))
+    err.method = error_dict.get('method')
+    return err
+
+def _serve_shard(api, conn):
+    """Perform the operations sent to a shard's process, one at a time, until it is stopped"""
+
+    while True:
+        try:
+            request = binary_decode(conn.recv_bytes())
+        except (EOFError, IOError):
+            return
+
+        if request is _STOP:
+            return
+
+        request_id, operation, args, kwargs = request
+        try:
+            result = getattr(api, operation)(*args, **kwargs)
+            if operation == 'create':
+                # the created instance is returned as it is, so send its view instead
+                result = dict(result, instance=api.encode(result['instance'], _create_environment(args, kwargs)))
+            response = binary_encode((request_id, True, result))
+        except Exception as err:
+            # including results which can't be binary encoded
+            response = binary_encode((request_id, False, api_error_dict(err)))
+
+        conn.send_bytes(response)
+
+def _instance_args(operation, args, kwargs):
+    if operation not in ('read', 'update', 'delete'):
+        return None
+    elif 'instance_args' in kwargs:
+        return kwargs['instance_args']
+    return args[2] if len(args) > 2 else None
+
+def _create_environment(args, kwargs):
+    if 'environment' in kwargs:
+        return kwargs['environment']
+    return args[4]
+
+class ShardedExecutor(object):
+    """Runs API operations across shards, each a worker process with its own copy of the API.
+
+    Each operation is performed by the shard which owns it: by default, every operation on a
+    resource is performed by the same shard (BY_NAME), so that each shard's caches hold only the
+    instances of its resources. With BY_INSTANCE, the operations on each resource instance (read,
+    update and delete, by their instance arguments) are spread across the shards, and the other
+    operations are still partitioned by name. A function partition(operation, name, instance_args)
+    returning a shard number can be given instead.
+
+    Operations and their results are sent to and from the shards over pipes in the binary format
+    (see serialization), so their arguments and results must be binary encodable, i.e. operations
+    should encode their results (the default). Created instances are sent back as their encoded views.
+    Errors are raised again in the sending process, as the same API error (or ValueError, TypeError
+    or KeyError), or as an EncodedError.
+
+    Each shard performs the operations sent to it in order, one at a time, so throughput scales with
+    the number of shards (up to the number of cores) rather than being bound by a single process.
+    If a shard's process exits, every operation it had been sent fails with a ShardCrashedError (they
+    are not retried, as they may have had side effects), and it is replaced by a new process.
+
+    Shards are forked from the process which creates the executor, so every resource must be attached
+    to the API before then.
+
+    Args:
+        api (API): The API which performs the operations
+        shards (int): The number of shards (by default, the number of cores)
+        partition: BY_NAME, BY_INSTANCE, or a function partition(operation, name, instance_args) -> shard number
+        restart (bool): Whether to replace the processes of shards which exit
+
+    """
+
+    def __init__(self, api, shards=None, partition=BY_NAME, restart=True):
+        if partition not in (BY_NAME, BY_INSTANCE) and not callable(partition):
+            raise ValueError("'" + str(partition) + "' is not a partition")
+
+        self.api = api
+        self.partition = partition
+        self.restart = restart
+        self.is_closed = False
+
+        # the shard dicts of their lock, process state (its process, pipe and sent operations) and counters
+        self._shards = [self._start_shard(i) for i in xrange(shards or multiprocessing.cpu_count())]
+
+    def _start_shard(self, number):
+        shard = {
+            'number': number,
+            'state': None,
+            'next_id': 0,
+            'completed': 0,
+            'failed': 0,
+            'crashes': 0,
+            'lock': threading.Lock()
+        }
+        shard['state'] = self._start_process(shard)
+        return shard
+
+    def _start_process(self, shard):
+        conn, child_conn = multiprocessing.Pipe()
+        process = multiprocessing.Process(target=_serve_shard, args=(self.api, child_conn), name='resawesome-shard-' + str(shard['number']))
+        process.daemon = True
+        process.start()
+        # only the shard's process holds its end of the pipe, so that reading reaches the end of it when the process exits
+        child_conn.close()
+
+        state = {
+            'process': process,
+            'conn': conn,
+            # request id -> future, of the operations sent to the process
+            'pending': {}
+        }
+
+        # a thread per process receives its results
+        receiver = threading.Thread(target=self._receive, args=(shard, state), name='resawesome-shard-' + str(shard['number']) + '-receiver')
+        receiver.daemon = True
+        receiver.start()
+        state['receiver'] = receiver
+
+        return state
+
+    def _receive(self, shard, state):
+        conn = state['conn']
+        while True:
+            try:
+                request_id, is_successful, value = binary_decode(conn.recv_bytes())
+            except (EOFError, IOError):
+                break
+
+            with shard['lock']:
+                future = state['pending'].pop(request_id)
+                if is_successful:
+                    shard['completed'] += 1
+                else:
+                    shard['failed'] += 1
+
+            if is_successful:
+                future._set_result(value)
+            else:
+                future._set_error(_shard_error(value))
+
+        self._exited(shard, state)
+
+    def _exited(self, shard, state):
+        """Fail the operations sent to a shard's process which has exited, and replace it"""
+
+        state['process'].join()
+        state['conn'].close()
+
+        with shard['lock']:
+            pending = state['pending']
+            state['pending'] = {}
+            if pending or not self.is_closed:
+                shard['crashes'] += 1
+                shard['failed'] += len(pending)
+            if shard['state'] is state and self.restart and not self.is_closed:
+                shard['state'] = self._start_process(shard)
+
+        for future in pending.itervalues():
+            future._set_error(ShardCrashedError('shard ' + str(shard['number']) + ' exited (with code ' + str(state['process'].exitcode) + ') before performing the operation'))
+
+    def shard_number(self, operation, name, instance_args=None):
+        """The number of the shard which performs an operation"""
+
+        if callable(self.partition):
+            number = self.partition(operation, name, instance_args)
+        elif self.partition == BY_INSTANCE and instance_args is not None:
+            number = hash(instance_key(name, instance_args))
+        else:
+            number = hash(name)
+
+        return number % len(self._shards)
+
+    def send(self, message):
+        """Send an operation to the shard which owns it, returning a Future of its result.
+
+        Args:
+            message (dict): The operation to perform, as a ServiceBus message
+
+        Raises:
+            ShardsClosedError: If the executor has been closed
+            TypeError: If the operation's arguments cannot be binary encoded
+
+        """
+
+        operation, args, kwargs = _operation_call(message)
+        return self._send(operation, args, kwargs)
+
+    def _send(self, operation, args, kwargs):
+        shard = self._shards[self.shard_number(operation, args[0], _instance_args(operation, args, kwargs))]
+        future = Future()
+
+        with shard['lock']:
+            if self.is_closed:
+                raise ShardsClosedError('the executor is closed')
+
+            request_id = shard['next_id']
+            shard['next_id'] += 1
+            data = binary_encode((request_id, operation, args, kwargs))
+
+            state = shard['state']
+            state['pending'][request_id] = future
+            try:
+                state['conn'].send_bytes(data)
+            except IOError:
+                # the process has exited: the receiver fails the operations sent to it
+                pass
+
+        return future
+
+    def close(self, wait=True):
+        """Stop accepting operations. The operations already sent are still performed, and if wait is True, this waits for them to finish."""
+
+        stop = binary_encode(_STOP)
+        states = []
+        for shard in self._shards:
+            with shard['lock']:
+                self.is_closed = True
+                state = shard['state']
+                try:
+                    state['conn'].send_bytes(stop)
+                except IOError:
+                    pass
+                states.append(state)
+
+        if wait:
+            for state in states:
+                state['receiver'].join()
+
+    def stats(self):
+        """A list of each shard's {'pid', 'alive', 'pending', 'completed', 'failed', 'crashes'}"""
+
+        stats = []
+        for shard in self._shards:
+            with shard['lock']:
+                process = shard['state']['process']
+                stats.append({
+                    'pid': process.pid,
+                    'alive': process.is_alive(),
+                    'pending': len(shard['state']['pending']),
+                    'completed': shard['completed'],
+                    'failed': shard['failed'],
+                    'crashes': shard['crashes']
+                })
+        return stats
+
+    # Public Interface
+    # each takes the same arguments as the API operation, returning a Future of its result
+
+    def create(self, name, *args, **kwargs):
+        return self._send('create', (name,) + args, kwargs)
+
+    def read(self, name, *args, **kwargs):
+        return self._send('read', (name,) + args, kwargs)
+
+    def update(self, name, *args, **kwargs):
+        return self._send('update', (name,) + args, kwargs)
+
+    def delete(self, name, *args, **kwargs):
+        return self._send('delete', (name,) + args, kwargs)
+
+    def lookup(self, name, *args, **kwargs):
+        return self._send('lookup', (name,) + args, kwargs)
+
+    def execute(self, name, *args, **kwargs):
+        return self._send('execute', (name,) + args, kwargs)
@@ -0,0 +1,54 @@
+class UnitOfWork(object):
+    """Collects the instances changed within a request, so that they can be committed together.
+
+    Each changed instance has an entry, a dict of:
+        'name': the name of the instance's resource
+        'instance': the instance
+        'result': the (encoded) result of committing the instance, once it has been committed
+        'error': a ResourceMethodFailedError if committing the instance failed, otherwise None
+        'is_committed': whether the instance has been committed
+        'method_types': the types of the methods which changed the instance
+
+    Args:
+        flush_threshold (int): The number of changed instances at which they're committed, or
+            None to only commit them when flushed
+
+    """
+
+    def __init__(self, flush_threshold=None):
+        self.flush_threshold = flush_threshold
+
+        # (entry, environment, encode) for each changed instance, in the order they were changed
+        self.pending = []
+
+        # id -> entry, of the pending instances
+        self._entries = {}
+
+    def add(self, name, instance, environment, encode, method_types=()):
+        """Mark an instance as changed (by methods of the given types), returning its entry"""
+
+        entry = self._entries.get(id(instance), None)
+        if entry is None:
+            entry = self._entries[id(instance)] = {
+                'name': name,
+                'instance': instance,
+                'result': None,
+                'error': None,
+                'is_committed': False,
+                'method_types': set()
+            }
+            self.pending.append((entry, environment, encode))
+
+        entry['method_types'].update(method_types)
+        return entry
+
+    def should_flush(self):
+        return self.flush_threshold is not None and len(self.pending) >= self.flush_threshold
+
+    def take(self):
+        """Remove and return the pending instances, to be committed"""
+
+        pending = self.pending
+        self.pending = []
+        self._entries.clear()
+        return pending
@@ -20,8 +20,34 @@ def unwrap(func):
 
     return wrapped_func
 
+def argument_error(func, kwargs):
+    """Describe why func can't be called with some keyword arguments (or None if it can), e.g. 'missing arguments: name'"""
+
+    try:
+        arg_spec = getargspec(func)
+    except TypeError:
+        # builtins (e.g. object.__init__) take no arguments
+        return None if not kwargs else 'unexpected arguments: ' + ', '.join(sorted(kwargs))
+
+    arg_names = arg_spec.args
+    if arg_names and (arg_names[0] == 'self' or arg_names[0] == 'cls'):
+        arg_names = arg_names[1:] # these don't get passed in
+
+    required = arg_names[:len(arg_names) - len(arg_spec.defaults or ())]
+    missing = [arg_name for arg_name in required if arg_name not in kwargs]
+    if missing:
+        return 'missing arguments: ' + ', '.join(missing)
+
+    if arg_spec.keywords is None:
+        unexpected = sorted(arg_name for arg_name in kwargs if arg_name not in arg_names)
+        if unexpected:
+            return 'unexpected arguments: ' + ', '.join(unexpected)
+
+    return None
+
 def populate_args(method, sent_args, custom_args):
     kwargs = {}
+    converters = getattr(method, '_arg_converters', None) or {}
     arg_spec = getargspec(method).args
     for i, arg_name in enumerate(arg_spec):
         if i == 0 and (arg_name == 'self' or arg_name == 'cls'):
@@ -29,6 +55,77 @@ def populate_args(method, sent_args, custom_args):
         if arg_name in custom_args:
             kwargs[arg_name] = custom_args[arg_name]
         elif arg_name in sent_args and not arg_name.startswith('_'):
-            kwargs[arg_name] = sent_args[arg_name]
+            value = sent_args[arg_name]
+            kwargs[arg_name] = converters[arg_name](value) if arg_name in converters else value
     
     return kwargs
+
+def freeze(value):
+    """Convert a value (made of dicts, lists, tuples and sets) into an equivalent hashable value"""
+    if isinstance(value, dict):
+        return tuple(sorted((key, freeze(val)) for key, val in value.iteritems()))
+    elif isinstance(value, (list, tuple)):
+        return tuple(freeze(val) for val in value)
+    elif isinstance(value, (set, frozenset)):
+        return frozenset(freeze(val) for val in value)
+    return value
+
+# type -> function copying a value of that type, for the mutable containers copied by copy_containers
+_CONTAINER_COPIERS = {
+    dict: dict,
+    list: list,
+    set : set
+}
+
+def copy_containers(value):
+    """Copy the dicts and lists (and sets) within a value, without recursing, sharing every other value (e.g. resources)"""
+
+    copy = _CONTAINER_COPIERS.get(type(value), None)
+    if copy is None:
+        return value
+
+    copied = copy(value)
+    stack = [copied]
+    while stack:
+        container = stack.pop()
+        if type(container) is set:
+            # set items are hashable, so aren't mutable containers
+            continue
+
+        for key, item in (container.items() if type(container) is dict else enumerate(container)):
+            copy = _CONTAINER_COPIERS.get(type(item), None)
+            if copy is not None:
+                container[key] = copy(item)
+                stack.append(container[key])
+
+    return copied
+
+def instance_key(name, instance_args):
+    """A hashable key identifying a resource instance by its name and instance arguments"""
+    return (name, freeze(instance_args))
+
+def compile_field_mask(fields):
+    """Compile a list of (dotted) field paths into a field mask.
+
+    A field mask is a dict of field name -> the mask of its nested fields, or None to keep
+    the whole field, e.g. ['id', 'author.name'] -> {'id': None, 'author': {'name': None}}.
+    Masks which have already been compiled are returned as they are.
+    """
+
+    if fields is None or isinstance(fields, dict):
+        return fields
+
+    mask = {}
+    for path in fields:
+        node = mask
+        names = path.split('.')
+        for name in names[:-1]:
+            child = node.get(name, {})
+            if child is None:
+                # the whole field is already kept
+                break
+            node = node.setdefault(name, child)
+        else:
+            node[names[-1]] = None
+
+    return mask
@@ -3,7 +3,7 @@ from setuptools import setup
 setup(
    name='resawesome',
    version='0.1.0',
-   py_modules=['resawesome'],
+   packages=['resawesome', 'resawesome.benchmarks'],
    author='David Collien',
    author_email='me@dcollien.com',
    url='https://github.com/dcollien/py-resawesome',
@@ -11,5 +11,13 @@ setup(
    description='py-resawesome: resawesome for Python: resource api layer and service bus',
    long_description='py-resawesome: resawesome for Python: resource api layer and service bus',
    platforms=['any'],
-   install_requires=['oauth2']
+   install_requires=['oauth2'],
+   entry_points={
+      'console_scripts': [
+         'resawesome-benchmark=resawesome.benchmarks.runner:main',
+         'resawesome-manifest=resawesome.manifest:main',
+         'resawesome-serve=resawesome.gateway:main',
+         'resawesome-replay=resawesome.loadtest:main'
+      ]
+   }
 )
@@ -0,0 +1,24 @@
+import json
+
+from StringIO import StringIO
+
+def post(gateway, path, body, headers=None, content_type='application/json'):
+    """Send a POST to a WSGI gateway (with a body to dump as JSON, or its text), returning the response's status, headers and body"""
+
+    data = body if isinstance(body, str) else json.dumps(body)
+    environ = {
+        'PATH_INFO': path,
+        'REQUEST_METHOD': 'POST',
+        'CONTENT_TYPE': content_type,
+        'CONTENT_LENGTH': str(len(data)),
+        'wsgi.input': StringIO(data)
+    }
+    environ.update(headers or {})
+
+    response = {}
+    def start_response(status, response_headers):
+        response['status'] = status
+        response['headers'] = dict(response_headers)
+
+    response['body'] = ''.join(gateway(environ, start_response))
+    return response
@@ -0,0 +1,58 @@
+import threading
+import unittest
+
+from resawesome import AsyncAPI, read
+from resawesome.resource import ResourceNotFoundError
+
+def _sensor_api():
+    api = AsyncAPI(workers=4, method_workers=4)
+
+    @api.resource(name='sensor')
+    class Sensor(object):
+        def __init__(self, id):
+            self.id = id
+
+        def _has_access(self, permission):
+            return True
+
+        def _serialize(self, permission):
+            return {'id': self.id}
+
+        @read
+        def get(self):
+            return self
+
+        @read
+        def wait_for(self, event, other):
+            # only returns if the other method runs at the same time
+            Sensor.events[event].set()
+            return Sensor.events[other].wait(5)
+
+    Sensor.events = {'a': threading.Event(), 'b': threading.Event()}
+    return api, Sensor
+
+class AsyncAPITest(unittest.TestCase):
+    def setUp(self):
+        self.api, self.Sensor = _sensor_api()
+
+    def tearDown(self):
+        self.api.close()
+
+    def test_operations_return_async_results(self):
+        results = [self.api.read('sensor', ['get'], {'id': i}, {}) for i in range(8)]
+        self.assertEqual([result.get(5) for result in results], [[{'id': i}] for i in range(8)])
+
+    def test_independent_methods_run_concurrently(self):
+        methods = [
+            {'method': 'wait_for', 'args': {'event': 'a', 'other': 'b'}, 'independent': True},
+            {'method': 'wait_for', 'args': {'event': 'b', 'other': 'a'}, 'independent': True}
+        ]
+        self.assertEqual(self.api.read('sensor', methods, {'id': 1}, {}).get(10), [True, True])
+
+    def test_errors_are_raised_by_get(self):
+        result = self.api.read('missing', ['get'], {'id': 1}, {})
+        with self.assertRaises(ResourceNotFoundError):
+            result.get(5)
+
+if __name__ == '__main__':
+    unittest.main()
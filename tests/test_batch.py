@@ -0,0 +1,134 @@
+import unittest
+
+from resawesome import API, InstanceCache, create, lookup, read, update
+from resawesome.resource import ResourceMethodFailedError, ResourceNotFoundError
+
+def _doc_api():
+    api = API(instance_cache=InstanceCache(16))
+
+    @api.resource(name='doc', is_cacheable=True)
+    class Doc(object):
+        commits = []
+        access_checks = []
+
+        def __init__(self, id):
+            self.id = id
+            self.title = 'orig'
+
+        @staticmethod
+        def _has_class_access(permission):
+            return True
+
+        def _has_access(self, permission):
+            Doc.access_checks.append((self.id, permission))
+            return True
+
+        def _serialize(self, permission):
+            return {'id': self.id, 'title': self.title}
+
+        def _commit(self):
+            Doc.commits.append((self.id, self.title))
+
+        @staticmethod
+        @create
+        def new(id):
+            return Doc(id)
+
+        @staticmethod
+        @lookup
+        def ids():
+            return [1, 2]
+
+        @read
+        def get_title(self):
+            return self.title
+
+        @update
+        def retitle(self, title):
+            self.title = title
+
+        @update
+        def retitle_and_fail(self, title):
+            self.title = title
+            raise ValueError('failed after changing the title')
+
+    return api, Doc
+
+class BatchTest(unittest.TestCase):
+    def test_entries_of_every_operation(self):
+        api, Doc = _doc_api()
+        entries = api.batch([
+            {'operation': 'create', 'name': 'doc', 'create_method': 'new', 'creation_args': {'id': 3}, 'methods': ['get_title']},
+            {'operation': 'lookup', 'name': 'doc', 'methods': ['ids']},
+            {'operation': 'read', 'name': 'doc', 'instance_args': {'id': 1}, 'methods': ['get_title']}
+        ], {})
+
+        self.assertEqual([entry['error'] for entry in entries], [None, None, None])
+        self.assertEqual([entry['result'] for entry in entries], [['orig'], [[1, 2]], ['orig']])
+        self.assertEqual(entries[0]['instance'].id, 3)
+        self.assertEqual(Doc.commits, [(3, 'orig')])
+
+    def test_access_is_evaluated_once_per_permission(self):
+        api, Doc = _doc_api()
+        api.batch([
+            {'operation': 'read', 'name': 'doc', 'instance_args': {'id': 1}, 'methods': ['get_title']},
+            {'operation': 'read', 'name': 'doc', 'instance_args': {'id': 1}, 'methods': ['get_title']},
+            {'operation': 'read', 'name': 'doc', 'instance_args': {'id': 2}, 'methods': ['get_title']}
+        ], {})
+
+        self.assertEqual(Doc.access_checks, [(1, 'read'), (2, 'read')])
+
+    def test_failures_do_not_stop_other_operations(self):
+        api, Doc = _doc_api()
+        entries = api.batch([
+            {'operation': 'read', 'name': 'missing', 'instance_args': {'id': 1}, 'methods': ['get_title']},
+            {'operation': 'read', 'name': 'doc', 'instance_args': {'id': 1}, 'methods': ['get_title']}
+        ], {})
+
+        self.assertIsInstance(entries[0]['error'], ResourceMethodFailedError)
+        self.assertIsInstance(entries[0]['error'].error, ResourceNotFoundError)
+        self.assertEqual((entries[1]['error'], entries[1]['result']), (None, ['orig']))
+
+    def test_independent_operations(self):
+        api, Doc = _doc_api()
+        entries = api.batch([
+            {'operation': 'read', 'name': 'doc', 'instance_args': {'id': i}, 'methods': ['get_title'], 'independent': True}
+            for i in range(4)
+        ], {}, max_workers=2)
+
+        self.assertEqual([entry['result'] for entry in entries], [['orig']] * 4)
+
+    def test_instances_are_shared_between_operations(self):
+        api, Doc = _doc_api()
+        entries = api.batch([
+            {'operation': 'update', 'name': 'doc', 'instance_args': {'id': 1}, 'methods': [{'method': 'retitle', 'args': {'title': 'new'}}]},
+            {'operation': 'read', 'name': 'doc', 'instance_args': {'id': 1}, 'methods': ['get_title']}
+        ], {})
+
+        self.assertEqual([entry['error'] for entry in entries], [None, None])
+        self.assertEqual(entries[1]['result'], ['new'])
+        # committed once, after every operation
+        self.assertEqual(Doc.commits, [(1, 'new')])
+
+    def test_failed_operations_are_not_committed(self):
+        api, Doc = _doc_api()
+        entries = api.batch([
+            {'operation': 'update', 'name': 'doc', 'instance_args': {'id': 1}, 'methods': [{'method': 'retitle_and_fail', 'args': {'title': 'bad'}}]}
+        ], {})
+
+        self.assertIsNotNone(entries[0]['error'])
+        self.assertEqual(Doc.commits, [])
+
+    def test_writes_after_reads_do_not_change_the_cached_instance(self):
+        api, Doc = _doc_api()
+        entries = api.batch([
+            {'operation': 'read', 'name': 'doc', 'instance_args': {'id': 1}, 'methods': ['get_title']},
+            {'operation': 'update', 'name': 'doc', 'instance_args': {'id': 1}, 'methods': [{'method': 'retitle_and_fail', 'args': {'title': 'LEAKED'}}]}
+        ], {})
+
+        self.assertEqual(entries[0]['result'], ['orig'])
+        self.assertIsNotNone(entries[1]['error'])
+        self.assertEqual(api.read('doc', ['get_title'], {'id': 1}, {}), ['orig'])
+
+if __name__ == '__main__':
+    unittest.main()
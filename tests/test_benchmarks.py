@@ -0,0 +1,27 @@
+import unittest
+
+from resawesome.benchmarks import BENCHMARKS, compare, run_benchmarks
+from resawesome.benchmarks import resources
+
+def _results(**ops_per_sec):
+    return {'benchmarks': dict((name, {'ops_per_sec': ops, 'peak_memory_kb': 0}) for name, ops in ops_per_sec.iteritems())}
+
+class BenchmarkTest(unittest.TestCase):
+    def test_every_benchmark_runs(self):
+        for name, setup in sorted(BENCHMARKS.iteritems()):
+            setup(resources.create_api())()
+
+    def test_compare(self):
+        baseline = _results(fast=100.0, slow=100.0, removed=100.0)
+        regressions = compare(_results(fast=95.0, slow=80.0), baseline, threshold=0.1)
+        self.assertEqual(sorted(regressions), ['slow'])
+        self.assertAlmostEqual(regressions['slow']['change'], -0.2)
+
+    def test_run_benchmarks(self):
+        results = run_benchmarks(['encode_plain'], duration=0.01)
+        self.assertEqual(sorted(results['benchmarks']), ['encode_plain'])
+        self.assertGreater(results['benchmarks']['encode_plain']['ops_per_sec'], 0)
+        self.assertRaises(KeyError, run_benchmarks, ['no such benchmark'], 0.01)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,109 @@
+import threading
+import unittest
+
+from resawesome import API, ServiceBus, read
+from resawesome.bus import BusClosedError, BusFullError
+from resawesome.resource import ResourceNotFoundError
+
+def _job_api():
+    api = API()
+
+    @api.resource(name='job')
+    class Job(object):
+        ran = []
+        started = threading.Event()
+        release = threading.Event()
+
+        def __init__(self, id):
+            self.id = id
+
+        def _has_access(self, permission):
+            return True
+
+        @read
+        def run(self):
+            Job.ran.append(self.id)
+            return self.id
+
+        @read
+        def block(self):
+            # holds its worker until released
+            Job.started.set()
+            return Job.release.wait(5)
+
+    return api, Job
+
+def _run(id):
+    return {'operation': 'read', 'name': 'job', 'methods': ['run'], 'instance_args': {'id': id}, 'environment': {}}
+
+class ServiceBusTest(unittest.TestCase):
+    def setUp(self):
+        self.api, self.Job = _job_api()
+        self.buses = []
+
+    def tearDown(self):
+        self.Job.release.set()
+        for bus in self.buses:
+            bus.close()
+
+    def _bus(self, **kwargs):
+        bus = ServiceBus(self.api, **kwargs)
+        self.buses.append(bus)
+        return bus
+
+    def test_messages_and_calls(self):
+        bus = self._bus()
+        self.assertEqual(bus.send(_run(1)).get(5), [1])
+        self.assertEqual(bus.read('job', ['run'], {'id': 2}, {}, lane='high').get(5), [2])
+
+        with self.assertRaises(ResourceNotFoundError):
+            bus.read('missing', ['run'], {'id': 3}, {}).get(5)
+        self.assertEqual(bus.stats()['default']['completed'], 2)
+        self.assertEqual(bus.stats()['default']['failed'], 1)
+
+    def test_lanes_are_taken_in_priority_order(self):
+        bus = self._bus(pools={'default': {'workers': 1}})
+        blocked = bus.read('job', ['block'], {'id': 0}, {})
+        self.Job.started.wait(5)
+        futures = [bus.send(_run(1), lane='low'), bus.send(_run(2), lane='normal'), bus.send(_run(3), lane='high')]
+
+        self.Job.release.set()
+        for future in [blocked] + futures:
+            future.get(5)
+        self.assertEqual(self.Job.ran, [3, 2, 1])
+
+    def test_full_lanes(self):
+        bus = self._bus(pools={'default': {'workers': 1, 'max_queue': 1}})
+        bus.read('job', ['block'], {'id': 0}, {})
+        self.Job.started.wait(5)
+        bus.send(_run(1))
+
+        self.assertRaises(BusFullError, bus.send, _run(2), block=False)
+        self.assertRaises(BusFullError, bus.send, _run(3), timeout=0.01)
+        self.assertEqual(bus.stats()['default']['rejected'], 2)
+        self.assertEqual(bus.stats()['default']['queued']['normal'], 1)
+
+    def test_routes(self):
+        bus = self._bus(pools={'jobs': {'workers': 1}}, routes={'job': 'jobs'})
+        bus.send(_run(1)).get(5)
+        self.assertEqual(bus.stats()['jobs']['completed'], 1)
+        self.assertEqual(bus.stats()['default']['completed'], 0)
+
+        self.assertRaises(ValueError, ServiceBus, self.api, routes={'job': 'undefined'})
+
+    def test_invalid_messages(self):
+        bus = self._bus()
+        self.assertRaises(ValueError, bus.send, dict(_run(1), operation='explode'))
+        self.assertRaises(ValueError, bus.send, _run(1), lane='urgent')
+
+        bus.close()
+        self.assertRaises(BusClosedError, bus.send, _run(1))
+
+    def test_process_pools(self):
+        bus = self._bus(pools={'default': {'workers': 1, 'processes': True}})
+        self.assertEqual(bus.send(_run(1)).get(10), [1])
+        with self.assertRaises(ResourceNotFoundError):
+            bus.read('missing', ['run'], {'id': 1}, {}).get(10)
+
+if __name__ == '__main__':
+    unittest.main()
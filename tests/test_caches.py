@@ -0,0 +1,295 @@
+import threading
+import unittest
+
+from resawesome import API, AccessCache, InstanceCache, ViewCache, delete, read, update
+from resawesome.cache import ResultCache
+from resawesome.resource import ResourceAccessDeniedError
+
+def _account_api(**kwargs):
+    api = API(**kwargs)
+
+    @api.resource(name='account')
+    class Account(object):
+        access_checks = []
+
+        def __init__(self, id):
+            self.id = id
+
+        def _has_access(self, _user_id, permission):
+            Account.access_checks.append((self.id, _user_id, permission))
+            return _user_id == 'owner'
+
+        def _identity(self):
+            return self.id
+
+        def _serialize(self, permission):
+            return {'id': self.id}
+
+        def _commit(self):
+            pass
+
+        @read
+        def get(self):
+            return self
+
+        @update
+        def touch(self):
+            pass
+
+    return api, Account
+
+def _node_api(**kwargs):
+    api = API(view_cache=ViewCache(16), **kwargs)
+
+    @api.resource(name='node')
+    class Node(object):
+        serialized = []
+        versions = {}
+
+        def __init__(self, id):
+            self.id = id
+
+        def _has_access(self, permission):
+            return True
+
+        def _identity(self):
+            return self.id
+
+        def _version(self):
+            return Node.versions.get(self.id, 1)
+
+        def _serialize(self, permission):
+            Node.serialized.append(self.id)
+            return {'id': self.id, 'children': [{'n': 1}], 'self': self}
+
+        def _commit(self):
+            pass
+
+        @read
+        def get(self):
+            return self
+
+        @update
+        def touch(self):
+            pass
+
+    return api, Node
+
+def _counter_api(is_cacheable=True):
+    api = API(instance_cache=InstanceCache(16))
+
+    @api.resource(name='counter', is_cacheable=is_cacheable)
+    class Counter(object):
+        constructed = []
+        values = {}
+
+        def __init__(self, id):
+            Counter.constructed.append(id)
+            self.id = id
+            self.value = Counter.values.get(id, 0)
+
+        def _has_access(self, permission):
+            return True
+
+        def _commit(self):
+            if self.value is None:
+                Counter.values.pop(self.id, None)
+            else:
+                Counter.values[self.id] = self.value
+
+        @read
+        def get(self):
+            return self.value
+
+        @update
+        def increment(self):
+            self.value += 1
+
+        @delete
+        def remove(self):
+            self.value = None
+
+    return api, Counter
+
+def _price_api():
+    api = API()
+
+    @api.resource(name='price')
+    class Price(object):
+        computed = []
+
+        def __init__(self, id):
+            self.id = id
+
+        def _has_access(self, permission):
+            return True
+
+        def _identity(self):
+            return self.id
+
+        @read(_cache=True)
+        def quote(self, quantity):
+            Price.computed.append(('quote', self.id, quantity))
+            return self.id * quantity
+
+        @read(_cache={'key_args': ['_currency']})
+        def local(self, _currency):
+            Price.computed.append(('local', self.id, _currency))
+            return str(self.id) + _currency
+
+        @read(_cache=True)
+        def failing(self):
+            Price.computed.append(('failing', self.id))
+            raise KeyError('unavailable')
+
+        @update
+        def reprice(self):
+            pass
+
+    return api, Price
+
+def _read_checks(Account):
+    # serializing also checks the other permissions, to find the access level of the view
+    return [(id, user_id) for id, user_id, permission in Account.access_checks if permission == 'read']
+
+class AccessCacheTest(unittest.TestCase):
+    def test_decisions_are_cached_within_a_request(self):
+        api, Account = _account_api(access_cache=AccessCache())
+        with api.request():
+            api.read('account', ['get'], {'id': 1}, {'_user_id': 'owner'})
+            api.read('account', ['get'], {'id': 1}, {'_user_id': 'owner'})
+        api.read('account', ['get'], {'id': 1}, {'_user_id': 'owner'})
+
+        self.assertEqual(_read_checks(Account), [(1, 'owner'), (1, 'owner')])
+
+    def test_decisions_are_shared_across_requests_by_key_args(self):
+        api, Account = _account_api(access_cache=AccessCache(max_entries=16))
+        api.read('account', ['get'], {'id': 1}, {'_user_id': 'owner'})
+        api.read('account', ['get'], {'id': 1}, {'_user_id': 'owner'})
+        with self.assertRaises(ResourceAccessDeniedError):
+            api.read('account', ['get'], {'id': 1}, {'_user_id': 'other'})
+        with self.assertRaises(ResourceAccessDeniedError):
+            api.read('account', ['get'], {'id': 1}, {'_user_id': 'other'})
+
+        self.assertEqual(_read_checks(Account), [(1, 'owner'), (1, 'other')])
+
+    def test_updates_invalidate_decisions(self):
+        api, Account = _account_api(access_cache=AccessCache(max_entries=16))
+        api.read('account', ['get'], {'id': 1}, {'_user_id': 'owner'})
+        api.update('account', ['touch'], {'id': 1}, {'_user_id': 'owner'})
+        api.read('account', ['get'], {'id': 1}, {'_user_id': 'owner'})
+
+        self.assertEqual(_read_checks(Account), [(1, 'owner'), (1, 'owner')])
+
+class InstanceCacheTest(unittest.TestCase):
+    def test_cacheable_instances_are_constructed_once(self):
+        api, Counter = _counter_api()
+        for i in range(3):
+            api.read('counter', ['get'], {'id': 1}, {})
+        self.assertEqual(Counter.constructed, [1])
+
+    def test_other_instances_are_constructed_once_per_request(self):
+        api, Counter = _counter_api(is_cacheable=False)
+        with api.request():
+            api.read('counter', ['get'], {'id': 1}, {})
+            api.read('counter', ['get'], {'id': 1}, {})
+        api.read('counter', ['get'], {'id': 1}, {})
+        self.assertEqual(Counter.constructed, [1, 1])
+
+    def test_commits_and_deletes_evict_instances(self):
+        api, Counter = _counter_api()
+        self.assertEqual(api.read('counter', ['get'], {'id': 1}, {}), [0])
+        api.update('counter', ['increment'], {'id': 1}, {})
+        self.assertEqual(api.read('counter', ['get'], {'id': 1}, {}), [1])
+
+        api.delete('counter', 'remove', {'id': 1}, {})
+        self.assertEqual(api.read('counter', ['get'], {'id': 1}, {}), [0])
+        self.assertEqual(len(api.instance_cache), 1)
+
+def _quote(api, id, quantity):
+    return api.read('price', [{'method': 'quote', 'args': {'quantity': quantity}}], {'id': id}, {})
+
+class ResultCacheTest(unittest.TestCase):
+    def test_results_are_cached_by_identity_and_arguments(self):
+        api, Price = _price_api()
+        self.assertEqual([_quote(api, 2, 3), _quote(api, 2, 3), _quote(api, 2, 4), _quote(api, 3, 3)], [[6], [6], [8], [9]])
+        self.assertEqual(Price.computed, [('quote', 2, 3), ('quote', 2, 4), ('quote', 3, 3)])
+
+    def test_key_args_from_the_environment(self):
+        api, Price = _price_api()
+        for currency in ('usd', 'usd', 'eur'):
+            api.read('price', ['local'], {'id': 1}, {'_currency': currency})
+        self.assertEqual(Price.computed, [('local', 1, 'usd'), ('local', 1, 'eur')])
+
+    def test_writes_invalidate_results(self):
+        api, Price = _price_api()
+        _quote(api, 2, 3)
+        api.update('price', ['reprice'], {'id': 5}, {})
+        _quote(api, 2, 3)
+        self.assertEqual(len(Price.computed), 2)
+
+    def test_errors_are_not_cached(self):
+        api, Price = _price_api()
+        for i in range(2):
+            self.assertRaises(Exception, api.read, 'price', ['failing'], {'id': 1}, {})
+        self.assertEqual(len(Price.computed), 2)
+
+    def test_concurrent_misses_are_computed_once(self):
+        cache = ResultCache(16)
+        started = threading.Event()
+        release = threading.Event()
+        computed = []
+
+        def _compute():
+            computed.append(1)
+            started.set()
+            release.wait(5)
+            return 'result'
+
+        results = []
+        threads = [threading.Thread(target=lambda: results.append(cache.get_or_compute('key', _compute))) for i in range(3)]
+        threads[0].start()
+        started.wait(5)
+        for thread in threads[1:]:
+            thread.start()
+        while cache.coalesced < 2:
+            release.wait(0.001)
+
+        release.set()
+        for thread in threads:
+            thread.join(5)
+        self.assertEqual((results, computed), (['result'] * 3, [1]))
+
+class ViewCacheTest(unittest.TestCase):
+    def test_views_are_cached_by_version(self):
+        api, Node = _node_api()
+        api.encode([Node('x'), Node('x')], {})
+        self.assertEqual(Node.serialized, ['x'])
+
+        Node.versions['x'] = 2
+        api.encode(Node('x'), {})
+        self.assertEqual(Node.serialized, ['x', 'x'])
+
+    def test_commits_invalidate_views(self):
+        api, Node = _node_api()
+        api.read('node', ['get'], {'id': 'x'}, {})
+        api.update('node', ['touch'], {'id': 'x'}, {})
+        api.read('node', ['get'], {'id': 'x'}, {})
+        self.assertEqual(Node.serialized, ['x', 'x'])
+
+    def test_changing_an_encoded_result_does_not_change_the_cached_view(self):
+        api, Node = _node_api()
+        first = api.encode([Node('x')], {})
+        first[0]['id'] = 'MUTATED'
+        first[0]['children'][0]['n'] = 'MUTATED'
+
+        second = api.encode([Node('x')], {})
+        self.assertEqual(second[0]['id'], 'x')
+        self.assertEqual(second[0]['children'], [{'n': 1}])
+
+        second[0]['children'].append('MUTATED')
+        self.assertEqual(api.encode([Node('x')], {})[0]['children'], [{'n': 1}])
+        self.assertEqual(Node.serialized, ['x'])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,99 @@
+import threading
+import unittest
+
+from resawesome import API, ChangeHub, create, update
+
+def _topic_api():
+    api = API(changes=ChangeHub(max_queue=4))
+
+    @api.resource(name='topic')
+    class Topic(object):
+        def __init__(self, id):
+            self.id = id
+
+        @staticmethod
+        def _has_class_access(permission):
+            return True
+
+        def _has_access(self, permission):
+            return True
+
+        def _identity(self):
+            return self.id
+
+        def _commit(self):
+            pass
+
+        @staticmethod
+        @create
+        def new(id):
+            return Topic(id)
+
+        @update
+        def rename(self):
+            pass
+
+    return api
+
+def _rename(api, id):
+    api.update('topic', ['rename'], {'id': id}, {})
+
+class ChangeHubTest(unittest.TestCase):
+    def test_commits_are_published(self):
+        api = _topic_api()
+        everything = api.changes.subscribe()
+        topics = api.changes.subscribe('topic')
+        one_topic = api.changes.subscribe('topic', 2)
+
+        api.create('topic', 'new', {'id': 1}, [], {})
+        _rename(api, 2)
+
+        events = everything.drain()
+        self.assertEqual([(event['identity'], event['method_types'], event['sequence']) for event in events], [(1, ['create'], 0), (2, ['update'], 1)])
+        self.assertEqual(topics.drain(), events)
+        self.assertEqual(one_topic.drain(), events[1:])
+
+    def test_changes_to_the_same_instance_are_coalesced(self):
+        api = _topic_api()
+        subscription = api.changes.subscribe('topic')
+        api.create('topic', 'new', {'id': 1}, [], {})
+        _rename(api, 2)
+        _rename(api, 1)
+
+        events = subscription.drain()
+        self.assertEqual([(event['identity'], event['method_types'], event['sequence']) for event in events], [(1, ['create', 'update'], 2), (2, ['update'], 1)])
+        self.assertEqual(subscription.coalesced, 1)
+
+    def test_full_queues_drop_the_oldest_events(self):
+        api = _topic_api()
+        subscription = api.changes.subscribe('topic')
+        for i in range(6):
+            _rename(api, i)
+
+        self.assertEqual([event['identity'] for event in subscription.drain()], [2, 3, 4, 5])
+        self.assertEqual(subscription.dropped, 2)
+
+    def test_waiting_for_events(self):
+        api = _topic_api()
+        subscription = api.changes.subscribe('topic')
+        self.assertEqual(subscription.get(timeout=0.01), None)
+
+        received = []
+        consumer = threading.Thread(target=lambda: received.extend(subscription))
+        consumer.start()
+        _rename(api, 1)
+        while len(subscription):
+            consumer.join(0.001)
+
+        subscription.close()
+        consumer.join(5)
+        self.assertEqual([event['identity'] for event in received], [1])
+
+        _rename(api, 2)
+        self.assertEqual(len(subscription), 0)
+
+    def test_identities_require_a_name(self):
+        self.assertRaises(ValueError, ChangeHub().subscribe, identity=1)
+
+if __name__ == '__main__':
+    unittest.main()
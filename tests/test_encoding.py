@@ -0,0 +1,219 @@
+import collections
+import json
+import unittest
+
+from datetime import datetime
+
+from resawesome import API, lookup, read
+from resawesome.encoder import Encoder
+from resawesome.serialization import get_encoder, json_decode, json_encode
+from resawesome.util import compile_field_mask
+
+def _author_api():
+    api = API()
+
+    @api.resource(name='author')
+    class Author(object):
+        requested_fields = []
+
+        def __init__(self, id):
+            self.id = id
+
+        @staticmethod
+        def _has_class_access(permission):
+            return True
+
+        def _has_access(self, permission):
+            return True
+
+        def _serialize(self, permission, fields=None):
+            Author.requested_fields.append(fields)
+            return {'id': self.id, 'name': 'author' + str(self.id), 'address': {'city': 'c', 'street': 's'}, 'friend': Author(self.id + 1) if self.id < 2 else None}
+
+        @read
+        def get(self):
+            return self
+
+        @staticmethod
+        @lookup
+        def all():
+            return [Author(1), Author(2)]
+
+    return api, Author
+
+def _item_api():
+    api = API()
+
+    @api.resource(name='item')
+    class Item(object):
+        produced = []
+
+        def __init__(self, id):
+            self.id = id
+
+        @staticmethod
+        def _has_class_access(permission):
+            return True
+
+        def _has_access(self, permission):
+            return True
+
+        def _serialize(self, permission):
+            return {'id': self.id, 'name': 'item' + str(self.id), 'tags': set(['a'])}
+
+        @read
+        def get(self):
+            return self
+
+        @staticmethod
+        @lookup
+        def count(limit):
+            for i in range(limit):
+                Item.produced.append(i)
+                yield Item(i)
+
+    return api, Item
+
+class StreamingTest(unittest.TestCase):
+    def test_streamed_text_decodes_to_the_encoded_result(self):
+        api, Item = _item_api()
+        obj = {'items': [Item(1), Item(2)], 'total': 2, 'nested': [[1, 2], (3,)]}
+        streamed = json_decode(''.join(api.iter_encode(obj, {}, chunk_size=8)))
+        self.assertEqual(streamed, api.encode(obj, {}))
+        self.assertEqual(streamed['items'][0]['tags'], set(['a']))
+
+    def test_generators_are_consumed_as_chunks_are_written(self):
+        api, Item = _item_api()
+        chunks = api.lookup('item', [{'method': 'count', 'args': {'limit': 5000}}], {}, stream=True)
+        next(chunks)
+        self.assertLess(len(Item.produced), 5000)
+
+        text = ''.join(chunks)
+        self.assertEqual(len(Item.produced), 5000)
+        self.assertTrue(text.endswith(']]'))
+
+    def test_streamed_reads(self):
+        api, Item = _item_api()
+        text = ''.join(api.read('item', ['get'], {'id': 7}, {}, stream=True))
+        self.assertEqual(json_decode(text), [{'id': 7, 'name': 'item7', 'tags': set(['a'])}])
+
+class FieldMaskTest(unittest.TestCase):
+    def test_compile_field_mask(self):
+        self.assertEqual(compile_field_mask(['id', 'author.name', 'author.id']), {'id': None, 'author': {'name': None, 'id': None}})
+        self.assertEqual(compile_field_mask(['author', 'author.name']), {'author': None})
+        self.assertEqual(compile_field_mask(None), None)
+
+    def test_views_only_have_the_masked_fields(self):
+        api, Author = _author_api()
+        self.assertEqual(api.read('author', ['get'], {'id': 2}, {}, fields=['id', 'address.city']), [{'id': 2, 'address': {'city': 'c'}}])
+        self.assertEqual(api.lookup('author', ['all'], {}, fields=['name']), [[{'name': 'author1'}, {'name': 'author2'}]])
+
+    def test_masks_apply_to_embedded_resources(self):
+        api, Author = _author_api()
+        self.assertEqual(api.encode(Author(1), {}, fields=['id', 'friend.name']), {'id': 1, 'friend': {'name': 'author2'}})
+        self.assertEqual(Author.requested_fields, [{'id': None, 'friend': {'name': None}}, {'name': None}])
+
+    def test_masks_cannot_be_combined_with_references(self):
+        api, Author = _author_api()
+        self.assertRaises(ValueError, api.encode, Author(1), {}, fields=['id'], references=True)
+
+def _person_api():
+    api = API()
+
+    @api.resource(name='person')
+    class Person(object):
+        friends = {1: [2], 2: [1, 3], 3: []}
+        serialized = []
+
+        def __init__(self, id):
+            self.id = id
+
+        def _has_access(self, permission):
+            return True
+
+        def _identity(self):
+            return self.id
+
+        def _serialize(self, permission):
+            Person.serialized.append(self.id)
+            return {'id': self.id, 'friends': [Person(friend) for friend in Person.friends[self.id]], 'tags': set([self.id])}
+
+        @read
+        def get(self):
+            return self
+
+    return api, Person
+
+class ReferenceTest(unittest.TestCase):
+    def test_each_resource_is_serialized_once(self):
+        api, Person = _person_api()
+        graph = api.encode([Person(1), Person(1), Person(2)], {}, references=True)
+        self.assertEqual(graph['__type__'], 'graph')
+        self.assertEqual(sorted(Person.serialized), [1, 2, 3])
+        self.assertEqual(len(graph['__value__']['resources']), 3)
+
+        result = graph['__value__']['result']
+        self.assertEqual(result[0], result[1])
+        self.assertEqual(result[0], {'__type__': 'ref', '__value__': '0'})
+
+    def test_decoded_graphs_share_views(self):
+        api, Person = _person_api()
+        people = json_decode(json_encode(api.encode([Person(1), Person(2)], {}, references=True)))
+
+        first, second = people
+        self.assertEqual((first['id'], second['id']), (1, 2))
+        self.assertIs(first['friends'][0], second)
+        self.assertIs(second['friends'][0], first)
+        self.assertEqual(second['friends'][1]['tags'], set([3]))
+
+    def test_streamed_graphs(self):
+        api, Person = _person_api()
+        text = ''.join(api.read('person', ['get'], {'id': 2}, {}, stream=True, references=True))
+        person, = json_decode(text)
+        self.assertIs(person['friends'][0]['friends'][0], person)
+
+class Resource(object):
+    _IS_RESOURCE = True
+
+    def __init__(self, id):
+        self.id = id
+
+class Money(object):
+    def __init__(self, cents):
+        self.cents = cents
+
+class Euros(Money):
+    pass
+
+def _serialize(resource):
+    return {'id': resource.id}
+
+class EncoderTest(unittest.TestCase):
+    def test_values_of_every_kind(self):
+        obj = collections.OrderedDict([('a', (1, 2)), ('b', xrange(2)), ('c', (Resource(i) for i in range(2))), ('d', [{'e': None}])])
+        self.assertEqual(Encoder().encode(obj, _serialize), {'a': [1, 2], 'b': [0, 1], 'c': [{'id': 0}, {'id': 1}], 'd': [{'e': None}]})
+        self.assertEqual(Encoder().encode(set([1]), _serialize), [1])
+        self.assertEqual(Encoder().encode([set([1])], _serialize, keep_sets=True), [set([1])])
+
+    def test_deep_values_do_not_recurse(self):
+        deep = []
+        for i in range(5000):
+            deep = [deep, Resource(i)]
+
+        encoded = Encoder().encode(deep, _serialize)
+        self.assertEqual(encoded[1], {'id': 4999})
+        self.assertEqual(''.join(Encoder().iter_json(deep, _serialize, None))[:12], '[[[[[[[[[[[[')
+
+    def test_registered_encoders_apply_to_subclasses(self):
+        encoder = Encoder()
+        encoder.register(Money, lambda money: {'cents': money.cents})
+        self.assertEqual(encoder.encode([Money(1), Euros(2)], _serialize), [{'cents': 1}, {'cents': 2}])
+
+    def test_iter_json(self):
+        obj = {'items': [Resource(1), Resource(2)], 'when': datetime(2020, 1, 2), 'tags': set(['a']), 'rows': [[1, 'b', None]]}
+        text = ''.join(Encoder().iter_json(obj, _serialize, get_encoder(wrap_types=True)))
+        self.assertEqual(json_decode(text), {'items': [{'id': 1}, {'id': 2}], 'when': datetime(2020, 1, 2), 'tags': set(['a']), 'rows': [[1, 'b', None]]})
+        self.assertEqual(json.loads(''.join(Encoder().iter_json({1: 'a'}, _serialize, None))), {'1': 'a'})
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,116 @@
+import unittest
+
+from resawesome import API, Gateway, lookup, read
+from support import post
+
+def _doc_api():
+    api = API()
+
+    @api.resource(name='doc')
+    class Doc(object):
+        versions = {}
+
+        def __init__(self, id):
+            self.id = id
+
+        @staticmethod
+        def _has_class_access(permission):
+            return True
+
+        def _has_access(self, permission):
+            return True
+
+        def _version(self):
+            return Doc.versions.get(self.id, 1)
+
+        @staticmethod
+        def _class_version():
+            return sum(Doc.versions.itervalues())
+
+        def _serialize(self, permission):
+            return {'id': self.id, 'title': 't' + str(self.id), 'body': 'b'}
+
+        @read
+        def get(self):
+            return self
+
+        @read
+        def my_note(self, _user_id):
+            return _user_id + "'s note"
+
+        @staticmethod
+        @lookup
+        def mine(_user_id):
+            return [_user_id]
+
+    return api, Doc
+
+def _conditional_read(api, methods, user_id, if_none_match=''):
+    return api.read('doc', methods, {'id': 1}, {'_user_id': user_id}, if_none_match=if_none_match)
+
+class ETagTest(unittest.TestCase):
+    def test_matching_etags_are_not_modified(self):
+        api, Doc = _doc_api()
+        first = _conditional_read(api, ['get'], 'alice')
+        self.assertFalse(first['not_modified'])
+        self.assertEqual(first['result'][0]['title'], 't1')
+
+        second = _conditional_read(api, ['get'], 'alice', first['etag'])
+        self.assertEqual((second['not_modified'], second['etag'], second['result']), (True, first['etag'], None))
+
+    def test_new_versions_change_the_etag(self):
+        api, Doc = _doc_api()
+        etag = _conditional_read(api, ['get'], 'alice')['etag']
+        Doc.versions[1] = 2
+        self.assertFalse(_conditional_read(api, ['get'], 'alice', etag)['not_modified'])
+
+    def test_methods_and_options_change_the_etag(self):
+        api, Doc = _doc_api()
+        etag = _conditional_read(api, ['get'], 'alice')['etag']
+        self.assertNotEqual(_conditional_read(api, ['my_note'], 'alice')['etag'], etag)
+        self.assertNotEqual(api.read('doc', ['get'], {'id': 1}, {'_user_id': 'alice'}, fields=['id'], if_none_match='')['etag'], etag)
+
+    def test_etags_depend_on_the_environment(self):
+        api, Doc = _doc_api()
+        alice_etag = _conditional_read(api, ['my_note'], 'alice')['etag']
+        bob = _conditional_read(api, ['my_note'], 'bob', alice_etag)
+        self.assertFalse(bob['not_modified'])
+        self.assertEqual(bob['result'], ["bob's note"])
+
+        alice_etag = api.lookup('doc', ['mine'], {'_user_id': 'alice'}, if_none_match='')['etag']
+        self.assertFalse(api.lookup('doc', ['mine'], {'_user_id': 'bob'}, if_none_match=alice_etag)['not_modified'])
+        self.assertTrue(api.lookup('doc', ['mine'], {'_user_id': 'alice'}, if_none_match=alice_etag)['not_modified'])
+
+    def test_resources_without_versions_have_no_etag(self):
+        api, Doc = _doc_api()
+        del Doc._version
+        api.invalidate_plans()
+        result = _conditional_read(api, ['get'], 'alice', 'anything')
+        self.assertEqual((result['not_modified'], result['etag']), (False, None))
+
+class GatewayETagTest(unittest.TestCase):
+    def setUp(self):
+        api, Doc = _doc_api()
+        self.gateway = Gateway(api, environment=lambda environ: {'_user_id': environ.get('HTTP_AUTHORIZATION', 'anonymous')})
+
+    def _read(self, body, headers=None):
+        body = dict({'methods': ['get'], 'instance_args': {'id': 1}}, **body)
+        return post(self.gateway, '/doc/read', body, headers)
+
+    def test_not_modified(self):
+        first = self._read({'if_none_match': ''})
+        self.assertEqual(first['status'], '200 OK')
+        self.assertEqual(first['headers']['Cache-Control'], 'private')
+        self.assertEqual(first['headers']['Vary'], 'Authorization, Cookie')
+
+        second = self._read({}, {'HTTP_IF_NONE_MATCH': first['headers']['ETag']})
+        self.assertEqual((second['status'], second['body']), ('304 Not Modified', ''))
+
+    def test_encoding_options_change_the_etag(self):
+        etag = self._read({'if_none_match': '', 'fields': ['id']})['headers']['ETag'].strip('"')
+        self.assertEqual(self._read({'if_none_match': etag, 'fields': ['id', 'title', 'body']})['status'], '200 OK')
+        self.assertEqual(self._read({'if_none_match': etag, 'references': True})['status'], '200 OK')
+        self.assertEqual(self._read({'if_none_match': etag, 'fields': ['id']})['status'], '304 Not Modified')
+
+if __name__ == '__main__':
+    unittest.main()
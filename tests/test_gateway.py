@@ -0,0 +1,155 @@
+import json
+import unittest
+
+from StringIO import StringIO
+
+from resawesome import API, CursorStore, Gateway, create, lookup, read, update
+from resawesome.serialization import binary_decode, json_decode
+from support import post
+
+def _item_api():
+    api = API()
+
+    @api.resource(name='item')
+    class Item(object):
+        items = {1: 'first'}
+        failing_commit = None
+
+        def __init__(self, id):
+            self.id = id
+
+        @staticmethod
+        def _has_class_access(permission):
+            return True
+
+        def _has_access(self, permission):
+            return self.id != 2
+
+        def _commit(self):
+            if Item.failing_commit is not None:
+                raise Item.failing_commit
+
+        def _serialize(self, permission):
+            return {'id': self.id, 'title': Item.items.get(self.id)}
+
+        @staticmethod
+        @create
+        def add(title):
+            Item.items[len(Item.items) + 1] = title
+            return Item(len(Item.items))
+
+        @read
+        def get(self):
+            return self
+
+        @read(count='int')
+        def repeat(self, count):
+            return [Item.items[self.id]] * count
+
+        @read
+        def broken(self):
+            return len(None)
+
+        @update
+        def rename(self, title):
+            Item.items[self.id] = title
+
+    return api, Item
+
+class GatewayStatusTest(unittest.TestCase):
+    def setUp(self):
+        self.api, self.Item = _item_api()
+        self.gateway = Gateway(self.api)
+
+    def _status(self, path, body, **kwargs):
+        return post(self.gateway, path, body, **kwargs)['status']
+
+    def test_successful_operations(self):
+        response = post(self.gateway, '/item/read', {'methods': ['get'], 'instance_args': {'id': 1}})
+        self.assertEqual(response['status'], '200 OK')
+        self.assertEqual(json.loads(response['body']), [{'id': 1, 'title': 'first'}])
+        self.assertEqual(self._status('/item/create', {'create_method': 'add', 'creation_args': {'title': 'second'}}), '200 OK')
+
+    def test_unknown_routes_and_methods_are_not_found(self):
+        self.assertEqual(self._status('/nothing/read', {}), '404 Not Found')
+        self.assertEqual(self._status('/item/read', {'methods': ['missing'], 'instance_args': {'id': 1}}), '404 Not Found')
+
+    def test_invalid_requests(self):
+        self.assertEqual(post(self.gateway, '/item/read', {}, {'REQUEST_METHOD': 'GET'})['status'], '405 Method Not Allowed')
+        self.assertEqual(self._status('/item/read', '{}', content_type='text/plain'), '415 Unsupported Media Type')
+        self.assertEqual(self._status('/item/read', '{not json'), '400 Bad Request')
+        self.assertEqual(self._status('/item/read', '[1, 2]'), '400 Bad Request')
+
+    def test_denied_access_is_forbidden(self):
+        self.assertEqual(self._status('/item/read', {'methods': ['get'], 'instance_args': {'id': 2}}), '403 Forbidden')
+
+    def test_invalid_arguments_are_bad_requests(self):
+        self.assertEqual(self._status('/item/read', {'methods': ['get'], 'instance_args': {}}), '400 Bad Request')
+        self.assertEqual(self._status('/item/read', {'methods': ['get'], 'instance_args': {'id': 1, 'extra': 2}}), '400 Bad Request')
+        self.assertEqual(self._status('/item/create', {'create_method': 'add', 'creation_args': {}}), '400 Bad Request')
+        self.assertEqual(self._status('/item/update', {'methods': [{'method': 'rename', 'args': {}}], 'instance_args': {'id': 1}}), '400 Bad Request')
+        self.assertEqual(self._status('/item/read', {'methods': [{'method': 'repeat', 'args': {'count': 'many'}}], 'instance_args': {'id': 1}}), '400 Bad Request')
+
+        error = json_decode(post(self.gateway, '/item/read', {'methods': ['get'], 'instance_args': {}})['body'])['error']
+        self.assertEqual(error.error_dict['type'], 'ResourceArgumentError')
+        self.assertIn('missing arguments: id', error.error_dict['message'])
+
+    def test_resource_faults_are_server_errors(self):
+        self.assertEqual(self._status('/item/read', {'methods': ['broken'], 'instance_args': {'id': 1}}), '500 Internal Server Error')
+
+        self.Item.failing_commit = TypeError('unsupported operand')
+        self.assertEqual(self._status('/item/update', {'methods': [{'method': 'rename', 'args': {'title': 'renamed'}}], 'instance_args': {'id': 1}}), '500 Internal Server Error')
+        self.Item.failing_commit = ValueError('invalid row')
+        self.assertEqual(self._status('/item/update', {'methods': [{'method': 'rename', 'args': {'title': 'renamed'}}], 'instance_args': {'id': 1}}), '500 Internal Server Error')
+
+class GatewayResponseTest(unittest.TestCase):
+    def setUp(self):
+        self.api, self.Item = _item_api()
+        self.api.cursor_store = CursorStore(8)
+        self.Item.all = staticmethod(lookup(lambda: [self.Item(i) for i in range(10)]))
+        self.api.invalidate_plans()
+        self.gateway = Gateway(self.api, prefix='/api/', chunk_size=16)
+
+    def test_json_responses_are_chunked(self):
+        body = json.dumps({'methods': ['all']})
+        environ = {'PATH_INFO': '/api/item/lookup', 'REQUEST_METHOD': 'POST', 'CONTENT_LENGTH': str(len(body)), 'wsgi.input': StringIO(body)}
+        statuses = []
+        chunks = list(self.gateway(environ, lambda status, headers: statuses.append(status)))
+
+        self.assertEqual(statuses, ['200 OK'])
+        self.assertGreater(len(chunks), 1)
+        self.assertEqual(json_decode(''.join(chunks)), [[{'id': i, 'title': self.Item.items.get(i)} for i in range(10)]])
+
+    def test_binary_responses(self):
+        response = post(self.gateway, '/api/item/read', {'methods': ['get'], 'instance_args': {'id': 1}}, {'HTTP_ACCEPT': 'application/x-resawesome-binary'})
+        self.assertEqual(response['headers']['Content-Type'], 'application/x-resawesome-binary')
+        self.assertEqual(binary_decode(response['body']), [{'id': 1, 'title': 'first'}])
+
+    def test_cursors(self):
+        page = json_decode(post(self.gateway, '/api/item/lookup', {'methods': ['all'], 'page_size': 4, 'fields': ['id']})['body'])
+        self.assertEqual(page['result'], [{'id': i} for i in range(4)])
+
+        page = json_decode(post(self.gateway, '/api/_cursor', {'cursor': page['cursor'], 'page_size': 6, 'fields': ['id']})['body'])
+        self.assertEqual((page['result'], page['cursor']), ([{'id': i} for i in range(4, 10)], None))
+        self.assertEqual(post(self.gateway, '/api/_cursor', {'cursor': 'taken'})['status'], '404 Not Found')
+
+    def test_routes_are_compiled_for_new_resources(self):
+        @self.api.resource(name='note')
+        class Note(object):
+            def __init__(self, id):
+                self.id = id
+
+            def _has_access(self, permission):
+                return True
+
+            @read
+            def text(self):
+                return 'note'
+
+        body = {'methods': ['text'], 'instance_args': {'id': 1}}
+        self.assertEqual(post(self.gateway, '/api/note/read', body)['status'], '404 Not Found')
+        self.gateway.compile_routes()
+        self.assertEqual(post(self.gateway, '/api/note/read', body)['body'], '["note"]')
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,79 @@
+import unittest
+
+from StringIO import StringIO
+
+from resawesome import API, read
+from resawesome.loadtest import Recorder, percentile, read_log, record_key, replay, scrub_environment
+
+def _page_api(recorder=None):
+    api = API(recorder=recorder)
+
+    @api.resource(name='page')
+    class Page(object):
+        def __init__(self, id):
+            self.id = id
+
+        def _has_access(self, permission):
+            return True
+
+        def _serialize(self, permission):
+            return {'id': self.id}
+
+        @read
+        def get(self):
+            return self
+
+        @read
+        def parent(self):
+            # operations made by methods aren't recorded
+            return api.read('page', ['get'], {'id': self.id - 1}, {})
+
+        @read
+        def fail(self):
+            raise KeyError('failed')
+
+    return api
+
+class RecorderTest(unittest.TestCase):
+    def test_top_level_operations_are_recorded(self):
+        log = StringIO()
+        api = _page_api(Recorder(log))
+        api.read('page', ['get', 'parent'], {'id': 2}, {'_user_id': 1, 'auth_token': 'secret'})
+        api.batch([{'operation': 'read', 'name': 'page', 'instance_args': {'id': 1}, 'methods': ['get']}], {})
+        api.read('page', ['get'], {'id': object()}, {})
+
+        log.seek(0)
+        records = read_log(log)
+        self.assertEqual([record['operation'] for record in records], ['read', 'batch'])
+        self.assertEqual(records[0]['args']['methods'], ['get', 'parent'])
+        self.assertEqual(records[0]['environment'], {'_user_id': 1})
+        self.assertEqual([record_key(record) for record in records], ['page.read(get,parent)', 'batch(page.read)'])
+        self.assertEqual((api.recorder.recorded, api.recorder.skipped), (2, 1))
+
+    def test_scrub_environment(self):
+        environment = {'user': 'a', 'password': 'b', 'SessionId': 'c', 'request': object(), 'count': 1}
+        self.assertEqual(scrub_environment(environment), {'user': 'a', 'count': 1})
+
+class ReplayTest(unittest.TestCase):
+    def test_replay(self):
+        log = StringIO()
+        api = _page_api(Recorder(log))
+        for i in range(4):
+            api.read('page', ['get'], {'id': i}, {})
+        self.assertRaises(Exception, api.read, 'page', ['fail'], {'id': 1}, {})
+
+        log.seek(0)
+        summary = replay(_page_api(), read_log(log), concurrency=2)
+        self.assertEqual((summary['operations'], summary['errors']), (5, 1))
+        self.assertEqual(sorted(summary['calls']), ['page.read(fail)', 'page.read(get)'])
+        self.assertEqual(summary['calls']['page.read(get)']['count'], 4)
+        self.assertEqual(summary['latency']['errors'], 1)
+
+    def test_percentile(self):
+        values = range(1, 101)
+        self.assertEqual([percentile(values, percent) for percent in (50, 95, 99, 100)], [50, 95, 99, 100])
+        self.assertEqual([percentile([3, 7], percent) for percent in (1, 50, 51)], [3, 3, 7])
+        self.assertEqual(percentile([], 50), None)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,58 @@
+import unittest
+
+from StringIO import StringIO
+
+from resawesome import API, read
+from resawesome.manifest import generate_manifest, read_manifest, resource_path, write_manifest
+from resawesome.resource import ResourceNotFoundError
+
+class Widget(object):
+    def __init__(self, id):
+        self.id = id
+
+    def _has_access(self, permission):
+        return True
+
+    @read
+    def get_id(self):
+        return self.id
+
+class LazyResourceTest(unittest.TestCase):
+    def test_lazy_resources_are_attached_when_first_used(self):
+        api = API()
+        api.register_lazy('widget', resource_path(Widget), is_cacheable=True)
+        self.assertNotIn('widget', api.resource_classes)
+
+        self.assertEqual(api.read('widget', ['get_id'], {'id': 3}, {}), [3])
+        self.assertIs(api.resource_classes['widget'], Widget)
+        self.assertTrue(api.is_cacheable['widget'])
+        self.assertNotIn('widget', api.lazy_resources)
+
+    def test_unknown_resources(self):
+        api = API()
+        api.register_lazy('widget', resource_path(Widget))
+        with self.assertRaises(ResourceNotFoundError):
+            api.read('gadget', ['get_id'], {'id': 3}, {})
+
+    def test_manifests(self):
+        api = API()
+        api.resource(Widget, name='widget', is_transactional=False)
+
+        manifest_file = StringIO()
+        write_manifest(generate_manifest(api), manifest_file)
+        manifest_file.seek(0)
+
+        lazy_api = API()
+        lazy_api.load_manifest(manifest_file)
+        self.assertEqual(lazy_api.lazy_resources, {'widget': (resource_path(Widget), False, False)})
+
+        lazy_api.warm_up()
+        self.assertEqual(lazy_api.lazy_resources, {})
+        self.assertIn('get_id', lazy_api.resource_plans['widget'].methods)
+        self.assertFalse(lazy_api.is_transactional['widget'])
+
+    def test_manifest_versions(self):
+        self.assertRaises(ValueError, read_manifest, StringIO('{"version": 99, "resources": {}}'))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,63 @@
+import unittest
+
+from resawesome import API, Metrics, read
+from resawesome.resource import ResourceMethodFailedError
+
+def _gauge_api():
+    api = API(metrics=Metrics(buckets=(0.5, 0.1)))
+
+    @api.resource(name='gauge')
+    class Gauge(object):
+        def __init__(self, id):
+            self.id = id
+
+        def _has_access(self, permission):
+            return True
+
+        @read(scale='int')
+        def value(self, scale):
+            return self.id * scale
+
+        @read
+        def broken(self):
+            raise KeyError('no reading')
+
+    return api
+
+class MetricsTest(unittest.TestCase):
+    def test_histograms(self):
+        metrics = Metrics(buckets=(1.0, 0.1))
+        for seconds in (0.05, 0.5, 0.5, 5.0):
+            metrics.observe('gauge', 'value', 'call', seconds)
+
+        latency, = metrics.snapshot()['latency']
+        self.assertEqual((latency['resource'], latency['method'], latency['phase'], latency['count']), ('gauge', 'value', 'call', 4))
+        self.assertAlmostEqual(latency['sum'], 6.05)
+        self.assertEqual(latency['buckets'], {'0.1': 1, '1.0': 3, '+Inf': 4})
+
+        metrics.reset()
+        self.assertEqual(metrics.snapshot(), {'latency': [], 'errors': []})
+
+    def test_calls_and_errors_are_recorded(self):
+        api = _gauge_api()
+        api.read('gauge', [{'method': 'value', 'args': {'scale': '2'}}], {'id': 1}, {})
+        with self.assertRaises(ResourceMethodFailedError):
+            api.read('gauge', ['broken'], {'id': 1}, {})
+
+        snapshot = api.metrics.snapshot()
+        phases = set((latency['method'], latency['phase']) for latency in snapshot['latency'] if latency['count'] > 0)
+        self.assertTrue(set([('value', 'coercion'), ('value', 'call'), ('broken', 'call')]) <= phases)
+        self.assertEqual(snapshot['errors'], [{'resource': 'gauge', 'method': 'broken', 'error': 'KeyError', 'count': 1}])
+
+    def test_prometheus(self):
+        metrics = Metrics(buckets=(0.1,))
+        metrics.observe('gauge', 'value', 'call', 0.05)
+        metrics.error('gauge', 'val"ue', KeyError())
+
+        lines = metrics.prometheus().splitlines()
+        self.assertIn('resawesome_phase_seconds_bucket{method="value",phase="call",resource="gauge",le="0.1"} 1', lines)
+        self.assertIn('resawesome_phase_seconds_count{method="value",phase="call",resource="gauge"} 1', lines)
+        self.assertIn('resawesome_errors_total{error="KeyError",method="val\\"ue",resource="gauge"} 1', lines)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,78 @@
+import unittest
+
+from resawesome import API, CursorStore, lookup
+from resawesome.resource import ResourceArgumentError, ResourceCursorNotFoundError
+
+def _log_api(**kwargs):
+    api = API(**kwargs)
+
+    @api.resource(name='log')
+    class Log(object):
+        closed = []
+
+        @staticmethod
+        def _has_class_access(permission):
+            return True
+
+        @staticmethod
+        @lookup
+        def lines(count):
+            try:
+                for i in range(count):
+                    yield {'line': i}
+            finally:
+                Log.closed.append(count)
+
+        @staticmethod
+        @lookup
+        def size():
+            return 0
+
+    return api, Log
+
+def _lines(count):
+    return [{'method': 'lines', 'args': {'count': count}}]
+
+class PaginationTest(unittest.TestCase):
+    def test_pages(self):
+        api, Log = _log_api(cursor_store=CursorStore(8))
+        page = api.lookup('log', _lines(5), {}, page_size=2)
+        lines = page['result']
+        while page['cursor'] is not None:
+            page = api.next_page(page['cursor'], {})
+            lines.extend(page['result'])
+
+        self.assertEqual(lines, [{'line': i} for i in range(5)])
+        self.assertEqual(len(api.cursor_store), 0)
+
+    def test_page_sizes_and_fields(self):
+        api, Log = _log_api(cursor_store=CursorStore(8))
+        page = api.lookup('log', _lines(5), {}, page_size=1, fields=['line'])
+        page = api.next_page(page['cursor'], {}, page_size=3)
+        self.assertEqual(page['result'], [{'line': 1}, {'line': 2}, {'line': 3}])
+        self.assertEqual(api.next_page(page['cursor'], {})['result'], [{'line': 4}])
+
+    def test_cursors_are_taken_once_by_their_owner(self):
+        api, Log = _log_api(cursor_store=CursorStore(8))
+        token = api.lookup('log', _lines(5), {'_user_id': 'alice'}, page_size=2)['cursor']
+        self.assertRaises(ResourceCursorNotFoundError, api.next_page, token, {'_user_id': 'bob'})
+
+        api.next_page(token, {'_user_id': 'alice'})
+        self.assertRaises(ResourceCursorNotFoundError, api.next_page, token, {'_user_id': 'alice'})
+
+    def test_evicted_cursors_are_closed(self):
+        api, Log = _log_api(cursor_store=CursorStore(1))
+        api.lookup('log', _lines(5), {}, page_size=2)
+        api.lookup('log', _lines(6), {}, page_size=2)
+        self.assertEqual(Log.closed, [5])
+
+    def test_invalid_paginated_lookups(self):
+        api, Log = _log_api()
+        self.assertRaises(ValueError, api.lookup, 'log', _lines(5), {}, page_size=2)
+
+        api, Log = _log_api(cursor_store=CursorStore(8))
+        self.assertRaises(ResourceArgumentError, api.lookup, 'log', _lines(5) * 2, {}, page_size=2)
+        self.assertRaises(ValueError, api.lookup, 'log', ['size'], {}, page_size=2)
+
+if __name__ == '__main__':
+    unittest.main()
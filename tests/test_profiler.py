@@ -0,0 +1,67 @@
+import time
+import unittest
+
+from StringIO import StringIO
+
+from resawesome import API, read
+from resawesome.profiler import SAMPLE, TRACE, Profiler
+
+def _task_api(profiler):
+    api = API(profiler=profiler)
+
+    @api.resource(name='task')
+    class Task(object):
+        def __init__(self, id):
+            self.id = id
+
+        def _has_access(self, permission):
+            return True
+
+        @read
+        def work(self, seconds=0.0):
+            time.sleep(seconds)
+            return sum(range(100))
+
+    return api
+
+def _work(api, environment, seconds=0.0):
+    return api.read('task', [{'method': 'work', 'args': {'seconds': seconds}}], {'id': 1}, environment)
+
+class ProfilerTest(unittest.TestCase):
+    def test_only_requested_calls_are_profiled(self):
+        profiler = Profiler(TRACE)
+        api = _task_api(profiler)
+        _work(api, {})
+        self.assertEqual(profiler.collapsed(), [])
+
+        self.assertEqual(_work(api, {'_profile': True}), [4950])
+        stacks = [line.rsplit(' ', 1)[0].split(';') for line in profiler.collapsed()]
+        self.assertTrue(stacks)
+        self.assertTrue(all(stack[0] == 'task' for stack in stacks))
+        self.assertTrue(any(label.startswith('work (') for stack in stacks for label in stack))
+
+    def test_sampling(self):
+        profiler = Profiler(SAMPLE, sample_rate=1.0, interval=0.001)
+        api = _task_api(profiler)
+        _work(api, {}, 0.05)
+
+        lines = profiler.collapsed()
+        self.assertTrue(any('work (' in line for line in lines))
+        self.assertGreater(sum(int(line.rsplit(' ', 1)[1]) for line in lines), 1)
+
+    def test_dump_and_reset(self):
+        profiler = Profiler(TRACE)
+        profiler.profile(['a', 'b'], sorted, [2, 1])
+
+        output_file = StringIO()
+        profiler.dump(output_file)
+        self.assertTrue(output_file.getvalue().startswith('a;b;'))
+
+        profiler.reset()
+        self.assertEqual(profiler.collapsed(), [])
+
+    def test_modes(self):
+        self.assertRaises(ValueError, Profiler, 'guess')
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,134 @@
+import unittest
+
+from resawesome import API, lookup, read, update
+from resawesome.plans import CALLABLE, PROPERTY, plan_args
+from resawesome.resource import ResourceMethodNotFoundError
+
+def _user_api():
+    api = API()
+
+    @api.resource(name='user')
+    class User(object):
+        def __init__(self, id):
+            self.id = id
+
+        def _has_access(self, permission):
+            return True
+
+        def _serialize(self, permission):
+            return {'id': self.id}
+
+        @property
+        def name(self):
+            return 'user' + str(self.id)
+
+        @read(times='int')
+        def greet(self, _user_id, times, punctuation='!'):
+            return ('hi ' + _user_id + punctuation) * times
+
+        def helper(self):
+            return 'not exported'
+
+    return api, User
+
+class CallPlanTest(unittest.TestCase):
+    def test_resource_plans(self):
+        api, User = _user_api()
+        plan = api.resource_plans['user']
+        self.assertIs(plan.cls, User)
+        self.assertEqual(sorted(plan.methods), ['greet', 'name'])
+        self.assertIn('helper', plan.unexported)
+        self.assertEqual(plan.methods['name'].kind, PROPERTY)
+
+        greet = plan.methods['greet']
+        self.assertEqual((greet.kind, greet.method_type), (CALLABLE, 'read'))
+        self.assertEqual([(arg_name, is_sendable) for arg_name, is_sendable, converter in greet.args], [('_user_id', False), ('times', True), ('punctuation', True)])
+        self.assertIsNotNone(greet.args[1][2])
+
+    def test_plan_args(self):
+        api, User = _user_api()
+        greet = api.resource_plans['user'].methods['greet']
+        kwargs = plan_args(greet, {'_user_id': 'mallory', 'times': '2', 'unknown': 1}, {'_user_id': 'alice'})
+        self.assertEqual(kwargs, {'_user_id': 'alice', 'times': 2})
+
+    def test_dispatch(self):
+        api, User = _user_api()
+        result = api.read('user', ['name', {'method': 'greet', 'args': {'times': '2', '_user_id': 'mallory'}}], {'id': 1}, {'_user_id': 'alice'})
+        self.assertEqual(result, ['user1', 'hi alice!hi alice!'])
+
+    def test_invalidate_plans(self):
+        api, User = _user_api()
+        User.wave = read(lambda self: 'wave')
+        with self.assertRaises(ResourceMethodNotFoundError):
+            api.read('user', ['wave'], {'id': 1}, {})
+
+        api.invalidate_plans('user')
+        self.assertEqual(api.read('user', ['wave'], {'id': 1}, {}), ['wave'])
+
+        del User.wave
+        api.invalidate_plans()
+        self.assertNotIn('wave', api.resource_plans['user'].methods)
+
+def _old_style_api():
+    api = API()
+
+    class Note:
+        pass
+
+    @api.resource(name='page')
+    class Page:
+        commits = []
+
+        def __init__(self, id):
+            self.id = id
+
+        @staticmethod
+        def _has_class_access(permission):
+            return True
+
+        def _has_access(self, permission):
+            return True
+
+        def _commit(self):
+            Page.commits.append(self.id)
+
+        def _serialize(self, permission):
+            return {'id': self.id}
+
+        @read
+        def get(self):
+            return self
+
+        @read
+        def with_note(self):
+            return [self, Note()]
+
+        @update
+        def touch(self):
+            pass
+
+        @staticmethod
+        @lookup
+        def first(count):
+            return [Page(i) for i in range(count)]
+
+    return api, Page, Note
+
+class OldStyleResourceTest(unittest.TestCase):
+    def test_operations(self):
+        api, Page, Note = _old_style_api()
+        self.assertEqual(api.read('page', ['get'], {'id': 1}, {}), [{'id': 1}])
+        self.assertEqual(api.lookup('page', [{'method': 'first', 'args': {'count': 2}}], {}), [[{'id': 0}, {'id': 1}]])
+        api.update('page', ['touch'], {'id': 3}, {})
+        self.assertEqual(Page.commits, [3])
+
+    def test_other_old_style_instances_are_not_resources(self):
+        api, Page, Note = _old_style_api()
+        self.assertEqual(api.read('page', ['get'], {'id': 1}, {}), [{'id': 1}])
+
+        page, note = api.read('page', ['with_note'], {'id': 2}, {})[0]
+        self.assertEqual(page, {'id': 2})
+        self.assertIsInstance(note, Note)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,167 @@
+# -*- coding: utf-8 -*-
+import json
+import unittest
+
+from datetime import datetime
+from StringIO import StringIO
+
+from resawesome import API, read
+from resawesome.serialization import (
+    BinaryDecodeError,
+    EncodedError,
+    ParseError,
+    binary_decode,
+    binary_dump,
+    binary_encode,
+    compile_converter,
+    compile_converters,
+    convert_arg,
+    get_decoder,
+    iter_binary_load,
+    json_decode,
+    json_encode
+)
+
+def _rows(size):
+    return [{'id': i, 'name': 'user' + str(i), 'email': u'user%d@example.com' % i, 'score': i * 1.5, 'active': i % 2 == 0, 'tags': ['a', 'b'], 'parent': None} for i in xrange(size)]
+
+class BinaryCodecTest(unittest.TestCase):
+    def assertRoundTrips(self, value):
+        decoded = binary_decode(binary_encode(value))
+        self.assertEqual(decoded, value)
+        self.assertEqual(type(decoded), type(value))
+        return decoded
+
+    def test_scalars(self):
+        for value in (None, True, False, 0.5, float('inf'), 'bytes', u'unicod\xe9', '', 'x' * 300, u'☃' * 300):
+            self.assertRoundTrips(value)
+
+    def test_integers_of_every_width(self):
+        for value in (0, 1, -1, 127, 128, -128, -129, 32767, 32768, -32769, 2 ** 31, -2 ** 31 - 1, 2 ** 63 - 1, -2 ** 63, 2 ** 64, -2 ** 70):
+            self.assertEqual(binary_decode(binary_encode(value)), value)
+
+        self.assertEqual(len(binary_encode(5)), 2)
+        self.assertEqual(len(binary_encode(1000)), 3)
+
+    def test_containers(self):
+        self.assertRoundTrips([1, 'a', [2.5, None], {'k': (1, 2)}])
+        self.assertRoundTrips((1, 2, 3))
+        self.assertRoundTrips(set(['a', 'b']))
+        self.assertRoundTrips({})
+        self.assertRoundTrips({1: 'int key', (1, 2): 'tuple key'})
+        self.assertRoundTrips(range(300))
+        self.assertRoundTrips(['x'] * 300)
+        self.assertRoundTrips(dict(('k' + str(i), i) for i in xrange(300)))
+        self.assertEqual(binary_decode(binary_encode(i for i in xrange(3))), [0, 1, 2])
+
+    def test_packed_lists(self):
+        for value in ([1, 2, 3, 4], [0, 300, -5, 7], [2 ** 40, 0, 0, 0], [0.5, 1.5, 2.5, 3.5], [True, False, True, True]):
+            self.assertRoundTrips(value)
+
+        # mixed and out of range lists are written item by item
+        self.assertRoundTrips([1, 2, 3, True])
+        self.assertRoundTrips([1, 2, 3, 2 ** 70])
+        self.assertEqual(len(binary_encode(range(1000))), 2 + 4 + 2000)
+
+    def test_dicts_sharing_shapes(self):
+        value = [{'a': 1, 'b': {'a': 2, 'b': None}}, {'a': 3, 'b': {'a': 4, 'b': 5}}]
+        self.assertRoundTrips(value)
+        self.assertRoundTrips(_rows(300))
+
+    def test_equal_keys_of_other_types_keep_their_types(self):
+        decoded = self.assertRoundTrips([{1: 'a'}, {True: 'b'}, {'k': 1}, {u'k': 2}])
+        self.assertEqual([type(row.keys()[0]) for row in decoded], [int, bool, str, unicode])
+
+        decoded = self.assertRoundTrips([{'k': 1}] * 4 + [{u'k': 2}] * 4)
+        self.assertEqual([type(row.keys()[0]) for row in decoded], [str] * 4 + [unicode] * 4)
+
+    def test_tables_of_dicts_with_other_keys(self):
+        self.assertRoundTrips([{'a': 1}, {'a': 2}, {'a': 3}, {'b': 4}])
+        self.assertRoundTrips([{'a': 1}, {'a': 2}, {'a': 3}, 'not a dict'])
+
+    def test_tagged_values(self):
+        self.assertRoundTrips(datetime(2020, 1, 2, 3, 4, 5, 6))
+
+        error = binary_decode(binary_encode(ValueError('bad')))
+        self.assertIsInstance(error, EncodedError)
+        self.assertEqual(error.error_dict, {'type': 'ValueError', 'message': 'bad'})
+
+        self.assertEqual(binary_decode(binary_encode(int)), "<type 'int'>")
+        self.assertRaises(TypeError, binary_encode, object())
+
+    def test_more_compact_than_json(self):
+        rows = _rows(500)
+        self.assertLess(len(binary_encode(rows)), len(json.dumps(rows)) / 2)
+        self.assertLess(len(binary_encode(range(1000))), len(json.dumps(range(1000))) / 2)
+
+    def test_invalid_data(self):
+        data = binary_encode({'key': [u'value', 1, 2.5]})
+        for end in xrange(len(data)):
+            self.assertRaises(BinaryDecodeError, binary_decode, data[:end])
+
+        self.assertRaises(BinaryDecodeError, binary_decode, '?')
+        self.assertRaises(BinaryDecodeError, binary_decode, 'R\x00')
+
+    def test_streams(self):
+        values = [_rows(50), 'x' * 1000, range(500), None, {'a': 1}]
+        stream = StringIO()
+        for value in values:
+            binary_dump(value, stream)
+        stream.seek(0)
+        self.assertEqual(list(iter_binary_load(stream, read_size=7)), values)
+
+        self.assertRaises(BinaryDecodeError, list, iter_binary_load(StringIO(stream.getvalue()[:-1])))
+
+class JSONCodecTest(unittest.TestCase):
+    def test_tagged_round_trip(self):
+        value = {'when': datetime(2020, 1, 2, 3, 4, 5), 'ids': set([1, 2])}
+        self.assertEqual(json_decode(json_encode(value)), value)
+
+    def test_unknown_tags(self):
+        self.assertRaises(ValueError, json_decode, '{"__type__": "no such type", "__value__": 1}')
+        self.assertRaises(ParseError, get_decoder(), {'__type__': 5, '__value__': 1})
+
+class ConvertArgTest(unittest.TestCase):
+    def test_conversions(self):
+        self.assertEqual(convert_arg('int', '5'), 5)
+        self.assertEqual(convert_arg('bool', 'false'), False)
+        self.assertEqual(convert_arg('list', '[1, 2]'), [1, 2])
+        self.assertEqual(convert_arg('datetime', '2020-01-02T03:04:05'), datetime(2020, 1, 2, 3, 4, 5))
+
+class Point(object):
+    def __init__(self, text):
+        self.x, self.y = map(int, text.split(','))
+
+class CompileConverterTest(unittest.TestCase):
+    def test_list_declarations(self):
+        self.assertEqual(compile_converter([int])('[1, "2", 3]'), [1, 2, 3])
+        self.assertEqual(compile_converter([int])(['4']), [4])
+        self.assertEqual(compile_converter(['datetime'])([0]), [datetime.utcfromtimestamp(0)])
+
+    def test_class_declarations(self):
+        point = compile_converter(Point)('1,2')
+        self.assertEqual((point.x, point.y), (1, 2))
+        self.assertIs(compile_converter(Point)(point), point)
+
+    def test_values_of_other_types_are_rejected(self):
+        self.assertRaises(TypeError, compile_converter('int'), [1])
+        self.assertEqual(compile_converter('int')(None), None)
+
+    def test_declared_arguments_are_converted(self):
+        self.assertEqual(sorted(compile_converters({'a': 'int', 'b': [float]})), ['a', 'b'])
+
+        api = API()
+
+        @api.resource(name='calc')
+        class Calc(object):
+            def _has_access(self, permission):
+                return True
+
+            @read(numbers=[int], scale='float')
+            def total(self, numbers, scale=1.0):
+                return sum(numbers) * scale
+
+        self.assertEqual(api.read('calc', [{'method': 'total', 'args': {'numbers': '[1, 2]', 'scale': '0.5'}}], {}, {}), [1.5])
+
+if __name__ == '__main__':
+    unittest.main()
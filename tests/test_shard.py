@@ -0,0 +1,89 @@
+import os
+import unittest
+
+from resawesome import API, ShardedExecutor, create, read
+from resawesome.resource import ResourceArgumentError, ResourceNotFoundError
+from resawesome.shard import BY_INSTANCE, ShardCrashedError, ShardsClosedError
+
+def _cell_api():
+    api = API()
+
+    @api.resource(name='cell')
+    class Cell(object):
+        def __init__(self, id):
+            self.id = id
+
+        @staticmethod
+        def _has_class_access(permission):
+            return True
+
+        def _has_access(self, permission):
+            return True
+
+        def _serialize(self, permission):
+            return {'id': self.id}
+
+        @staticmethod
+        @create
+        def new(id):
+            return Cell(id)
+
+        @read
+        def pid(self):
+            return os.getpid()
+
+        @read
+        def crash(self):
+            os._exit(3)
+
+    return api
+
+class ShardedExecutorTest(unittest.TestCase):
+    def setUp(self):
+        self.executor = ShardedExecutor(_cell_api(), shards=2)
+
+    def tearDown(self):
+        self.executor.close()
+
+    def test_operations(self):
+        self.assertNotEqual(self.executor.read('cell', ['pid'], {'id': 1}, {}).get(10), [os.getpid()])
+        created = self.executor.create('cell', 'new', {'id': 5}, [], {}).get(10)
+        self.assertEqual(created['instance'], {'id': 5})
+
+        message = {'operation': 'read', 'name': 'cell', 'methods': ['pid'], 'instance_args': {'id': 2}, 'environment': {}}
+        self.assertEqual(len(self.executor.send(message).get(10)), 1)
+
+    def test_errors_are_raised_again(self):
+        with self.assertRaises(ResourceNotFoundError):
+            self.executor.read('missing', ['pid'], {'id': 1}, {}).get(10)
+        with self.assertRaises(ResourceArgumentError):
+            self.executor.read('cell', ['pid'], {}, {}).get(10)
+        self.assertRaises(TypeError, self.executor.read, 'cell', ['pid'], {'id': object()}, {})
+
+    def test_partitions(self):
+        number = self.executor.shard_number('read', 'cell', {'id': 1})
+        self.assertEqual([self.executor.shard_number('read', 'cell', {'id': i}) for i in range(8)], [number] * 8)
+
+        by_instance = ShardedExecutor(_cell_api(), shards=2, partition=BY_INSTANCE)
+        try:
+            self.assertEqual(len(set(by_instance.shard_number('read', 'cell', {'id': i}) for i in range(8))), 2)
+            pids = set(by_instance.read('cell', ['pid'], {'id': i}, {}).get(10)[0] for i in range(8))
+            self.assertEqual(len(pids), 2)
+        finally:
+            by_instance.close()
+
+        self.assertRaises(ValueError, ShardedExecutor, _cell_api(), 1, 'randomly')
+
+    def test_crashed_shards_are_replaced(self):
+        with self.assertRaises(ShardCrashedError):
+            self.executor.read('cell', ['crash'], {'id': 1}, {}).get(10)
+
+        self.assertEqual(len(self.executor.read('cell', ['pid'], {'id': 1}, {}).get(10)), 1)
+        self.assertEqual(sum(shard['crashes'] for shard in self.executor.stats()), 1)
+
+    def test_closed_executors(self):
+        self.executor.close()
+        self.assertRaises(ShardsClosedError, self.executor.read, 'cell', ['pid'], {'id': 1}, {})
+
+if __name__ == '__main__':
+    unittest.main()
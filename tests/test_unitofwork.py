@@ -0,0 +1,107 @@
+import unittest
+
+from resawesome import API, update
+from resawesome.resource import ResourceMethodFailedError
+
+def _row_api(commit_many=None):
+    api = API()
+
+    @api.resource(name='row')
+    class Row(object):
+        commits = []
+
+        def __init__(self, id):
+            self.id = id
+            self.value = None
+
+        def _has_access(self, permission):
+            return True
+
+        def _commit(self):
+            Row.commits.append([self.id])
+            return self.id
+
+        @update
+        def set_value(self, value):
+            self.value = value
+
+    if commit_many is not None:
+        Row._commit_many = staticmethod(commit_many)
+        api.invalidate_plans()
+
+    return api, Row
+
+def _set(api, id):
+    return api.update('row', [{'method': 'set_value', 'args': {'value': id}}], {'id': id}, {})
+
+class UnitOfWorkTest(unittest.TestCase):
+    def test_commits_are_deferred_to_the_end(self):
+        api, Row = _row_api()
+        with api.unit_of_work():
+            entry = _set(api, 1)['commit']
+            _set(api, 2)
+            self.assertEqual((Row.commits, entry['is_committed']), ([], False))
+
+        self.assertEqual(Row.commits, [[1], [2]])
+        self.assertEqual((entry['is_committed'], entry['result'], entry['error']), (True, 1, None))
+
+    def test_flushing(self):
+        api, Row = _row_api()
+        with api.unit_of_work(flush_threshold=2):
+            _set(api, 1)
+            self.assertEqual(Row.commits, [])
+            _set(api, 2)
+            self.assertEqual(Row.commits, [[1], [2]])
+            _set(api, 3)
+            entries = api.flush()
+            self.assertEqual([entry['result'] for entry in entries], [3])
+
+    def test_errors_leave_changes_uncommitted(self):
+        api, Row = _row_api()
+        with self.assertRaises(KeyError):
+            with api.unit_of_work():
+                _set(api, 1)
+                raise KeyError('failed')
+
+        self.assertEqual(Row.commits, [])
+
+    def test_commit_many(self):
+        def _commit_many(rows):
+            Row.commits.append([row.id for row in rows])
+            return [row.id * 10 for row in rows]
+
+        api, Row = _row_api(_commit_many)
+        with api.unit_of_work():
+            entries = [_set(api, i)['commit'] for i in (1, 2, 3)]
+
+        self.assertEqual(Row.commits, [[1, 2, 3]])
+        self.assertEqual([entry['result'] for entry in entries], [10, 20, 30])
+
+    def test_commit_many_errors(self):
+        def _commit_many(rows):
+            return [KeyError('conflict'), 20]
+
+        api, Row = _row_api(_commit_many)
+        with api.unit_of_work():
+            entries = [_set(api, i)['commit'] for i in (1, 2, 3)]
+
+        self.assertEqual([entry['is_committed'] for entry in entries], [False, True, False])
+        self.assertIsInstance(entries[0]['error'], ResourceMethodFailedError)
+        self.assertIsInstance(entries[0]['error'].error, KeyError)
+        # instances without a result aren't committed
+        self.assertIsInstance(entries[2]['error'].error, ValueError)
+
+    def test_failed_commit_many(self):
+        def _commit_many(rows):
+            raise IOError('unavailable')
+
+        api, Row = _row_api(_commit_many)
+        with api.unit_of_work():
+            entries = [_set(api, i)['commit'] for i in (1, 2)]
+
+        self.assertEqual([entry['is_committed'] for entry in entries], [False, False])
+        self.assertIs(entries[0]['error'], entries[1]['error'])
+        self.assertIsInstance(entries[0]['error'].error, IOError)
+
+if __name__ == '__main__':
+    unittest.main()